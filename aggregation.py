@@ -0,0 +1,330 @@
+"""
+回答の集計 - すべての回答をNumPyの整数配列に変換して、選択肢の分布・クロス集計・日別集計を行う
+
+回答ファイルを読み込むときに、問題・選択肢・回答者・日付をそれぞれ0から始まる番号に置き換え、
+1回答を (問題番号, 選択肢番号, 回答者番号, 日付番号) の4つの整数として保持する。
+集計はこの配列に対する np.bincount などの一括処理で行うため、回答数が多くてもPythonのループを回さない。
+
+NumPyは集計機能を使う場合だけ必要（pip install numpy）。
+"""
+import os
+from array import array
+import response_merge
+from compaction import read_snapshot
+from normalized_output import (
+    NORMALIZED_EXTENSION, iter_normalized_rows, load_manifest, manifest_path_for
+)
+from records import question_texts
+from constants import DEFAULT_CONFIG
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def require_numpy():
+    """NumPyがインストールされていない場合はエラー"""
+    if np is None:
+        raise ImportError("集計機能にはNumPyが必要です（pip install numpy）")
+
+
+class _Encoder:
+    """問題・選択肢・回答者・日付を番号に置き換えながら回答を蓄積する"""
+
+    def __init__(self, questions=None):
+        self.question_keys = {}  # 問題のキー（質問文の番号・問題ID） → 問題番号
+        self.question_labels = []
+        self.choice_codes = []  # 問題番号 → {選択肢: 選択肢番号}
+        self.choice_labels = []
+        self.respondent_codes = {}
+        self.day_codes = {}
+
+        self.question_idx = array('i')
+        self.choice_idx = array('i')
+        self.respondent_idx = array('i')
+        self.day_idx = array('i')
+
+        # 問題リストがある場合は問題と選択肢の並びを問題リストに合わせる
+        for question in questions or []:
+            index = self._question(question.text_id, question.text)
+            for choice in question.choices:
+                self._choice(index, choice)
+
+    def _question(self, key, label):
+        index = self.question_keys.get(key)
+        if index is None:
+            index = self.question_keys[key] = len(self.question_labels)
+            self.question_labels.append(label)
+            self.choice_codes.append({})
+            self.choice_labels.append([])
+        return index
+
+    def _choice(self, question_index, choice):
+        codes = self.choice_codes[question_index]
+        code = codes.get(choice)
+        if code is None:
+            code = codes[choice] = len(codes)
+            self.choice_labels[question_index].append(choice)
+        return code
+
+    def add(self, question_key, question_label, choice, respondent_id, timestamp):
+        """
+        回答を1件追加
+
+        Args:
+            question_key: 問題を区別するキー
+            question_label: 問題の表示名（初めての問題の場合だけ使う）
+            choice: 選択した回答
+            respondent_id: 回答者ID
+            timestamp: 回答日時の文字列（先頭10文字を日付とする）
+        """
+        question_index = self.question_keys.get(question_key)
+        if question_index is None:
+            question_index = self._question(question_key, question_label)
+        codes = self.choice_codes[question_index]
+        choice_index = codes.get(choice)
+        if choice_index is None:
+            choice_index = self._choice(question_index, choice)
+        respondent_index = self.respondent_codes.setdefault(respondent_id, len(self.respondent_codes))
+        day_index = self.day_codes.setdefault(timestamp[:10], len(self.day_codes))
+
+        self.question_idx.append(question_index)
+        self.choice_idx.append(choice_index)
+        self.respondent_idx.append(respondent_index)
+        self.day_idx.append(day_index)
+
+    def build(self):
+        """蓄積した回答からResponseMatrixを作成"""
+        require_numpy()
+        return ResponseMatrix(
+            self.question_labels,
+            self.choice_labels,
+            list(self.respondent_codes),
+            list(self.day_codes),
+            np.frombuffer(self.question_idx, dtype=np.int32),
+            np.frombuffer(self.choice_idx, dtype=np.int32),
+            np.frombuffer(self.respondent_idx, dtype=np.int32),
+            np.frombuffer(self.day_idx, dtype=np.int32)
+        )
+
+
+class ResponseMatrix:
+    """
+    整数配列に変換したすべての回答
+
+    Attributes:
+        question_labels: 問題番号 → 質問文
+        choice_labels: 問題番号 → 選択肢のリスト（選択肢番号順）
+        respondent_ids: 回答者番号 → 回答者ID
+        days: 日付番号 → 日付（YYYY-MM-DD）
+        question_idx, choice_idx, respondent_idx, day_idx: 1回答につき1要素の整数配列
+    """
+
+    def __init__(self, question_labels, choice_labels, respondent_ids, days,
+                 question_idx, choice_idx, respondent_idx, day_idx):
+        require_numpy()
+        self.question_labels = question_labels
+        self.choice_labels = choice_labels
+        self.respondent_ids = respondent_ids
+        self.days = days
+        self.question_idx = question_idx
+        self.choice_idx = choice_idx
+        self.respondent_idx = respondent_idx
+        self.day_idx = day_idx
+        self._answers = None
+
+    def __len__(self):
+        return len(self.question_idx)
+
+    @property
+    def num_questions(self):
+        return len(self.question_labels)
+
+    @property
+    def max_choices(self):
+        """問題ごとの選択肢数の最大値"""
+        return max((len(labels) for labels in self.choice_labels), default=0)
+
+    @classmethod
+    def from_responses(cls, responses, questions=None):
+        """
+        回答（Response）から作成
+
+        Args:
+            responses: Responseのイテラブル
+            questions: 問題リスト（指定した場合は問題と選択肢の番号を問題リストの順にする）
+        """
+        encoder = _Encoder(questions)
+        for response in responses:
+            encoder.add(response.text_id, response.question_text, response.selected_choice,
+                        response.respondent_id, response.timestamp)
+        return encoder.build()
+
+    @classmethod
+    def from_files(cls, paths, questions=None):
+        """
+        回答ファイル（CSV・正規化CSV・JSON・JSON Lines）から作成
+
+        正規化CSV以外は回答ファイルの結合（response_merge.iter_file_rows）と同じ行を読み込む。
+
+        Args:
+            paths: 回答ファイルのパスのリスト
+            questions: 問題リスト（指定した場合は問題と選択肢の番号を問題リストの順にする）
+        """
+        intern = question_texts.intern
+        iter_file_rows = response_merge.iter_file_rows
+        encoder = _Encoder(questions)
+        add = encoder.add
+        for path in paths:
+            if path.endswith(NORMALIZED_EXTENSION):
+                _add_normalized_file(encoder, path)
+                continue
+            for respondent_id, timestamp, _, question_text, choice, _ in iter_file_rows(path):
+                add(intern(question_text), question_text, choice, respondent_id, timestamp)
+        return encoder.build()
+
+    def choice_counts(self):
+        """
+        問題ごとの選択肢の回答数
+
+        Returns:
+            (問題数, 最大選択肢数) の整数配列
+        """
+        width = self.max_choices
+        counts = np.bincount(
+            self.question_idx.astype(np.int64) * width + self.choice_idx,
+            minlength=self.num_questions * width
+        )
+        return counts.reshape(self.num_questions, width)
+
+    def distribution(self, question_index):
+        """
+        1問の選択肢ごとの回答数と割合
+
+        Returns:
+            (選択肢, 回答数, 割合) のリスト
+        """
+        labels = self.choice_labels[question_index]
+        counts = np.bincount(
+            self.choice_idx[self.question_idx == question_index], minlength=len(labels)
+        )
+        total = counts.sum()
+        return [
+            (label, int(count), float(count / total) if total else 0.0)
+            for label, count in zip(labels, counts)
+        ]
+
+    def answer_matrix(self):
+        """
+        回答者 × 問題 の選択肢番号の行列（未回答は-1、同じ問題に複数回答した場合は最後の回答）
+
+        Returns:
+            (回答者数, 問題数) の整数配列
+        """
+        if self._answers is None:
+            answers = np.full((len(self.respondent_ids), self.num_questions), -1, dtype=np.int32)
+            answers[self.respondent_idx, self.question_idx] = self.choice_idx
+            self._answers = answers
+        return self._answers
+
+    def crosstab(self, question_a, question_b):
+        """
+        2問のクロス集計（両方に回答した回答者のみ）
+
+        Args:
+            question_a: 行にする問題番号
+            question_b: 列にする問題番号
+
+        Returns:
+            (問題Aの選択肢数, 問題Bの選択肢数) の整数配列
+        """
+        answers = self.answer_matrix()
+        a = answers[:, question_a]
+        b = answers[:, question_b]
+        both = (a >= 0) & (b >= 0)
+        rows = len(self.choice_labels[question_a])
+        cols = len(self.choice_labels[question_b])
+        counts = np.bincount(a[both].astype(np.int64) * cols + b[both], minlength=rows * cols)
+        return counts.reshape(rows, cols)
+
+    def daily_counts(self):
+        """
+        日別・問題ごとの選択肢の回答数
+
+        Returns:
+            (日数, 問題数, 最大選択肢数) の整数配列（日付の順は self.days）
+        """
+        width = self.max_choices
+        cells = self.num_questions * width
+        counts = np.bincount(
+            self.day_idx.astype(np.int64) * cells + self.question_idx.astype(np.int64) * width
+            + self.choice_idx,
+            minlength=len(self.days) * cells
+        )
+        return counts.reshape(len(self.days), self.num_questions, width)
+
+    def daily_respondents(self):
+        """
+        日別の回答者数
+
+        Returns:
+            日付番号ごとの回答者数の整数配列
+        """
+        pairs = np.unique(self.day_idx.astype(np.int64) * len(self.respondent_ids) + self.respondent_idx)
+        return np.bincount(pairs // len(self.respondent_ids), minlength=len(self.days))
+
+
+def _add_normalized_file(encoder, path):
+    """正規化CSV形式の回答ファイルを追加（選択肢は問題マニフェストから復元する）"""
+    manifest = load_manifest(manifest_path_for(path))
+    for respondent_id, timestamp, _, question_id, choice_index, _ in iter_normalized_rows(path):
+        question = manifest[question_id]
+        encoder.add(question.text_id, question.text, question.choices[choice_index],
+                    respondent_id, timestamp)
+
+
+def find_response_files(directory, name_format=DEFAULT_CONFIG["response_name_format"]):
+    """
+    ディレクトリ内（シャード・コンパクションのセグメントを含む）の回答ファイルを探す
+
+    回答ファイルの結合（response_merge.find_response_files）と同じファイルを対象にする。
+
+    Args:
+        directory: 回答ディレクトリ
+        name_format: 回答ファイル名のフォーマット（response_name_format）
+    """
+    return response_merge.find_response_files(directory, name_format)
+
+
+if __name__ == "__main__":
+    import sys
+    from contextlib import ExitStack
+    from config_manager import ConfigManager
+
+    if len(sys.argv) < 2:
+        print("使い方: python aggregation.py <回答ディレクトリまたは回答ファイル>...")
+        sys.exit(1)
+
+    try:
+        require_numpy()
+    except ImportError as e:
+        print(e)
+        sys.exit(1)
+
+    name_format = ConfigManager().get("response_name_format")
+    with ExitStack() as stack:
+        paths = []
+        for arg in sys.argv[1:]:
+            if os.path.isdir(arg):
+                stack.enter_context(read_snapshot(arg))
+                paths.extend(find_response_files(arg, name_format))
+            else:
+                paths.append(arg)
+
+        matrix = ResponseMatrix.from_files(paths)
+    print(f"回答数: {len(matrix)}  回答者数: {len(matrix.respondent_ids)}  問題数: {matrix.num_questions}")
+    for index, label in enumerate(matrix.question_labels):
+        print(f"\n{label}")
+        for choice, count, ratio in matrix.distribution(index):
+            print(f"  {choice}: {count}件 ({ratio:.1%})")
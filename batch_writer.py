@@ -0,0 +1,122 @@
+"""
+バッチ書き込みモジュール - キューに積んだ項目をバックグラウンドスレッドでまとめて書き込む
+"""
+import queue
+import threading
+import time
+
+
+class _FlushRequest:
+    """書き込みスレッドへのフラッシュ要求"""
+
+    def __init__(self, stop=False):
+        self.stop = stop
+        self.done = threading.Event()
+
+
+class BatchWriter:
+    """
+    項目をメモリ上のキューに溜め、バックグラウンドスレッドでまとめて書き込むクラス
+
+    書き込みは次のいずれかの条件で行われる:
+    - 溜まった項目数が max_batch_size に達したとき
+    - 最初の項目を受け取ってから max_delay 秒経過したとき
+    - flush() / close() が呼ばれたとき
+    """
+
+    def __init__(self, write_batch, max_batch_size=50, max_delay=1.0, name="BatchWriter"):
+        """
+        Args:
+            write_batch: 項目のリストを受け取って書き込む関数
+            max_batch_size: 一度に書き込む最大項目数
+            max_delay: 項目を受け取ってから書き込むまでの最大待ち時間（秒）
+            name: スレッド名
+        """
+        self.write_batch = write_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_delay = max(0.0, float(max_delay))
+
+        self._queue = queue.Queue()
+        self._closed = False
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def put(self, item):
+        """項目をキューに追加（書き込みは行わずすぐに戻る）"""
+        with self._lock:
+            if not self._closed:
+                self._queue.put(item)
+                return
+        # 終了後に届いた項目は同期的に書き込む
+        self._write([item])
+
+    def flush(self, timeout=None):
+        """
+        これまでにキューに追加された項目をすべて書き込むまで待機
+
+        Args:
+            timeout: 最大待ち時間（秒）。Noneの場合は無制限
+
+        Returns:
+            時間内に書き込みが完了した場合True
+        """
+        if self._closed:
+            return True
+        request = _FlushRequest()
+        self._queue.put(request)
+        return request.done.wait(timeout)
+
+    def close(self, timeout=None):
+        """残りの項目を書き込んでスレッドを終了"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+
+        request = _FlushRequest(stop=True)
+        self._queue.put(request)
+        request.done.wait(timeout)
+        self._thread.join(timeout)
+
+    def _run(self):
+        """書き込みスレッドのメインループ"""
+        pending = []
+        deadline = None
+
+        while True:
+            timeout = None
+            if pending:
+                timeout = max(0.0, deadline - time.monotonic())
+
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                # 最大待ち時間に達した
+                self._write(pending)
+                pending = []
+                continue
+
+            if isinstance(item, _FlushRequest):
+                self._write(pending)
+                pending = []
+                item.done.set()
+                if item.stop:
+                    return
+                continue
+
+            pending.append(item)
+            if len(pending) == 1:
+                deadline = time.monotonic() + self.max_delay
+            if len(pending) >= self.max_batch_size:
+                self._write(pending)
+                pending = []
+
+    def _write(self, items):
+        """項目をまとめて書き込む"""
+        if not items:
+            return
+        try:
+            self.write_batch(items)
+        except Exception as e:
+            print(f"バッチ書き込みエラー: {e}")
@@ -0,0 +1,245 @@
+"""
+バイナリ形式のアクションログ - 固定長レコードと文字列テーブルでログを小さく保存する
+
+ファイル構造:
+    ヘッダー: MAGIC (b"FRLOG") + バージョン(1バイト)
+    以降はタグ(1バイト)付きのレコードの並び
+        b"H": セグメント開始。文字列テーブルをリセットする
+        b"S": 文字列定義  <II>(文字列ID, バイト長) + UTF-8文字列
+        b"E": イベント    <qIHHiihqq>(時刻ns, アクションコード, 問題番号, 移動先, 文字列ID,
+                                     回答者IDの文字列ID, 選択肢番号, モノトニック時刻ns,
+                                     直前のイベントからの経過ns)
+
+アクションコードはアクション種別の文字列IDで、問題番号・移動先は0の場合なし、
+文字列ID・選択肢番号・経過時間は-1の場合なしを表す。同じ文字列（選択肢など）は1度だけ保存される。
+バージョン1のイベントには回答者ID以降がなく（<qIHHi>）、
+バージョン2のイベントにはモノトニック時刻以降がない（<qIHHiih>）。
+"""
+import csv
+import json
+import os
+import struct
+import sys
+from file_lock import append_bytes, locked_append
+from log_events import LogEvent
+from log_rotation import open_log_file
+
+MAGIC = b"FRLOG"
+VERSION = 3
+
+TAG_SEGMENT = b"H"
+TAG_STRING = b"S"
+TAG_EVENT = b"E"
+
+STRING_HEADER = struct.Struct("<II")
+EVENT_RECORDS = {
+    1: struct.Struct("<qIHHi"),
+    2: struct.Struct("<qIHHiih"),
+    3: struct.Struct("<qIHHiihqq")
+}
+
+
+class BinaryLogWriter:
+    """バイナリ形式でログを追記するクラス"""
+
+    def __init__(self, log_file):
+        self.log_file = log_file
+        self._strings = {}
+        self._segment_end = None
+        self.version = VERSION
+        self.initialize_log_file()
+
+    def initialize_log_file(self):
+        """ログファイルを初期化（新規の場合はヘッダーを書き込む）"""
+        if not os.path.exists(self.log_file) or os.path.getsize(self.log_file) == 0:
+            # 他のプロセスが同時に作成してもヘッダーは1回だけ書き込まれる
+            append_bytes(self.log_file, b"", header=MAGIC + bytes([VERSION]))
+        if os.path.getsize(self.log_file) > len(MAGIC):
+            # 既存ファイルにはそのファイルのバージョンで追記する
+            self.version = _read_header(self.log_file)
+
+    def write_events(self, events):
+        """
+        イベントをまとめて追記
+
+        Args:
+            events: LogEventのリスト
+        """
+        # ロックを取得して1回で追記する（複数プロセスで共有しても文字列テーブルが壊れない）
+        with locked_append(self.log_file) as f:
+            buf = bytearray()
+
+            # ローテーション直後などでファイルが空の場合はヘッダーから書き込む
+            if f.tell() == 0:
+                buf += MAGIC + bytes([VERSION])
+                self.version = VERSION
+                self._segment_end = None
+
+            # 前回の書き込み以降に他から追記されていたら新しいセグメントを始める
+            if self._segment_end is None or f.tell() != self._segment_end:
+                buf += TAG_SEGMENT
+                self._strings = {}
+
+            for event in events:
+                fields = [
+                    event.time_ns,
+                    self._intern(buf, event.action),
+                    event.question_num or 0,
+                    event.to_num or 0,
+                    self._intern(buf, event.text)
+                ]
+                if self.version >= 2:
+                    fields.append(self._intern(buf, event.respondent_id))
+                    fields.append(-1 if event.choice_index is None else event.choice_index)
+                if self.version >= 3:
+                    fields.append(event.mono_ns or 0)
+                    fields.append(-1 if event.delta_ns is None else event.delta_ns)
+                buf += TAG_EVENT
+                buf += EVENT_RECORDS[self.version].pack(*fields)
+
+            f.write(buf)
+            self._segment_end = f.tell()
+
+    def _intern(self, buf, text):
+        """文字列のIDを取得（初出の場合は文字列定義をbufに追加、Noneの場合は-1）"""
+        if text is None:
+            return -1
+        string_id = self._strings.get(text)
+        if string_id is None:
+            string_id = len(self._strings)
+            self._strings[text] = string_id
+            encoded = text.encode('utf-8')
+            buf += TAG_STRING
+            buf += STRING_HEADER.pack(string_id, len(encoded))
+            buf += encoded
+        return string_id
+
+
+def _read_header(filepath):
+    """ファイルヘッダーを確認してバージョンを返す"""
+    with open_log_file(filepath, 'rb') as f:
+        return _check_header(f, filepath)
+
+
+def _check_header(f, filepath):
+    """ファイル先頭のヘッダーを読み込んでバージョンを返す"""
+    header = f.read(len(MAGIC) + 1)
+    if len(header) <= len(MAGIC) or header[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"バイナリログではありません: {filepath}")
+    version = header[len(MAGIC)]
+    if version not in EVENT_RECORDS:
+        raise ValueError(f"未対応のバージョンです: {version}")
+    return version
+
+
+def read_binary_log(filepath):
+    """
+    バイナリ形式のログを先頭から順に読み込む
+
+    Args:
+        filepath: ログファイルのパス（圧縮済みのセグメントも可）
+
+    Yields:
+        LogEvent
+    """
+    with open_log_file(filepath, 'rb') as f:
+        record = EVENT_RECORDS[_check_header(f, filepath)]
+
+        strings = []
+        while True:
+            tag = f.read(1)
+            if not tag:
+                break
+
+            if tag == TAG_EVENT:
+                data = f.read(record.size)
+                if len(data) < record.size:
+                    break  # 書き込み途中のレコード
+                fields = record.unpack(data)
+                respondent_id = choice_index = mono_ns = delta_ns = None
+                if len(fields) > 5:
+                    respondent_id = strings[fields[5]] if fields[5] >= 0 else None
+                    choice_index = fields[6] if fields[6] >= 0 else None
+                if len(fields) > 7:
+                    mono_ns = fields[7]
+                    delta_ns = fields[8] if fields[8] >= 0 else None
+                yield LogEvent(
+                    fields[0],
+                    strings[fields[1]],
+                    fields[2] or None,
+                    fields[3] or None,
+                    strings[fields[4]] if fields[4] >= 0 else None,
+                    respondent_id,
+                    choice_index,
+                    mono_ns,
+                    delta_ns
+                )
+            elif tag == TAG_STRING:
+                data = f.read(STRING_HEADER.size)
+                if len(data) < STRING_HEADER.size:
+                    break
+                string_id, length = STRING_HEADER.unpack(data)
+                encoded = f.read(length)
+                if len(encoded) < length:
+                    break
+                if string_id != len(strings):
+                    raise ValueError(f"文字列テーブルが壊れています: {filepath}")
+                strings.append(encoded.decode('utf-8'))
+            elif tag == TAG_SEGMENT:
+                strings = []
+            else:
+                raise ValueError(f"不明なレコードです: {tag!r}")
+
+
+def convert_binary_log(src_path, dst_path, output_format=None):
+    """
+    バイナリ形式のログをCSVまたはJSONに変換（1件ずつ処理するため大きなログでも使用可能）
+
+    Args:
+        src_path: バイナリログのパス
+        dst_path: 出力先のパス
+        output_format: "csv" または "json"（Noneの場合は出力先の拡張子から判定）
+
+    Returns:
+        変換したイベント数
+    """
+    if output_format is None:
+        output_format = "json" if dst_path.endswith(".json") else "csv"
+
+    count = 0
+    if output_format == "csv":
+        with open(dst_path, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['タイムスタンプ', 'アクション種別', '詳細情報'])
+            for event in read_binary_log(src_path):
+                writer.writerow([event.timestamp, event.action, event.details])
+                count += 1
+    elif output_format == "json":
+        with open(dst_path, 'w', encoding='utf-8') as f:
+            f.write('{"events": [')
+            for event in read_binary_log(src_path):
+                if count:
+                    f.write(',')
+                f.write('\n  ')
+                json.dump({
+                    "timestamp": event.timestamp,
+                    "action": event.action,
+                    "details": event.details
+                }, f, ensure_ascii=False)
+                count += 1
+            f.write(f'\n], "total_events": {count}}}\n')
+    else:
+        raise ValueError(f"未対応の出力形式です: {output_format}")
+
+    return count
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("使い方: python binary_log.py <バイナリログ> [出力ファイル(.csv/.json)]")
+        sys.exit(1)
+
+    src = sys.argv[1]
+    dst = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(src)[0] + ".csv"
+    total = convert_binary_log(src, dst)
+    print(f"✓ {total}件のイベントを変換: {dst}")
@@ -0,0 +1,432 @@
+"""
+コンパクション - 回答者ごとの小さな回答ファイル・ログファイルを日ごとのセグメントファイルにまとめる
+
+一定時間更新されていない（閉じた）回答者ごとのファイルを、日付と形式ごとに
+compacted_<日付>_<番号>.<拡張子> のセグメントファイルへまとめ、元のファイルを削除する。
+ディレクトリ内のファイル数が減るため、ディレクトリの走査・バックアップ・分析が速くなる。
+
+どのセグメントが有効か、どの元ファイルがセグメントに取り込み済みかはマニフェスト
+（compaction_manifest.json）に記録する。マニフェストの置き換えが唯一の確定点で、
+    1. 元ファイルのロックを取得して内容を読み込む（書き込み中のファイルは飛ばす）
+    2. セグメントファイルを書き込む（まだマニフェストにないため読み込み側には見えない）
+    3. マニフェストを置き換える（セグメントを有効にし、元ファイルを取り込み済みとして記録）
+    4. ロックを保持したまま元ファイルを削除する（Windowsでは空にする）
+の順に行う。読み込み側が visible_files() を通してファイルを選べば、どの時点で中断しても、
+コンパクションの前後で同じ回答・ログを1回ずつ読み込める（ファイルの並び順は変わる）。
+ファイルを探してから読み終わるまでを read_snapshot() の中で行えば、3・4はその間待たされるため、
+読み込む前に元ファイルが削除されることもない。
+
+ロックを待っていたアプリは、ロックを取得した後にファイルが削除されたことに気づき、
+新しいファイルを作って書き込む（file_lock.locked_append）ため、書き込み中に実行しても回答は失われない。
+
+回答ファイルはCSV・JSON Lines・正規化CSVが対象で、JSON・バイナリ・SQLite形式はまとめない
+（出力形式が both の場合の、同じ名前のJSONがあるCSVもまとめない）。
+ログファイルは各行に回答者IDを含むJSON Lines形式だけが対象で、回答者IDの列がないCSV形式のログは
+まとめると回答者の区切りが失われるためまとめない。ローテーションしたセグメントがあるログもまとめない
+（log_reader.read_rotated_log_events がログのパスから続きを探すため）。
+"""
+import codecs
+import json
+import os
+import re
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from file_lock import fcntl, is_same_file, locked_shared, locked_update, try_lock, unlock
+from filename_template import compile_template
+from normalized_output import NORMALIZED_EXTENSION
+from sharding import iter_shard_directories
+from constants import COMPACTION_MANIFEST_FILE, COMPACTION_MIN_AGE, COMPACTION_BATCH_SIZE
+
+SEGMENT_PREFIX = "compacted_"
+COMPACTABLE_EXTENSIONS = (NORMALIZED_EXTENSION, ".csv", ".jsonl")
+COMPACTABLE_LOG_EXTENSIONS = (".jsonl",)  # CSV形式のログは回答者IDの列がないためまとめない
+LOCK_FILE = ".compaction.lock"  # コンパクションを同時に1つだけ実行するためのロック
+COMMIT_LOCK_FILE = ".compaction.commit.lock"  # 確定・元ファイルの削除と読み込みを分けるためのロック
+
+# ローテーションしたログのセグメント（<ログ>.<日時>.jsonl.gz など）の、ログの拡張子を除いた部分
+_ROTATED_SEGMENT = re.compile(r"(.+)\.\d{20}\.")
+
+
+def _split_extension(name):
+    """ファイル名を拡張子（.norm.csv なども含む）とそれ以外に分ける"""
+    for ext in COMPACTABLE_EXTENSIONS:
+        if name.endswith(ext):
+            return name[:-len(ext)], ext
+    return name, None
+
+
+def is_segment(name):
+    """セグメントファイルの名前かどうか"""
+    return name.startswith(SEGMENT_PREFIX)
+
+
+def load_manifest(directory):
+    """
+    マニフェストを読み込む
+
+    Returns:
+        {"segments": [有効なセグメントのファイル名, ...],
+         "pending": {取り込み済みでまだ残っている元ファイル名: [サイズ, 更新時刻(ns)], ...}}
+    """
+    try:
+        with open(os.path.join(directory, COMPACTION_MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        manifest = {}
+    manifest.setdefault("segments", [])
+    manifest.setdefault("pending", {})
+    return manifest
+
+
+def _save_manifest(directory, manifest):
+    """マニフェストを一時ファイルに書いてから置き換える"""
+    manifest_path = os.path.join(directory, COMPACTION_MANIFEST_FILE)
+    temp_path = f"{manifest_path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, manifest_path)
+
+
+def visible_files(directory, scan):
+    """
+    ディレクトリを走査して、読み込むべきファイルを選ぶ
+
+    確定していないセグメントと、セグメントに取り込み済みでまだ削除されていない元ファイルを除く。
+    走査中にコンパクションが進んだ場合（前後でマニフェストが変わった場合）は走査し直すため、
+    どの時点で呼び出しても、同じ回答・ログをちょうど1回ずつ含む。
+
+    Args:
+        directory: ディレクトリ
+        scan: ディレクトリ内のファイル（セグメントを含む）のパスのリストを返す関数
+
+    Returns:
+        読み込むべきファイルのパスのリスト（順序はscanの結果のまま）
+    """
+    manifest = load_manifest(directory)
+    while True:
+        paths = scan()
+        latest = load_manifest(directory)
+        if latest == manifest:
+            break
+        manifest = latest
+
+    segments = set(manifest["segments"])
+    pending = manifest["pending"]
+    result = []
+    for path in paths:
+        name = os.path.basename(path)
+        if is_segment(name):
+            if name in segments:
+                result.append(path)
+            continue
+        recorded = pending.get(name)
+        if recorded and _stat_key(path) == tuple(recorded):
+            continue
+        result.append(path)
+    return result
+
+
+def is_compactable_segment(name):
+    """まとめた回答・ログを読み込めるセグメントファイルの名前かどうか"""
+    return is_segment(name) and _split_extension(name)[1] is not None
+
+
+@contextmanager
+def read_snapshot(directory):
+    """
+    読み込みが終わるまで、コンパクションの確定と元ファイルの削除（シャードへの移動も）を待たせる
+
+    ファイルを探してから読み終わるまでをこの中で行えば、読み込む前にファイルが削除されることはない。
+    複数の読み込みは同時に行える。書き込み側（アプリ）は待たない。
+
+        with read_snapshot(directory):
+            paths = find_response_files(directory, name_format)
+            ...
+    """
+    os.makedirs(directory, exist_ok=True)
+    with locked_shared(os.path.join(directory, COMMIT_LOCK_FILE)):
+        yield
+
+
+def list_segments(directory):
+    """有効なセグメントファイルのパスを古い順に取得"""
+    return [
+        os.path.join(directory, name) for name in load_manifest(directory)["segments"]
+        if os.path.exists(os.path.join(directory, name))
+    ]
+
+
+def _stat_key(path):
+    """ファイルのサイズと更新時刻（存在しない場合はNone）"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def compact_directory(directory, name_format, min_age=COMPACTION_MIN_AGE, batch_size=COMPACTION_BATCH_SIZE,
+                      extensions=COMPACTABLE_EXTENSIONS):
+    """
+    ディレクトリ内（シャードを含む）の閉じたファイルを日ごとのセグメントにまとめる
+
+    Args:
+        directory: 回答ディレクトリまたはログディレクトリ
+        name_format: ファイル名のフォーマット（response_name_format / log_name_format）
+        min_age: この秒数以上更新されていないファイルだけをまとめる
+        batch_size: 1つのセグメントにまとめる最大ファイル数
+        extensions: まとめるファイルの拡張子（ログディレクトリの場合は COMPACTABLE_LOG_EXTENSIONS）
+
+    Returns:
+        (まとめたファイル数, 作成したセグメント数) のタプル
+    """
+    pattern = compile_template(_split_extension(name_format)[0]).pattern
+    threshold_ns = time.time_ns() - int(min_age * 1_000_000_000)
+    commit_lock = os.path.join(directory, COMMIT_LOCK_FILE)
+
+    files = segments = 0
+    with locked_update(os.path.join(directory, LOCK_FILE)):
+        # シャードに分けている場合はシャードごとにまとめる（ロックはディレクトリ全体で1つ）
+        for shard in list(iter_shard_directories(directory)):
+            compacted, created = _compact_shard(shard, commit_lock, pattern, threshold_ns, batch_size, extensions)
+            files += compacted
+            segments += created
+    return files, segments
+
+
+def _compact_shard(directory, commit_lock, pattern, threshold_ns, batch_size, extensions):
+    """1つのディレクトリ（シャード）の閉じたファイルをまとめる"""
+    manifest = load_manifest(directory)
+    with locked_update(commit_lock):
+        _finish_pending(directory, manifest)
+    _remove_orphans(directory, manifest, threshold_ns)
+
+    with os.scandir(directory) as entries:
+        files = [entry for entry in entries if entry.is_file() and not is_segment(entry.name)]
+    rotated = {match.group(1) for match in map(_ROTATED_SEGMENT.match, (entry.name for entry in files)) if match}
+    # 出力形式が both の場合のCSVは、まとめると同じ名前のJSONと組にならず同じ回答を2回読み込むためまとめない
+    names = {entry.name for entry in files}
+
+    groups = {}  # (日付, 拡張子) → パスのリスト
+    for entry in files:
+        base, ext = _split_extension(entry.name)
+        match = ext in extensions and base not in rotated and base + ".json" not in names and pattern.fullmatch(base)
+        if not match:
+            continue
+        stat = entry.stat()
+        if stat.st_mtime_ns > threshold_ns or stat.st_size == 0:
+            continue
+        day = match.groupdict().get("date") or datetime.fromtimestamp(stat.st_mtime).strftime("%Y%m%d")
+        groups.setdefault((day, ext), []).append(entry.path)
+
+    files = segments = 0
+    for (day, ext), paths in sorted(groups.items()):
+        paths.sort()
+        for i in range(0, len(paths), batch_size):
+            # 読み込み中のプロセスがあれば、元ファイルのロックを取得する前に待つ（アプリの書き込みを待たせない）
+            with locked_update(commit_lock):
+                compacted, created = _compact_batch(directory, manifest, day, ext, paths[i:i + batch_size])
+            files += compacted
+            segments += created
+
+    return files, segments
+
+
+def _compact_batch(directory, manifest, day, ext, paths):
+    """
+    ファイルをまとめて1つ以上のセグメントにする（CSVはヘッダーごとに別のセグメント）
+
+    Returns:
+        (まとめたファイル数, 作成したセグメント数) のタプル
+    """
+    opened = []
+    try:
+        # 1. ロックを取得して読み込む（ロックは元ファイルを削除するまで保持する）
+        bodies = {}  # ヘッダー → 本文のリスト
+        for path in paths:
+            f = _open_locked(path)
+            if f is None:
+                continue
+            data = f.read()
+            opened.append((path, f, os.fstat(f.fileno())))
+
+            header = b""
+            if ext == ".jsonl":
+                # 改行で終わっていない最後の行は読み込み側（utils.iter_jsonl）と同じく書き込み途中として除く
+                data = data[:data.rfind(b"\n") + 1]
+            else:
+                if data.startswith(codecs.BOM_UTF8):
+                    data = data[len(codecs.BOM_UTF8):]
+                line_end = data.find(b"\n") + 1
+                header, data = (data[:line_end], data[line_end:]) if line_end else (data, b"")
+                if data and not data.endswith(b"\n"):
+                    data += b"\n"
+            bodies.setdefault(header, []).append(data)
+
+        if not opened:
+            return 0, 0
+
+        # 2. セグメントを書き込む
+        created = []
+        for header, chunks in bodies.items():
+            name = _next_segment_name(directory, manifest, day, ext)
+            prefix = codecs.BOM_UTF8 + header if header else b""
+            _write_file(os.path.join(directory, name), [prefix] + chunks)
+            created.append(name)
+            manifest["segments"].append(name)
+
+        # 3. マニフェストを置き換えて確定する
+        for path, _, stat in opened:
+            manifest["pending"][os.path.basename(path)] = [stat.st_size, stat.st_mtime_ns]
+        _save_manifest(directory, manifest)
+
+        # 4. 元ファイルを削除する
+        for path, f, _ in opened:
+            _discard_locked(path, f)
+        _prune_pending(directory, manifest)
+
+        return len(opened), len(created)
+    finally:
+        for _, f, _ in opened:
+            try:
+                unlock(f)
+            except (OSError, ValueError):
+                pass
+            f.close()
+
+
+def _open_locked(path):
+    """ファイルを開いてロックを取得（他のアプリが書き込み中の場合はNone）"""
+    try:
+        f = open(path, 'r+b')
+    except OSError:
+        return None
+    if not try_lock(f):
+        f.close()
+        return None
+    if not is_same_file(f, path):
+        unlock(f)
+        f.close()
+        return None
+    f.seek(0)
+    return f
+
+
+def _discard_locked(path, f):
+    """
+    ロックを保持したまま取り込み済みの元ファイルを削除
+
+    Windowsでは開いているファイルを削除できないため、空にしておく
+    （次回のコンパクションで、空のまま更新されていなければ削除する）。
+    ログの索引（<ログ>.idx）は元ファイルの位置を指しているため一緒に削除する。
+    """
+    from log_index import INDEX_SUFFIX
+
+    try:
+        if fcntl:
+            os.remove(path)
+        else:
+            f.seek(0)
+            f.truncate()
+            f.flush()
+        if os.path.exists(path + INDEX_SUFFIX):
+            os.remove(path + INDEX_SUFFIX)
+    except OSError as e:
+        print(f"コンパクション元ファイル削除エラー: {e}")
+
+
+def _finish_pending(directory, manifest):
+    """前回中断したコンパクションで取り込み済みのまま残った元ファイルを削除"""
+    for name, recorded in list(manifest["pending"].items()):
+        path = os.path.join(directory, name)
+        if _stat_key(path) != tuple(recorded):
+            continue
+        f = _open_locked(path)
+        if f is None:
+            continue
+        try:
+            if _stat_key(path) == tuple(recorded):
+                _discard_locked(path, f)
+        finally:
+            unlock(f)
+            f.close()
+    _prune_pending(directory, manifest)
+
+
+def _prune_pending(directory, manifest):
+    """削除済み（または空にした後で更新された）元ファイルをマニフェストから除く"""
+    pending = manifest["pending"]
+    remaining = {
+        name: recorded for name, recorded in pending.items()
+        if _stat_key(os.path.join(directory, name)) == tuple(recorded)
+    }
+    if remaining != pending:
+        manifest["pending"] = remaining
+        _save_manifest(directory, manifest)
+
+
+def _remove_orphans(directory, manifest, threshold_ns):
+    """中断したコンパクションのセグメントと一時ファイル、Windowsで空にした古いファイルを削除"""
+    segments = set(manifest["segments"])
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            try:
+                if is_segment(entry.name) and entry.name not in segments:
+                    os.remove(entry.path)
+                elif entry.name.endswith(".tmp") and (is_segment(entry.name)
+                                                      or entry.name.startswith(COMPACTION_MANIFEST_FILE)):
+                    os.remove(entry.path)
+                elif not fcntl and _split_extension(entry.name)[1]:
+                    stat = entry.stat()
+                    if stat.st_size == 0 and stat.st_mtime_ns <= threshold_ns:
+                        os.remove(entry.path)
+            except OSError:
+                continue  # 他のアプリが開いている
+
+
+def _next_segment_name(directory, manifest, day, ext):
+    """まだ使われていないセグメントファイル名"""
+    used = set(manifest["segments"])
+    number = 1
+    while True:
+        name = f"{SEGMENT_PREFIX}{day}_{number:04d}{ext}"
+        if name not in used and not os.path.exists(os.path.join(directory, name)):
+            return name
+        number += 1
+
+
+def _write_file(path, chunks):
+    """ファイルを一時ファイルに書いてから置き換える"""
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'wb') as f:
+            f.writelines(chunks)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+if __name__ == "__main__":
+    import sys
+    from config_manager import ConfigManager
+
+    config_manager = ConfigManager()
+    min_age = float(sys.argv[1]) if len(sys.argv) > 1 else COMPACTION_MIN_AGE
+
+    for directory_key, format_key, extensions in (
+            ("response_directory", "response_name_format", COMPACTABLE_EXTENSIONS),
+            ("log_directory", "log_name_format", COMPACTABLE_LOG_EXTENSIONS)):
+        directory = config_manager.get(directory_key, "")
+        if not directory or not os.path.isdir(directory):
+            continue
+        compacted, created = compact_directory(directory, config_manager.get(format_key), min_age,
+                                               extensions=extensions)
+        print(f"✓ {directory}: {compacted}ファイルを{created}個のセグメントにまとめました")
@@ -4,7 +4,10 @@
 import json
 import os
 from datetime import datetime
-from constants import DEFAULT_CONFIG, CONFIG_FILE
+from filename_template import compile_template, validate_template
+from sequence_allocator import allocate_sequence
+from sharding import shard_key, shard_subdirectory
+from constants import DEFAULT_CONFIG, CONFIG_FILE, DATABASE_FILE, LOG_FORMAT_EXTENSIONS
 
 
 class ConfigManager:
@@ -28,6 +31,13 @@ class ConfigManager:
             except Exception as e:
                 print(f"設定ファイルの読み込みエラー: {e}")
 
+        # ファイル名のフォーマットを検証（使えない変数がある場合はデフォルトに戻す）
+        for key in ("log_name_format", "response_name_format"):
+            error = validate_template(default_config[key])
+            if error:
+                print(f"設定エラー ({key}): {error}")
+                default_config[key] = DEFAULT_CONFIG[key]
+
         return default_config
 
     def save_config(self):
@@ -57,57 +67,113 @@ class ConfigManager:
             return os.path.join(questions_dir, questions_file)
         return None
 
-    def get_log_path(self, respondent_id=None):
-        """ログファイルのパスを取得"""
-        log_dir = self.get("log_directory", "")
-        log_name_format = self.get("log_name_format", "action_log_{date}.csv")
-
-        if not log_dir:
-            log_dir = "."
+    def get_database_path(self):
+        """SQLiteデータベースのパスを取得"""
+        return self.get("database_path", "") or DATABASE_FILE
 
-        # フォーマット文字列を置換
-        now = datetime.now()
-        filename = log_name_format.replace("{date}", now.strftime("%Y%m%d"))
-        filename = filename.replace("{time}", now.strftime("%H%M%S"))
-        if respondent_id:
-            filename = filename.replace("{respondent_id}", respondent_id)
+    def get_log_format(self):
+        """ログ形式を取得（出力形式がsqliteの場合は操作ログも同じデータベースに保存する）"""
+        if self.get("output_format", "csv") == "sqlite":
+            return "sqlite"
+        return self.get("log_format", "csv")
 
-        # 連番を処理
-        if "{sequence}" in filename:
-            from utils import get_next_sequence_number
-            seq_num = get_next_sequence_number(log_dir, filename)
-            filename = filename.replace("{sequence}", str(seq_num).zfill(3))
-
-        return os.path.join(log_dir, filename)
+    def get_log_path(self, respondent_id=None):
+        """ログファイルのパスを取得"""
+        return self.get_log_paths([respondent_id])[0]
+
+    def get_log_paths(self, respondent_ids, now=None):
+        """
+        複数セッション分のログファイルのパスをまとめて取得
+
+        Args:
+            respondent_ids: 回答者IDのリスト
+            now: ファイル名の日付・時刻に使う日時（Noneの場合は現在時刻）
+        """
+        if self.get_log_format() == "sqlite":
+            return [self.get_database_path()] * len(respondent_ids)
+
+        paths = self._build_paths(
+            self.get("log_directory", ""),
+            self.get("log_name_format", "action_log_{date}.csv"),
+            respondent_ids, now
+        )
+
+        # ログ形式に合わせて拡張子を変更
+        log_format = self.get_log_format()
+        if log_format in LOG_FORMAT_EXTENSIONS:
+            paths = [os.path.splitext(path)[0] + LOG_FORMAT_EXTENSIONS[log_format] for path in paths]
+        return paths
 
     def get_response_path(self, respondent_id):
         """回答ファイルのパスを取得"""
-        response_dir = self.get("response_directory", "")
-        response_name_format = self.get("response_name_format", "responses_{respondent_id}_{date}.csv")
-
-        if not response_dir:
-            response_dir = "."
-
-        # フォーマット文字列を置換
-        now = datetime.now()
-        filename = response_name_format.replace("{date}", now.strftime("%Y%m%d"))
-        filename = filename.replace("{time}", now.strftime("%H%M%S"))
-        filename = filename.replace("{respondent_id}", respondent_id)
-
-        # 連番を処理
-        if "{sequence}" in filename:
-            from utils import get_next_sequence_number
-            seq_num = get_next_sequence_number(response_dir, filename)
-            filename = filename.replace("{sequence}", str(seq_num).zfill(3))
-
-        return os.path.join(response_dir, filename)
+        return self.get_response_paths([respondent_id])[0]
+
+    def get_response_paths(self, respondent_ids, now=None):
+        """
+        複数セッション分の回答ファイルのパスをまとめて取得
+
+        Args:
+            respondent_ids: 回答者IDのリスト
+            now: ファイル名の日付・時刻に使う日時（Noneの場合は現在時刻）
+        """
+        return self._build_paths(
+            self.get("response_directory", ""),
+            self.get("response_name_format", "responses_{respondent_id}_{date}.csv"),
+            respondent_ids, now
+        )
+
+    def _build_paths(self, directory, name_format, respondent_ids, now=None):
+        """
+        ファイル名のフォーマットからパスを作成
+
+        日付・時刻はすべてのパスで同じ日時を使い、連番はまとめて割り当てる。
+
+        Raises:
+            ValueError: フォーマットに使えない変数が含まれる場合
+        """
+        if not directory:
+            directory = "."
+        if now is None:
+            now = datetime.now()
+        template = compile_template(name_format)
+
+        filenames = template.render_many(respondent_ids, now)
+
+        # 連番を処理（同じファイル名になるものごとに連続した番号を割り当てる）
+        if template.has_sequence:
+            positions = {}
+            for i, filename in enumerate(filenames):
+                positions.setdefault(filename, []).append(i)
+            for base_filename, indexes in positions.items():
+                first = allocate_sequence(directory, base_filename, len(indexes))
+                for offset, i in enumerate(indexes):
+                    filenames[i] = base_filename.replace("{sequence}", str(first + offset).zfill(3))
+
+        # ディレクトリを分けている場合はシャードのパスにする（連番はディレクトリ全体で割り当てる）
+        scheme = self.get("directory_sharding", "none")
+        if scheme == "none":
+            return [os.path.join(directory, filename) for filename in filenames]
+
+        day = now.strftime("%Y%m%d")
+        paths = []
+        for respondent_id, filename in zip(respondent_ids, filenames):
+            shard = os.path.join(directory, shard_subdirectory(scheme, shard_key(template, respondent_id), day))
+            if not os.path.isdir(shard):
+                try:
+                    os.makedirs(shard, exist_ok=True)
+                except OSError as e:
+                    print(f"ディレクトリ作成エラー: {e}")
+            paths.append(os.path.join(shard, filename))
+        return paths
 
     def ensure_directories(self):
         """必要なディレクトリを作成"""
         dirs = [
             self.get("questions_directory"),
             self.get("log_directory"),
-            self.get("response_directory")
+            self.get("response_directory"),
+            self.get("journal_directory"),
+            os.path.dirname(self.get_database_path())
         ]
 
         for directory in dirs:
@@ -12,12 +12,15 @@ DATA_DIR = os.path.join(BASE_DIR, "data")
 QUESTIONS_DIR = os.path.join(DATA_DIR, "questions")
 RESPONSES_DIR = os.path.join(DATA_DIR, "responses")
 LOGS_DIR = os.path.join(DATA_DIR, "logs")
+JOURNAL_DIR = os.path.join(DATA_DIR, "journal")
 
 # ========================================
 # ファイル名
 # ========================================
 CONFIG_FILE = "config.json"
 DEFAULT_QUESTIONS_FILE = "sample_questions.csv"
+DATABASE_FILE = os.path.join(DATA_DIR, "survey.sqlite3")
+QUESTION_MANIFEST_FILE = "question_manifest.jsonl"  # 正規化した回答出力の問題マニフェスト
 
 # ========================================
 # UI設定
@@ -27,6 +30,7 @@ MAIN_WINDOW_SIZE = "900x700"
 EDITOR_WINDOW_SIZE = "1000x750"
 SETTINGS_WINDOW_SIZE = "800x650"
 SURVEY_WINDOW_SIZE = "900x800"
+DASHBOARD_WINDOW_SIZE = "900x750"
 
 # フォント
 FONT_FAMILY = "Yu Gothic"
@@ -64,6 +68,74 @@ LOG_ACTIONS = {
 # ログのテキストプレビュー文字数
 LOG_TEXT_PREVIEW_LENGTH = 100
 
+# ログ形式と拡張子
+LOG_FORMAT_EXTENSIONS = {
+    "csv": ".csv",
+    "binary": ".frlog",
+    "jsonl": ".jsonl",
+    "sqlite": ".sqlite3"
+}
+
+# バッファリング時のログ書き込み設定
+LOG_FLUSH_BATCH_SIZE = 50  # 一度に書き込む最大件数
+LOG_FLUSH_INTERVAL = 1.0  # 書き込むまでの最大待ち時間（秒）
+
+# ========================================
+# 問題キャッシュ設定
+# ========================================
+QUESTION_CACHE_SIZE = 8  # メモリに保持する問題ファイルの最大数
+QUESTION_PAGE_SIZE = 64  # 大きな問題ファイルを一度に解析する問題数
+QUESTION_MAX_PAGES = 16  # メモリに保持する最大ページ数
+QUESTION_COUNT_STEP = 10000  # 問題数を数えるときに1回で索引を作成する問題数（画面を止めない量）
+
+# ========================================
+# キー入力記録設定
+# ========================================
+KEYSTROKE_BUFFER_SIZE = 4096  # リングバッファに保持する最大キー入力数
+KEYSTROKE_FLUSH_INTERVAL = 2.0  # ファイルへ書き込む間隔（秒）
+
+# ========================================
+# SQLite設定
+# ========================================
+SQLITE_BUSY_TIMEOUT = 30.0  # 他のプロセスが書き込み中の場合に待つ最大時間（秒）
+
+# ========================================
+# タイムライン作成設定
+# ========================================
+TIMELINE_MAX_OPEN_SESSIONS = 10000  # 同時に保持する未完了セッションの最大数
+TIMELINE_IDLE_TIMEOUT = 6 * 60 * 60  # この秒数操作がないセッションは未完了として出力
+
+# ========================================
+# 回答ファイル結合設定
+# ========================================
+MERGE_CHUNK_SIZE = 64  # 1つのプロセスにまとめて渡す回答ファイル数
+
+# ========================================
+# 回答集計表設定
+# ========================================
+TALLY_FILE = "response_tally.json"  # 回答ディレクトリに置く集計表
+DASHBOARD_REFRESH_INTERVAL = 2000  # ダッシュボードの更新間隔（ミリ秒）
+DASHBOARD_THROUGHPUT_HOURS = 3  # 1時間あたりのセッション数を平均する時間数
+
+# ========================================
+# ディレクトリ分割設定
+# ========================================
+DIRECTORY_SHARDING_SCHEMES = ["none", "date", "hash", "date_hash"]  # 分け方（日付・回答者IDのハッシュ）
+SHARD_HASH_LENGTH = 2  # ハッシュで分ける場合のディレクトリ名の桁数（16進数、2桁で256個）
+
+# ========================================
+# コンパクション設定
+# ========================================
+COMPACTION_MANIFEST_FILE = "compaction_manifest.json"  # セグメントの一覧を記録するファイル
+COMPACTION_MIN_AGE = 3600  # この秒数以上更新されていないファイルをまとめる
+COMPACTION_BATCH_SIZE = 500  # 1つのセグメントにまとめる最大ファイル数
+
+# ========================================
+# セッションジャーナル設定
+# ========================================
+JOURNAL_COMMIT_BATCH_SIZE = 20  # 一度にディスクへ書き込む最大レコード数
+JOURNAL_COMMIT_INTERVAL = 0.5  # ディスクへ書き込むまでの最大待ち時間（秒）
+
 # ========================================
 # バリデーション設定
 # ========================================
@@ -91,9 +163,26 @@ DEFAULT_CONFIG = {
     "log_name_format": "action_log_{respondent_id}_{date}.csv",
     "response_directory": RESPONSES_DIR,
     "response_name_format": "responses_{respondent_id}_{date}.csv",
+    "directory_sharding": "none",
+    "log_format": "csv",
+    "log_timing_columns": False,
+    "log_rotate_max_bytes": 0,
+    "log_rotate_daily": False,
+    "log_compression": "gzip",
+    "log_max_archives": 0,
+    "log_index": False,
+    "log_buffered": False,
+    "log_flush_batch_size": LOG_FLUSH_BATCH_SIZE,
+    "log_flush_interval": LOG_FLUSH_INTERVAL,
+    "keystroke_capture": False,
+    "keystroke_flush_interval": KEYSTROKE_FLUSH_INTERVAL,
+    "journal_directory": JOURNAL_DIR,
+    "journal_commit_batch_size": JOURNAL_COMMIT_BATCH_SIZE,
+    "journal_commit_interval": JOURNAL_COMMIT_INTERVAL,
     "appearance_mode": "System",
     "color_theme": "blue",
     "output_format": "csv",
+    "database_path": DATABASE_FILE,
     "font_size": "medium",
     "auto_save": True
 }
@@ -111,3 +200,9 @@ MSG_CANNOT_CHANGE_CHOICE = "理由を書き始めた後は選択肢を変更で
 MSG_CHANGE_DISABLED_STATUS = "⚠ 理由を書き直してから選択肢を変更してください"
 MSG_REASON_STARTED_STATUS = "理由を書き直すまで選択肢は変更できません"
 MSG_CAN_CHANGE_STATUS = "選択肢を変更できます"
+MSG_UNFINISHED_SESSIONS = (
+    "前回終了していない回答が{count}件あります。\n\n"
+    "「はい」: 最新の回答を続きから再開します\n"
+    "「いいえ」: 途中までの回答を保存して新しく回答を始めます\n"
+    "「キャンセル」: そのままにして新しく回答を始めます"
+)
@@ -0,0 +1,181 @@
+"""
+集計ダッシュボードGUI - 回答の集計表から進捗と選択肢の分布を一定間隔で表示する
+
+回答ディレクトリを走査せず、送信ごとに更新される集計表（response_tally.py）だけを読み込む。
+集計表が変わっていない間はファイルの更新時刻を確認するだけで、選択肢の分布の表示も書き換えない。
+更新の手間は問題数・選択肢数だけで決まり、回答が増えても変わらない。
+"""
+import os
+import customtkinter as ctk
+from config_manager import ConfigManager
+from response_tally import load_tally, tally_path_for
+from utils import load_questions
+from constants import (
+    DASHBOARD_WINDOW_SIZE, DASHBOARD_REFRESH_INTERVAL, DASHBOARD_THROUGHPUT_HOURS,
+    FONT_FAMILY, FONT_SIZE_SECTION, FONT_SIZE_SUBTITLE, FONT_SIZE_LABEL, FONT_SIZE_SMALL, COLOR_SELECTED
+)
+
+
+class TallyDashboard:
+    """集計ダッシュボード画面"""
+
+    def __init__(self, window):
+        self.window = window
+        self.window.title("集計ダッシュボード")
+        self.window.geometry(DASHBOARD_WINDOW_SIZE)
+
+        self.config_manager = ConfigManager()
+        self.tally_path = tally_path_for(self.config_manager)
+        self.question_order = self._load_question_order()
+
+        self._tally = None
+        self._after_id = None
+        self._summary_labels = {}
+        self._question_rows = {}  # 質問文 → (枠, 見出しのラベル, {選択肢: (バー, 件数のラベル)})
+
+        self.setup_ui()
+        self.window.protocol("WM_DELETE_WINDOW", self.close_window)
+        self.refresh()
+
+    def _load_question_order(self):
+        """設定の問題ファイルの質問文と選択肢の順（回答がない選択肢も0件として表示する）"""
+        questions_path = self.config_manager.get_questions_path()
+        if not questions_path or not os.path.exists(questions_path):
+            return {}
+        return {question.text: list(question.choices) for question in load_questions(questions_path)}
+
+    def setup_ui(self):
+        """UIをセットアップ"""
+        main_container = ctk.CTkFrame(self.window)
+        main_container.pack(fill="both", expand=True, padx=20, pady=20)
+
+        title = ctk.CTkLabel(
+            main_container,
+            text="集計ダッシュボード",
+            font=(FONT_FAMILY, FONT_SIZE_SECTION, "bold")
+        )
+        title.pack(pady=(0, 15))
+
+        # 進捗のサマリー
+        summary_frame = ctk.CTkFrame(main_container)
+        summary_frame.pack(fill="x", pady=(0, 15))
+
+        items = [
+            ("sessions", "セッション数"),
+            ("completed", "完了数"),
+            ("throughput", "1時間あたり"),
+            ("reason", "理由の平均文字数")
+        ]
+        for column, (key, caption) in enumerate(items):
+            summary_frame.grid_columnconfigure(column, weight=1)
+            caption_label = ctk.CTkLabel(
+                summary_frame,
+                text=caption,
+                font=(FONT_FAMILY, FONT_SIZE_SMALL),
+                text_color="gray"
+            )
+            caption_label.grid(row=0, column=column, pady=(10, 0))
+            value_label = ctk.CTkLabel(
+                summary_frame,
+                text="-",
+                font=(FONT_FAMILY, FONT_SIZE_SUBTITLE, "bold")
+            )
+            value_label.grid(row=1, column=column, pady=(0, 10))
+            self._summary_labels[key] = value_label
+
+        # 問題ごとの分布
+        self.questions_frame = ctk.CTkScrollableFrame(main_container)
+        self.questions_frame.pack(fill="both", expand=True)
+
+        self.status_label = ctk.CTkLabel(
+            main_container,
+            text="",
+            font=(FONT_FAMILY, FONT_SIZE_SMALL),
+            text_color="gray"
+        )
+        self.status_label.pack(anchor="e", pady=(10, 0))
+
+    def refresh(self):
+        """集計表が変わっていれば表示を更新し、次の更新を予約"""
+        try:
+            tally = load_tally(self.tally_path)
+        except (OSError, ValueError) as e:
+            self.status_label.configure(text=f"集計表の読み込みエラー: {e}")
+        else:
+            if tally is not self._tally:
+                self._tally = tally
+                self._update_questions(tally)
+            # 1時間あたりのセッション数は集計表が変わらなくても時間とともに変わる
+            self._update_summary(tally)
+
+        self._after_id = self.window.after(DASHBOARD_REFRESH_INTERVAL, self.refresh)
+
+    def _update_summary(self, tally):
+        """進捗のサマリーを更新"""
+        completion = f"{tally.completed / tally.sessions:.0%}" if tally.sessions else "-"
+        values = {
+            "sessions": f"{tally.sessions}",
+            "completed": f"{tally.completed}（{completion}）",
+            "throughput": f"{tally.sessions_per_hour(hours=DASHBOARD_THROUGHPUT_HOURS):.1f}",
+            "reason": f"{tally.mean_reason_length():.1f}"
+        }
+        for key, text in values.items():
+            self._summary_labels[key].configure(text=text)
+        self.status_label.configure(text=f"回答数: {tally.responses}")
+
+    def _update_questions(self, tally):
+        """問題ごとの選択肢の分布を更新（初めての問題・選択肢の場合だけウィジェットを作る）"""
+        texts = list(self.question_order) + [text for text in tally.questions if text not in self.question_order]
+        for text in texts:
+            stats = tally.questions.get(text, {"choices": {}, "answered": 0, "reason_chars": 0})
+            choices = list(self.question_order.get(text, []))
+            choices += [choice for choice in stats["choices"] if choice not in choices]
+
+            frame, heading, rows = self._question_rows.get(text) or self._create_question(text)
+            answered = stats["answered"]
+            heading.configure(text=f"{text}（{answered}件）")
+            for choice in choices:
+                if choice not in rows:
+                    rows[choice] = self._create_choice_row(frame, len(rows) + 1, choice)
+                bar, count_label = rows[choice]
+                count = stats["choices"].get(choice, 0)
+                bar.set(count / answered if answered else 0)
+                count_label.configure(text=f"{count}件 ({count / answered:.1%})" if answered else "0件")
+
+    def _create_question(self, text):
+        """1問分の見出しと選択肢の行を入れる枠を作る"""
+        frame = ctk.CTkFrame(self.questions_frame)
+        frame.pack(fill="x", pady=(0, 10), padx=5)
+        frame.grid_columnconfigure(1, weight=1)
+
+        heading = ctk.CTkLabel(
+            frame,
+            text=text,
+            font=(FONT_FAMILY, FONT_SIZE_LABEL, "bold"),
+            anchor="w",
+            justify="left",
+            wraplength=700
+        )
+        heading.grid(row=0, column=0, columnspan=3, sticky="w", padx=10, pady=(10, 5))
+
+        self._question_rows[text] = (frame, heading, {})
+        return self._question_rows[text]
+
+    def _create_choice_row(self, frame, row, choice):
+        """選択肢1つ分のラベル・バー・件数の行を作る"""
+        choice_label = ctk.CTkLabel(frame, text=choice, font=(FONT_FAMILY, FONT_SIZE_SMALL), anchor="w")
+        choice_label.grid(row=row, column=0, sticky="w", padx=(20, 10), pady=2)
+
+        bar = ctk.CTkProgressBar(frame, progress_color=COLOR_SELECTED)
+        bar.grid(row=row, column=1, sticky="ew", padx=10, pady=2)
+
+        count_label = ctk.CTkLabel(frame, text="", font=(FONT_FAMILY, FONT_SIZE_SMALL), width=110, anchor="e")
+        count_label.grid(row=row, column=2, sticky="e", padx=(10, 20), pady=2)
+        return bar, count_label
+
+    def close_window(self):
+        """予約した更新を取り消してウィンドウを閉じる"""
+        if self._after_id is not None:
+            self.window.after_cancel(self._after_id)
+            self._after_id = None
+        self.window.destroy()
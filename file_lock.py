@@ -0,0 +1,205 @@
+"""
+ファイルロックモジュール - 複数プロセスから同じファイルへ安全に追記する
+"""
+import codecs
+import csv
+import io
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def _lock(f):
+    """ファイルの排他ロックを取得（取得できるまで待機）"""
+    if fcntl:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    else:
+        # ファイル先頭の1バイトをロック用の領域として使う
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                break
+            except OSError:
+                continue
+
+
+def try_lock(f):
+    """
+    ファイルの排他ロックの取得を試みる（待機しない）
+
+    Returns:
+        ロックを取得できた場合True
+    """
+    try:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def unlock(f):
+    """ファイルの排他ロックを解放"""
+    if fcntl:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def locked_append(filepath):
+    """
+    ファイルをバイナリ追記モードで開き、排他ロックを取得した状態で返す
+
+    ロック中はファイル末尾の位置（f.tell()）が他のプロセスに変更されないため、
+    空ファイルかどうかの確認とヘッダーの書き込みを安全に行える。
+    ロックを待っている間にファイルがローテーションで名前を変えられた場合は、
+    新しいファイルを開き直す。
+
+    Args:
+        filepath: ファイルパス
+
+    Yields:
+        末尾に移動済みのファイルオブジェクト
+    """
+    while True:
+        f = open(filepath, 'ab')
+        locked = True
+        try:
+            _lock(f)
+        except OSError as e:
+            # ロックに対応していないファイルシステムではロックなしで書き込む
+            print(f"ファイルロックエラー: {e}")
+            locked = False
+
+        if not locked or is_same_file(f, filepath):
+            break
+
+        unlock(f)
+        f.close()
+
+    with f:
+        try:
+            f.seek(0, os.SEEK_END)
+            yield f
+            f.flush()
+        finally:
+            if locked:
+                unlock(f)
+
+
+@contextmanager
+def locked_update(filepath):
+    """
+    小さなファイルを読み書きモードで開き、排他ロックを取得した状態で返す
+
+    カウンターなど、読み込んだ値をもとに書き換えるファイルに使う。
+
+    Args:
+        filepath: ファイルパス（存在しない場合は空のファイルを作成）
+
+    Yields:
+        先頭に移動済みのファイルオブジェクト
+    """
+    with os.fdopen(os.open(filepath, os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o666), 'r+b') as f:
+        _lock(f)
+        try:
+            f.seek(0)
+            yield f
+            f.flush()
+        finally:
+            unlock(f)
+
+
+@contextmanager
+def locked_shared(filepath):
+    """
+    ロック用のファイルの共有ロックを取得した状態にする
+
+    共有ロックは同時に複数のプロセスが取得でき、locked_updateの排他ロックとは同時に取得できない。
+    読み込み中に別のプロセスがファイルを整理しないようにする場合に使う。
+    Windowsでは共有ロックがないため排他ロックを取得する。
+
+    Args:
+        filepath: ロック用のファイルパス（存在しない場合は空のファイルを作成）
+    """
+    with os.fdopen(os.open(filepath, os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o666), 'r+b') as f:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_SH)
+        else:
+            _lock(f)
+        try:
+            yield
+        finally:
+            unlock(f)
+
+
+def is_same_file(f, filepath):
+    """開いているファイルがまだ指定されたパスのファイルかどうか"""
+    try:
+        path_stat = os.stat(filepath)
+    except FileNotFoundError:
+        return False
+    file_stat = os.fstat(f.fileno())
+    return (path_stat.st_dev, path_stat.st_ino) == (file_stat.st_dev, file_stat.st_ino)
+
+
+def append_bytes(filepath, data, header=b""):
+    """
+    ロックを取得してデータを1回で追記
+
+    Args:
+        filepath: ファイルパス
+        data: 追記するバイト列
+        header: ファイルが空の場合に先頭に書き込むバイト列
+
+    Returns:
+        書き込み前のファイルサイズ（追記したデータの開始位置はこれ + ヘッダー長）
+    """
+    with locked_append(filepath) as f:
+        offset = f.tell()
+        if offset == 0 and header:
+            data = header + data
+        f.write(data)
+    return offset
+
+
+def append_csv_rows(filepath, rows, header=None, encoding='utf-8-sig'):
+    """
+    ロックを取得してCSVの行をまとめて追記（空ファイルの場合はヘッダーも書き込む）
+
+    Args:
+        filepath: ファイルパス
+        rows: 行のリスト
+        header: ヘッダー行（Noneの場合は書き込まない）
+        encoding: 文字コード（utf-8-sigの場合は新規ファイルの先頭にのみBOMを付ける）
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+
+    file_header = b""
+    if header is not None:
+        header_buffer = io.StringIO()
+        csv.writer(header_buffer).writerow(header)
+        file_header = header_buffer.getvalue().encode(_plain_encoding(encoding))
+    if encoding.lower().replace('_', '-') == 'utf-8-sig':
+        file_header = codecs.BOM_UTF8 + file_header
+
+    append_bytes(filepath, buffer.getvalue().encode(_plain_encoding(encoding)), file_header)
+
+
+def _plain_encoding(encoding):
+    """BOM付きの文字コード名をBOMなしの文字コード名に変換"""
+    if encoding.lower().replace('_', '-') == 'utf-8-sig':
+        return 'utf-8'
+    return encoding
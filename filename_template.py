@@ -0,0 +1,173 @@
+"""
+ファイル名テンプレート - log_name_format / response_name_format を一度だけ解析して使い回す
+
+テンプレート文字列は最初に使うときに解析し、ファイル名を作る関数と、
+既存のファイル名から変数の値を取り出す正規表現をまとめてキャッシュする。
+使えない変数を含むテンプレートは解析の時点でエラーにする。
+"""
+import functools
+import re
+from datetime import datetime
+from constants import FILENAME_VARIABLES
+
+# 変数ごとの値の形式（既存ファイルの照合用）
+_VARIABLE_PATTERNS = {
+    "date": r"\d{8}",
+    "time": r"\d{6}",
+    "respondent_id": r"[^_]+",
+    "sequence": r"\d+"
+}
+
+_PLACEHOLDER = re.compile(r"\{([^{}]*)\}")
+
+
+class FilenameTemplate:
+    """解析済みのファイル名テンプレート"""
+
+    def __init__(self, template):
+        """
+        Args:
+            template: テンプレート文字列（例: "responses_{respondent_id}_{date}.csv"）
+
+        Raises:
+            ValueError: 使えない変数を含む場合
+        """
+        self.template = template
+
+        # 固定の文字列と変数名を交互に並べたリスト（奇数番目が変数名）
+        self._parts = _PLACEHOLDER.split(template)
+        self.variables = frozenset(self._parts[1::2])
+        unknown = sorted(self.variables - FILENAME_VARIABLES.keys())
+        if unknown:
+            raise ValueError(
+                f"使用できない変数があります: {', '.join('{' + name + '}' for name in unknown)}"
+            )
+
+        regex = []
+        seen = set()
+        for i, part in enumerate(self._parts):
+            if i % 2 == 0:
+                regex.append(re.escape(part))
+            elif part in seen:
+                regex.append(f"(?P={part})")
+            else:
+                seen.add(part)
+                regex.append(f"(?P<{part}>{_VARIABLE_PATTERNS[part]})")
+        self.pattern = re.compile("".join(regex))
+
+    @property
+    def has_sequence(self):
+        """連番を含むかどうか"""
+        return "sequence" in self.variables
+
+    def render(self, now=None, respondent_id=None, sequence=None):
+        """
+        ファイル名を作成
+
+        値を指定しなかった変数（回答者ID・連番）は {変数名} のまま残す。
+
+        Args:
+            now: 日付・時刻に使う日時（Noneの場合は現在時刻）
+            respondent_id: 回答者ID
+            sequence: 連番（3桁にゼロ埋め）
+
+        Returns:
+            ファイル名
+        """
+        return self.render_many([respondent_id], now, sequence)[0]
+
+    def render_many(self, respondent_ids, now=None, sequence=None):
+        """
+        複数の回答者分のファイル名をまとめて作成（日付・時刻の変換は1回だけ行う）
+
+        Args:
+            respondent_ids: 回答者IDのリスト
+            now: 日付・時刻に使う日時（Noneの場合は現在時刻）
+            sequence: 連番（3桁にゼロ埋め）
+
+        Returns:
+            ファイル名のリスト
+        """
+        if now is None:
+            now = datetime.now()
+        values = {
+            "date": now.strftime("%Y%m%d"),
+            "time": now.strftime("%H%M%S"),
+            "sequence": "{sequence}" if sequence is None else str(sequence).zfill(3)
+        }
+
+        # 回答者ID以外の変数を先に埋めておく
+        parts = list(self._parts)
+        id_positions = []
+        for i in range(1, len(parts), 2):
+            if parts[i] == "respondent_id":
+                id_positions.append(i)
+            else:
+                parts[i] = values[parts[i]]
+
+        if not id_positions:
+            return ["".join(parts)] * len(respondent_ids)
+
+        filenames = []
+        for respondent_id in respondent_ids:
+            for i in id_positions:
+                parts[i] = respondent_id or "{respondent_id}"
+            filenames.append("".join(parts))
+        return filenames
+
+    def match(self, filename):
+        """
+        ファイル名がテンプレートに一致する場合、変数の値を取り出す
+
+        Args:
+            filename: ファイル名
+
+        Returns:
+            変数名と値の辞書（一致しない場合はNone）
+        """
+        found = self.pattern.fullmatch(filename)
+        return found.groupdict() if found else None
+
+    def match_stem(self, filename):
+        """
+        ファイル名を拡張子を除いたテンプレートと照合し、変数の値を取り出す
+
+        拡張子と、ローテーションしたログの日時・キー入力記録の接尾辞は無視する
+        （action_log_A001_20250115.20250115103045123456.csv.gz、action_log_A001_20250115_keys.csv）。
+
+        Args:
+            filename: ファイル名
+
+        Returns:
+            変数名と値の辞書（一致しない場合はNone）
+        """
+        base = ".".join(filename.split(".")[:self.template.count(".") + 1])
+        found = self.pattern.match(base)
+        if not found or not (found.end() == len(base) or base[found.end()] == "_"):
+            return None
+        return found.groupdict()
+
+
+@functools.lru_cache(maxsize=64)
+def compile_template(template):
+    """
+    テンプレート文字列を解析（同じ文字列は2回目以降キャッシュを返す）
+
+    Raises:
+        ValueError: 使えない変数を含む場合
+    """
+    return FilenameTemplate(template)
+
+
+def validate_template(template):
+    """
+    テンプレート文字列を検証
+
+    Returns:
+        エラーメッセージ（問題がない場合はNone）
+    """
+    try:
+        compile_template(template)
+    except ValueError as e:
+        return str(e)
+    return None
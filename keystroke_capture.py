@@ -0,0 +1,137 @@
+"""
+キー入力の記録 - 理由入力中のすべてのキー入力の時刻を記録する
+
+キー入力ごとの処理は、あらかじめ確保したリングバッファに数値を書き込むだけにして、
+UIを止めないようにする。溜まった記録は一定間隔・問題の移動時・書き直し時に
+まとめて取り出し、バックグラウンドでファイルに追記する。
+"""
+import os
+import time
+from array import array
+from batch_writer import BatchWriter
+from file_lock import append_csv_rows
+from constants import KEYSTROKE_BUFFER_SIZE, KEYSTROKE_FLUSH_INTERVAL
+
+KEYSTROKE_FILE_SUFFIX = "_keys.csv"
+KEYSTROKE_CSV_HEADER = ['回答者ID', '問題番号', 'モノトニック時刻(ns)', '経過時間(ns)', 'キー']
+
+
+class KeystrokeRecorder:
+    """キー入力をリングバッファに記録し、まとめてファイルに書き込むクラス"""
+
+    def __init__(self, output_file, respondent_id, capacity=KEYSTROKE_BUFFER_SIZE):
+        """
+        Args:
+            output_file: 記録を追記するCSVファイルのパス
+            respondent_id: 回答者ID
+            capacity: リングバッファの大きさ（書き込み前に溢れた分は古い順に捨てる）
+        """
+        self.output_file = output_file
+        self.respondent_id = respondent_id
+        self.capacity = capacity
+
+        # 1件 = (モノトニック時刻, 問題番号, キー番号) の固定長レコード
+        self._times = array('q', bytes(8 * capacity))
+        self._questions = array('H', bytes(2 * capacity))
+        self._keys = array('H', bytes(2 * capacity))
+        self._head = 0  # 次に書き込む位置（通算）
+        self._tail = 0  # 次に取り出す位置（通算）
+        self.dropped = 0
+
+        # キー名 → キー番号
+        self._key_ids = {}
+        self._key_names = []
+
+        self._last_time = None
+        self._widget = None
+        self._after_id = None
+        self._writer = BatchWriter(
+            self._write_rows,
+            max_batch_size=1,
+            max_delay=0,
+            name="KeystrokeWriter"
+        )
+
+    def record(self, question_num, keysym):
+        """
+        キー入力を記録（キー入力のイベントハンドラから呼ぶ）
+
+        Args:
+            question_num: 問題番号
+            keysym: キー名（tkinterのevent.keysym、例: "a", "BackSpace"）
+        """
+        key_id = self._key_ids.get(keysym)
+        if key_id is None:
+            key_id = len(self._key_names)
+            self._key_ids[keysym] = key_id
+            self._key_names.append(keysym)
+
+        slot = self._head % self.capacity
+        self._times[slot] = time.monotonic_ns()
+        self._questions[slot] = question_num
+        self._keys[slot] = key_id
+        self._head += 1
+
+    def flush(self):
+        """溜まった記録を取り出してバックグラウンドで書き込む"""
+        head = self._head
+        start = self._tail
+        if head - start > self.capacity:
+            self.dropped += head - start - self.capacity
+            start = head - self.capacity
+        if start == head:
+            return
+
+        rows = []
+        last_time = self._last_time
+        for position in range(start, head):
+            slot = position % self.capacity
+            mono_ns = self._times[slot]
+            rows.append([
+                self.respondent_id,
+                self._questions[slot],
+                mono_ns,
+                "" if last_time is None else mono_ns - last_time,
+                self._key_names[self._keys[slot]]
+            ])
+            last_time = mono_ns
+
+        self._last_time = last_time
+        self._tail = head
+        self._writer.put(rows)
+
+    def start_periodic_flush(self, widget, interval=KEYSTROKE_FLUSH_INTERVAL):
+        """
+        一定間隔で記録を書き込む
+
+        Args:
+            widget: afterでタイマーを登録するtkinterのウィジェット
+            interval: 書き込み間隔（秒）
+        """
+        def tick():
+            self.flush()
+            self._after_id = widget.after(int(interval * 1000), tick)
+
+        self._widget = widget
+        self._after_id = widget.after(int(interval * 1000), tick)
+
+    def close(self):
+        """残りの記録を書き込んで終了"""
+        if self._after_id is not None:
+            try:
+                self._widget.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+        self.flush()
+        self._writer.close()
+
+    def _write_rows(self, batches):
+        """取り出した記録をまとめてファイルに追記"""
+        rows = [row for batch in batches for row in batch]
+        append_csv_rows(self.output_file, rows, header=KEYSTROKE_CSV_HEADER)
+
+
+def keystroke_path_for(log_path):
+    """アクションログのパスからキー入力記録のパスを作成（例: action_log_x.csv → action_log_x_keys.csv）"""
+    return os.path.splitext(log_path)[0] + KEYSTROKE_FILE_SUFFIX
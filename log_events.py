@@ -0,0 +1,107 @@
+"""
+ログイベント定義 - ログの1行を構造化されたデータとして扱う
+"""
+import time
+from collections import namedtuple
+
+
+_LOG_EVENT_FIELDS = [
+    "time_ns", "action", "question_num", "to_num", "text", "respondent_id", "choice_index",
+    "mono_ns", "delta_ns"
+]
+
+
+class LogEvent(namedtuple("LogEvent", _LOG_EVENT_FIELDS, defaults=(None, None, None, None))):
+    """
+    1件のアクションログ
+
+    Attributes:
+        time_ns: 記録時刻（エポックからのナノ秒）
+        action: アクション種別（LOG_ACTIONSの値）
+        question_num: 問題番号（問題移動の場合は移動元、問題に関係しない場合はNone）
+        to_num: 移動先の問題番号（問題移動以外はNone）
+        text: 選択肢・理由などの文字列（ない場合はNone）
+        respondent_id: 回答者ID
+        choice_index: 選択肢の番号（0始まり、選択肢選択以外はNone）
+        mono_ns: モノトニック時計の値（ナノ秒、時刻合わせの影響を受けない）
+        delta_ns: 同じセッションの直前のイベントからの経過時間（ナノ秒、最初のイベントはNone）
+    """
+    __slots__ = ()
+
+    @property
+    def timestamp(self):
+        """CSVと同じ形式のタイムスタンプ文字列"""
+        return format_time_ns(self.time_ns)
+
+    @property
+    def details(self):
+        """CSVの詳細情報列と同じ形式の文字列"""
+        return format_details(self.question_num, self.to_num, self.text)
+
+    def to_dict(self):
+        """構造化ログ（JSON Lines）の1レコードに変換"""
+        return {
+            "timestamp": self.timestamp,
+            "time_ns": self.time_ns,
+            "respondent_id": self.respondent_id,
+            "action": self.action,
+            "question_num": self.question_num,
+            "to_num": self.to_num,
+            "choice_index": self.choice_index,
+            "text": self.text,
+            "mono_ns": self.mono_ns,
+            "delta_ns": self.delta_ns
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """構造化ログの1レコードからイベントを作成"""
+        return cls(
+            data["time_ns"],
+            data["action"],
+            data.get("question_num"),
+            data.get("to_num"),
+            data.get("text"),
+            data.get("respondent_id"),
+            data.get("choice_index"),
+            data.get("mono_ns"),
+            data.get("delta_ns")
+        )
+
+
+# 直前に変換した秒とその文字列（同じ秒のイベントは日付部分を再変換しない）
+_second_prefix_cache = (None, "")
+
+
+def format_time_ns(time_ns):
+    """エポックからのナノ秒をタイムスタンプ文字列（ミリ秒まで）に変換"""
+    global _second_prefix_cache
+
+    seconds, remainder = divmod(time_ns, 1_000_000_000)
+    cached_seconds, prefix = _second_prefix_cache
+    if seconds != cached_seconds:
+        prefix = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(seconds))
+        _second_prefix_cache = (seconds, prefix)
+
+    return f"{prefix}.{remainder // 1_000_000:03d}"
+
+
+def format_details(question_num=None, to_num=None, text=None):
+    """
+    詳細情報の文字列を作成
+
+    Args:
+        question_num: 問題番号
+        to_num: 移動先の問題番号
+        text: 選択肢・理由などの文字列
+
+    Returns:
+        "問題1: 選択肢A", "問題1 → 問題2", "問題1" のような文字列
+    """
+    if question_num is None:
+        return text or ""
+    if to_num is not None:
+        return f"問題{question_num} → 問題{to_num}"
+    if text is not None:
+        return f"問題{question_num}: {text}"
+    return f"問題{question_num}"
@@ -0,0 +1,341 @@
+"""
+ログ索引 - アクションログの横に索引ファイルを作り、回答者・問題番号から該当行へ直接移動する
+
+索引ファイル（<ログファイル>.idx）の構造:
+    ヘッダー: MAGIC (b"FRIDX") + バージョン(1バイト)
+    以降はランの並び（索引を更新するたびに1つ追加される）
+        b"R" + <QQI8s>(ログの開始位置, 終了位置, エントリ数, 終了位置直前のログのハッシュ)
+        + エントリ <QQH>(キーのハッシュ, 行の位置, アクションコード) × エントリ数（キー順）
+
+1行につき「回答者」「回答者+問題番号」「問題番号」の3つのキーを登録する。
+検索はランごとの二分探索で行うため、ログのサイズによらずほぼ一定の時間で済む。
+ランが増えすぎたら1つにまとめ直す。
+
+対象はCSV形式とJSON Lines形式のログ（圧縮されていないもの）。
+CSV形式のログには回答者IDの列がないため、問題番号でのみ検索できる。
+"""
+import csv
+import hashlib
+import json
+import os
+import struct
+import sys
+import zlib
+from file_lock import locked_append
+from log_events import LogEvent
+from log_reader import detect_log_format, parse_csv_row
+
+INDEX_SUFFIX = ".idx"
+MAGIC = b"FRIDX"
+VERSION = 1
+MAX_RUNS = 8
+
+TAG_RUN = b"R"
+RUN_HEADER = struct.Struct("<QQI8s")
+ENTRY = struct.Struct("<QQH")
+
+# 索引が指すログの位置が変わっていないか確認するために使うバイト数
+_FINGERPRINT_LENGTH = 64
+
+
+def _key_hash(*parts):
+    """検索キーのハッシュ値（64ビット）"""
+    key = "\x1f".join(str(part) for part in parts)
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def _action_code(action):
+    """アクション種別のコード（16ビット、検索結果の絞り込み用）"""
+    return zlib.crc32(action.encode('utf-8')) & 0xFFFF
+
+
+def _event_keys(event):
+    """イベントを登録するキーのハッシュ値"""
+    keys = []
+    if event.respondent_id is not None:
+        keys.append(_key_hash("r", event.respondent_id))
+        if event.question_num is not None:
+            keys.append(_key_hash("rq", event.respondent_id, event.question_num))
+    if event.question_num is not None:
+        keys.append(_key_hash("q", event.question_num))
+    return keys
+
+
+def _fingerprint(f, end):
+    """ログの終了位置直前のバイト列のハッシュ値"""
+    start = max(0, end - _FINGERPRINT_LENGTH)
+    f.seek(start)
+    return hashlib.blake2b(f.read(end - start), digest_size=8).digest()
+
+
+def _iter_records(f, start, log_format):
+    """
+    ログの指定位置以降の完全なレコードを読み込む
+
+    Yields:
+        (レコードの位置, LogEvent, 次のレコードの位置)
+    """
+    f.seek(start)
+    offset = start
+    pending = b""
+    pending_offset = offset
+
+    for line in f:
+        if not line.endswith(b"\n"):
+            break  # 書き込み途中の行
+        if not pending:
+            pending_offset = offset
+        pending += line
+        offset += len(line)
+
+        # CSVはクォート内の改行を含む場合があるため、クォートが閉じるまで行をつなげる
+        if log_format == "csv" and pending.count(b'"') % 2:
+            continue
+
+        record, pending = pending, b""
+        event = _parse_record(record, pending_offset, log_format)
+        if event:
+            yield pending_offset, event, offset
+
+
+def _parse_record(record, offset, log_format):
+    """1レコードをイベントに変換（ヘッダー行や壊れた行はNone）"""
+    if offset == 0 and record.startswith(b"\xef\xbb\xbf"):
+        record = record[3:]
+    text = record.decode('utf-8', errors='replace')
+
+    if log_format == "jsonl":
+        if not text.strip():
+            return None
+        try:
+            return LogEvent.from_dict(json.loads(text))
+        except (ValueError, KeyError):
+            return None
+
+    rows = list(csv.reader([text]))
+    return parse_csv_row(rows[0]) if rows else None
+
+
+class LogIndex:
+    """ログファイルの索引"""
+
+    def __init__(self, log_path):
+        """
+        Args:
+            log_path: ログファイルのパス（索引は <log_path>.idx）
+        """
+        self.log_path = log_path
+        self.index_path = log_path + INDEX_SUFFIX
+        self.log_format = detect_log_format(log_path)
+        if self.log_format not in ("csv", "jsonl"):
+            raise ValueError(f"索引を作成できないログ形式です: {self.log_format}")
+
+        # (エントリの開始位置, エントリ数) のリスト
+        self.runs = []
+        self.indexed_end = 0
+        self._load_runs()
+
+    def _load_runs(self):
+        """索引ファイルからランの位置を読み込む（ログと一致しない場合は空にする）"""
+        self.runs = []
+        self.indexed_end = 0
+        if not os.path.exists(self.index_path):
+            return
+
+        runs = []
+        expected_start = 0
+        fingerprint = None
+        with open(self.index_path, 'rb') as f:
+            if f.read(len(MAGIC) + 1) != MAGIC + bytes([VERSION]):
+                return
+            while True:
+                tag = f.read(1)
+                if tag != TAG_RUN:
+                    break
+                data = f.read(RUN_HEADER.size)
+                if len(data) < RUN_HEADER.size:
+                    break
+                start, end, count, fingerprint = RUN_HEADER.unpack(data)
+                if start != expected_start:
+                    return
+                runs.append((f.tell(), count))
+                expected_start = end
+                f.seek(count * ENTRY.size, os.SEEK_CUR)
+
+        # ローテーションなどでログが入れ替わっていないか確認
+        if runs:
+            if os.path.getsize(self.log_path) < expected_start:
+                return
+            with open(self.log_path, 'rb') as f:
+                if _fingerprint(f, expected_start) != fingerprint:
+                    return
+
+        self.runs = runs
+        self.indexed_end = expected_start
+
+    def update(self):
+        """
+        前回の更新以降に追記された行を索引に追加（索引がない・古い場合は作り直す）
+
+        複数のプロセスが同時に更新しても索引が壊れないよう、索引ファイルをロックして行う。
+
+        Returns:
+            追加した行数
+        """
+        with locked_append(self.index_path) as index_file:
+            self._load_runs()
+            if not self.runs:
+                index_file.truncate(0)
+                index_file.seek(0)
+
+            entries = []
+            rows = 0
+            end = self.indexed_end
+            with open(self.log_path, 'rb') as f:
+                for offset, event, next_offset in _iter_records(f, self.indexed_end, self.log_format):
+                    code = _action_code(event.action)
+                    for key in _event_keys(event):
+                        entries.append((key, offset, code))
+                    rows += 1
+                    end = next_offset
+                if end == self.indexed_end:
+                    return 0
+                fingerprint = _fingerprint(f, end)
+
+            entries.sort()
+            buf = bytearray()
+            if index_file.tell() == 0:
+                buf += MAGIC + bytes([VERSION])
+            buf += TAG_RUN + RUN_HEADER.pack(self.indexed_end, end, len(entries), fingerprint)
+            for entry in entries:
+                buf += ENTRY.pack(*entry)
+            index_file.write(buf)
+            index_file.flush()
+
+            self._load_runs()
+            if len(self.runs) > MAX_RUNS:
+                self.compact()
+        return rows
+
+    def compact(self):
+        """すべてのランを1つにまとめ直す（update()の中で索引ファイルをロックした状態で呼ぶ）"""
+        entries = []
+        with open(self.index_path, 'rb') as f:
+            for entry_start, count in self.runs:
+                f.seek(entry_start)
+                data = f.read(count * ENTRY.size)
+                entries.extend(ENTRY.iter_unpack(data))
+        entries.sort()
+
+        with open(self.log_path, 'rb') as f:
+            fingerprint = _fingerprint(f, self.indexed_end)
+
+        temp_path = self.index_path + ".tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(MAGIC + bytes([VERSION]))
+            f.write(TAG_RUN + RUN_HEADER.pack(0, self.indexed_end, len(entries), fingerprint))
+            for entry in entries:
+                f.write(ENTRY.pack(*entry))
+        os.replace(temp_path, self.index_path)
+        self._load_runs()
+
+    def _lookup(self, key):
+        """キーに一致するエントリ (行の位置, アクションコード) を取得"""
+        results = []
+        with open(self.index_path, 'rb') as f:
+            for entry_start, count in self.runs:
+                # 二分探索で最初に一致するエントリを探す
+                low, high = 0, count
+                while low < high:
+                    mid = (low + high) // 2
+                    f.seek(entry_start + mid * ENTRY.size)
+                    if ENTRY.unpack(f.read(ENTRY.size))[0] < key:
+                        low = mid + 1
+                    else:
+                        high = mid
+
+                f.seek(entry_start + low * ENTRY.size)
+                for _ in range(low, count):
+                    entry_key, offset, code = ENTRY.unpack(f.read(ENTRY.size))
+                    if entry_key != key:
+                        break
+                    results.append((offset, code))
+        return results
+
+    def query(self, respondent_id=None, question_num=None, action=None):
+        """
+        条件に一致するログを索引から直接読み込む
+
+        Args:
+            respondent_id: 回答者ID
+            question_num: 問題番号
+            action: アクション種別（LOG_ACTIONSの値）
+
+        Yields:
+            LogEvent（ログの記録順）
+        """
+        if respondent_id is not None and question_num is not None:
+            key = _key_hash("rq", respondent_id, question_num)
+        elif respondent_id is not None:
+            key = _key_hash("r", respondent_id)
+        elif question_num is not None:
+            key = _key_hash("q", question_num)
+        else:
+            raise ValueError("回答者IDか問題番号を指定してください")
+
+        matches = self._lookup(key)
+        if action is not None:
+            code = _action_code(action)
+            matches = [match for match in matches if match[1] == code]
+
+        with open(self.log_path, 'rb') as f:
+            for offset, _ in sorted(matches):
+                for _, event, _ in _iter_records(f, offset, self.log_format):
+                    # ハッシュの衝突に備えて実際の値を確認する
+                    if (respondent_id is None or event.respondent_id == respondent_id) and \
+                            (question_num is None or event.question_num == question_num) and \
+                            (action is None or event.action == action):
+                        yield event
+                    break
+
+
+def update_index(log_path):
+    """
+    ログの索引を作成・更新
+
+    Args:
+        log_path: ログファイルのパス
+
+    Returns:
+        LogIndex
+    """
+    index = LogIndex(log_path)
+    index.update()
+    return index
+
+
+def query_log(log_path, respondent_id=None, question_num=None, action=None):
+    """
+    索引を使ってログを検索（索引が古い場合は先に更新する）
+
+    Yields:
+        LogEvent
+    """
+    return update_index(log_path).query(respondent_id, question_num, action)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in ("build", "query"):
+        print("使い方: python log_index.py build <ログファイル>")
+        print("        python log_index.py query <ログファイル> [回答者ID|-] [問題番号]")
+        sys.exit(1)
+
+    if sys.argv[1] == "build":
+        log_index = LogIndex(sys.argv[2])
+        added = log_index.update()
+        print(f"✓ {added}行を索引に追加しました: {log_index.index_path}")
+    else:
+        rid = sys.argv[3] if len(sys.argv) > 3 and sys.argv[3] != "-" else None
+        qnum = int(sys.argv[4]) if len(sys.argv) > 4 else None
+        for found in query_log(sys.argv[2], rid, qnum):
+            print(f"{found.timestamp},{found.action},{found.details}")
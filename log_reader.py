@@ -0,0 +1,154 @@
+"""
+ログ読み込みモジュール - 形式によらずアクションログをLogEventとして読み込む
+"""
+import csv
+import json
+import re
+from datetime import datetime
+from binary_log import MAGIC, read_binary_log
+from log_events import LogEvent
+from log_rotation import iter_log_files, open_log_file, strip_compression_suffix
+from sqlite_store import SQLITE_MAGIC, read_sqlite_log
+
+# 旧形式（CSV）の詳細情報を分解するパターン
+_MOVE_PATTERN = re.compile(r"^問題(\d+) → 問題(\d+)$")
+_QUESTION_PATTERN = re.compile(r"^問題(\d+)(?:: (.*))?$", re.DOTALL)
+
+
+def detect_log_format(filepath):
+    """
+    ログファイルの形式を判定
+
+    Args:
+        filepath: ログファイルのパス
+
+    Returns:
+        "binary", "jsonl", "sqlite", "csv" のいずれか
+    """
+    if strip_compression_suffix(filepath).endswith(".jsonl"):
+        return "jsonl"
+    with open_log_file(filepath, 'rb') as f:
+        head = f.read(len(SQLITE_MAGIC))
+    if head.startswith(MAGIC):
+        return "binary"
+    if head == SQLITE_MAGIC:
+        return "sqlite"
+    return "csv"
+
+
+def read_log_events(filepath, log_format=None):
+    """
+    ログファイルを先頭から順に読み込む
+
+    Args:
+        filepath: ログファイルのパス（圧縮済みのセグメントも可）
+        log_format: ログ形式（Noneの場合は自動判定）
+
+    Yields:
+        LogEvent
+    """
+    if log_format is None:
+        log_format = detect_log_format(filepath)
+
+    if log_format == "binary":
+        return read_binary_log(filepath)
+    if log_format == "jsonl":
+        return read_jsonl_log(filepath)
+    if log_format == "sqlite":
+        return read_sqlite_log(filepath)
+    return read_csv_log(filepath)
+
+
+def read_rotated_log_events(log_path, log_format=None):
+    """
+    ローテーション済みのセグメント（圧縮済みを含む）と書き込み中のファイルを古い順に読み込む
+
+    Args:
+        log_path: 書き込み中のログファイルのパス
+        log_format: ログ形式（Noneの場合はファイルごとに自動判定）
+
+    Yields:
+        LogEvent
+    """
+    for filepath in iter_log_files(log_path):
+        yield from read_log_events(filepath, log_format)
+
+
+def read_jsonl_log(filepath):
+    """
+    構造化ログ（JSON Lines）を読み込む
+
+    Yields:
+        LogEvent
+    """
+    with open_log_file(filepath, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+            except ValueError:
+                continue  # 書き込み途中の行
+            yield LogEvent.from_dict(data)
+
+
+def read_csv_log(filepath):
+    """
+    旧形式（CSV）のログを読み込み、詳細情報を問題番号などに分解する
+
+    Yields:
+        LogEvent
+    """
+    with open_log_file(filepath, 'r', encoding='utf-8-sig', newline='') as f:
+        reader = csv.reader(f)
+        next(reader, None)  # ヘッダーをスキップ
+
+        for row in reader:
+            event = parse_csv_row(row)
+            if event:
+                yield event
+
+
+def parse_csv_row(row):
+    """
+    旧形式（CSV）のログの1行をイベントに変換
+
+    Returns:
+        LogEvent（ヘッダー行や壊れた行の場合はNone）
+    """
+    if len(row) < 3:
+        return None
+    try:
+        time_ns = parse_timestamp(row[0])
+    except ValueError:
+        return None
+    question_num, to_num, text = parse_details(row[2])
+    mono_ns = delta_ns = None
+    if len(row) >= 5:
+        mono_ns = int(row[3]) if row[3] else None
+        delta_ns = int(row[4]) if row[4] else None
+    return LogEvent(
+        time_ns, row[1], question_num, to_num, text, None, None, mono_ns, delta_ns
+    )
+
+
+def parse_timestamp(timestamp):
+    """タイムスタンプ文字列をエポックからのナノ秒に変換"""
+    dt = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S.%f")
+    return int(dt.timestamp()) * 1_000_000_000 + dt.microsecond * 1000
+
+
+def parse_details(details):
+    """
+    旧形式の詳細情報を分解
+
+    Returns:
+        (問題番号, 移動先の問題番号, 文字列) のタプル
+    """
+    match = _MOVE_PATTERN.match(details)
+    if match:
+        return int(match.group(1)), int(match.group(2)), None
+    match = _QUESTION_PATTERN.match(details)
+    if match:
+        return int(match.group(1)), None, match.group(2)
+    return None, None, details
@@ -0,0 +1,271 @@
+"""
+ログローテーション - サイズ・日付でログを切り替え、閉じたセグメントを圧縮する
+
+ローテーションされたセグメントは元のファイル名に日時を挟んだ名前で保存され、
+バックグラウンドでgzipまたはlzmaに圧縮される。
+    action_log_20250115.csv
+    action_log_20250115.20250115103045123456.csv.gz
+"""
+import glob
+import gzip
+import lzma
+import os
+import re
+import shutil
+import threading
+import time
+from datetime import date, datetime
+from compaction import is_segment
+from file_lock import locked_append
+from filename_template import compile_template
+from constants import DEFAULT_CONFIG
+
+# 圧縮形式と拡張子・オープン関数の対応
+COMPRESSIONS = {
+    "gzip": (".gz", gzip.open),
+    "lzma": (".xz", lzma.open)
+}
+
+# セグメント名に挟む日時（YYYYMMDDHHMMSS + マイクロ秒）
+_SEGMENT_STAMP = re.compile(r"\.(\d{20})$")
+
+
+class LogRotator:
+    """ログファイルのローテーションを行うクラス"""
+
+    def __init__(self, max_bytes=0, daily=False, compression="gzip", max_archives=0):
+        """
+        Args:
+            max_bytes: このサイズ（バイト）を超えたらローテーションする（0の場合はしない）
+            daily: Trueの場合、日付が変わったらローテーションする
+            compression: 閉じたセグメントの圧縮形式 ("gzip", "lzma", "none")
+            max_archives: 残すセグメントの最大数（0の場合は無制限）
+        """
+        self.max_bytes = max_bytes
+        self.daily = daily
+        self.compression = compression if compression in COMPRESSIONS else None
+        self.max_archives = max_archives
+
+    @property
+    def enabled(self):
+        """ローテーションが有効かどうか"""
+        return bool(self.max_bytes) or self.daily
+
+    def should_rotate(self, stat_result):
+        """ファイルの状態からローテーションが必要か判定"""
+        if self.max_bytes and stat_result.st_size >= self.max_bytes:
+            return True
+        if self.daily and stat_result.st_size > 0:
+            if date.fromtimestamp(stat_result.st_mtime) != date.today():
+                return True
+        return False
+
+    def rotate_if_needed(self, log_path):
+        """
+        必要な場合にログファイルをローテーション
+
+        Args:
+            log_path: 書き込み中のログファイルのパス
+
+        Returns:
+            ローテーションした場合はセグメントのパス、それ以外はNone
+        """
+        if not self.enabled:
+            return None
+        try:
+            if not self.should_rotate(os.stat(log_path)):
+                return None
+        except FileNotFoundError:
+            return None
+
+        # 他のプロセスの書き込みと重ならないようにロックを取得してから名前を変える
+        with locked_append(log_path) as f:
+            if not self.should_rotate(os.fstat(f.fileno())):
+                return None  # 他のプロセスがローテーション済み
+            segment_path = segment_path_for(log_path)
+            try:
+                os.rename(log_path, segment_path)
+            except OSError as e:
+                print(f"ログローテーションエラー: {e}")
+                return None
+
+        threading.Thread(
+            target=self._finish_segment,
+            args=(log_path, segment_path),
+            name="LogRotatorCompress",
+            daemon=True
+        ).start()
+        return segment_path
+
+    def _finish_segment(self, log_path, segment_path):
+        """セグメントを圧縮し、古いセグメントを削除"""
+        if self.compression:
+            compress_file(segment_path, self.compression)
+        if self.max_archives:
+            for old_path in list_segments(log_path)[:-self.max_archives]:
+                try:
+                    os.remove(old_path)
+                except OSError as e:
+                    print(f"ログ削除エラー: {e}")
+
+
+def segment_path_for(log_path):
+    """ローテーション後のセグメントのパスを作成"""
+    stem, ext = os.path.splitext(log_path)
+    while True:
+        stamp = datetime.now().strftime("%Y%m%d%H%M%S%f")
+        segment_path = f"{stem}.{stamp}{ext}"
+        if not os.path.exists(segment_path):
+            return segment_path
+        time.sleep(0.000001)
+
+
+def compress_file(path, compression="gzip"):
+    """
+    ファイルを圧縮して元のファイルを削除
+
+    Args:
+        path: 圧縮するファイルのパス
+        compression: 圧縮形式 ("gzip", "lzma")
+
+    Returns:
+        圧縮後のファイルのパス（失敗した場合はNone）
+    """
+    suffix, opener = COMPRESSIONS[compression]
+    compressed_path = path + suffix
+    temp_path = compressed_path + ".tmp"
+
+    try:
+        with open(path, 'rb') as src, opener(temp_path, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(temp_path, compressed_path)
+        os.remove(path)
+        return compressed_path
+    except OSError as e:
+        print(f"ログ圧縮エラー: {e}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return None
+
+
+def strip_compression_suffix(path):
+    """圧縮拡張子（.gz, .xz）を除いたパスを返す"""
+    for suffix, _ in COMPRESSIONS.values():
+        if path.endswith(suffix):
+            return path[:-len(suffix)]
+    return path
+
+
+def open_log_file(path, mode='rb', **kwargs):
+    """
+    圧縮されたログも通常のログと同じように開く
+
+    Args:
+        path: ログファイルのパス（.gz, .xz の場合は展開しながら読み込む）
+        mode: ファイルモード（テキストモードの場合はencodingなどを指定可能）
+    """
+    for suffix, opener in COMPRESSIONS.values():
+        if path.endswith(suffix):
+            if 'b' not in mode and 't' not in mode:
+                mode += 't'
+            return opener(path, mode, **kwargs)
+    return open(path, mode, **kwargs)
+
+
+def list_segments(log_path):
+    """
+    ローテーション済みのセグメントを古い順に取得（書き込み中のファイルは含まない）
+
+    Args:
+        log_path: 書き込み中のログファイルのパス
+    """
+    stem, ext = os.path.splitext(log_path)
+    segments = []
+    for path in glob.glob(glob.escape(stem) + ".*" + glob.escape(ext) + "*"):
+        if path.endswith(".tmp"):
+            continue
+        match = _SEGMENT_STAMP.search(os.path.splitext(strip_compression_suffix(path))[0])
+        if match and strip_compression_suffix(path).endswith(ext):
+            segments.append((match.group(1), path))
+
+    # 圧縮中に同じセグメントが2つ見えた場合は圧縮済みの方を使う
+    by_stamp = {}
+    for stamp, path in sorted(segments):
+        if stamp not in by_stamp or path != strip_compression_suffix(path):
+            by_stamp[stamp] = path
+    return [by_stamp[stamp] for stamp in sorted(by_stamp)]
+
+
+def iter_log_files(log_path):
+    """
+    ローテーション済みのセグメントと書き込み中のファイルを古い順に返す
+
+    分析ではこの順に読み込めば、圧縮の有無を意識せずにログ全体を読める。
+
+    Args:
+        log_path: 書き込み中のログファイルのパス
+
+    Yields:
+        ファイルパス
+    """
+    for segment_path in list_segments(log_path):
+        yield segment_path
+    if os.path.exists(log_path):
+        yield log_path
+
+
+def compress_closed_logs(directory, older_than_days=1, compression="gzip",
+                         name_format=DEFAULT_CONFIG["log_name_format"]):
+    """
+    一定期間更新されていないログファイルをまとめて圧縮
+
+    回答者ごとのログファイルが大量に残っている場合の整理に使う。
+    ログのファイル名のフォーマットに一致するファイル（ローテーション済みのセグメントを含む）だけを圧縮し、
+    ロックファイル・通し番号のカウンター（.で始まるファイル）や索引（.idx）、
+    コンパクションのセグメントとマニフェストは圧縮しない。
+
+    Args:
+        directory: ログディレクトリ
+        older_than_days: この日数より前に最後に更新されたファイルを圧縮する
+        compression: 圧縮形式 ("gzip", "lzma")
+        name_format: ログのファイル名のフォーマット（log_name_format）
+
+    Returns:
+        圧縮したファイル数
+    """
+    from log_index import INDEX_SUFFIX
+
+    suffixes = tuple(suffix for suffix, _ in COMPRESSIONS.values()) + (".tmp", INDEX_SUFFIX)
+    stem_template = compile_template(os.path.splitext(name_format)[0])
+    threshold = time.time() - older_than_days * 86400
+    count = 0
+
+    for entry in os.scandir(directory):
+        if not entry.is_file() or entry.name.startswith(".") or entry.name.endswith(suffixes):
+            continue
+        if is_segment(entry.name) or stem_template.match_stem(entry.name) is None:
+            continue
+        if entry.stat().st_mtime >= threshold:
+            continue
+        if compress_file(entry.path, compression):
+            # 索引は圧縮したログには使えないため削除する
+            if os.path.exists(entry.path + INDEX_SUFFIX):
+                os.remove(entry.path + INDEX_SUFFIX)
+            count += 1
+
+    return count
+
+
+if __name__ == "__main__":
+    import sys
+
+    from config_manager import ConfigManager
+
+    if len(sys.argv) < 2:
+        print("使い方: python log_rotation.py <ログディレクトリ> [日数(既定: 1)] [gzip|lzma]")
+        sys.exit(1)
+
+    days = float(sys.argv[2]) if len(sys.argv) > 2 else 1
+    method = sys.argv[3] if len(sys.argv) > 3 else "gzip"
+    total = compress_closed_logs(sys.argv[1], days, method, ConfigManager().get("log_name_format"))
+    print(f"✓ {total}件のログファイルを圧縮しました")
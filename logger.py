@@ -1,25 +1,153 @@
 """
 タイムスタンプロガー - ボタン操作のログを記録
 """
+import atexit
 import csv
+import json
 import os
-from datetime import datetime
-from constants import LOG_ACTIONS, LOG_TEXT_PREVIEW_LENGTH
+import time
+from batch_writer import BatchWriter
+from binary_log import BinaryLogWriter
+from file_lock import append_bytes, append_csv_rows
+from log_events import LogEvent
+from log_index import update_index
+from sqlite_store import SqliteLogWriter
+from constants import (
+    LOG_ACTIONS, LOG_TEXT_PREVIEW_LENGTH, LOG_FLUSH_BATCH_SIZE, LOG_FLUSH_INTERVAL
+)
 
 
-class ActionLogger:
-    """ユーザーアクションをログに記録するクラス"""
+LOG_CSV_HEADER = ['タイムスタンプ', 'アクション種別', '詳細情報']
+LOG_CSV_TIMING_HEADER = ['モノトニック時刻(ns)', '経過時間(ns)']
+
+
+class CsvLogWriter:
+    """CSV形式でログを追記するクラス"""
 
-    def __init__(self, log_file="action_log.csv"):
+    def __init__(self, log_file, timing_columns=False):
+        """
+        Args:
+            log_file: ログファイルのパス
+            timing_columns: Trueの場合、モノトニック時刻と経過時間の列を追加する
+                （既存ファイルに追記する場合はそのファイルのヘッダーに従う）
+        """
         self.log_file = log_file
+        self.timing_columns = timing_columns
         self.initialize_log_file()
 
     def initialize_log_file(self):
         """ログファイルを初期化"""
         if not os.path.exists(self.log_file):
-            with open(self.log_file, 'w', encoding='utf-8-sig', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow(['タイムスタンプ', 'アクション種別', '詳細情報'])
+            # 他のプロセスが同時に作成してもヘッダーは1回だけ書き込まれる
+            append_csv_rows(self.log_file, [], header=self._header())
+
+        if os.path.getsize(self.log_file) > 0:
+            # 列数を既存ファイルに合わせる
+            with open(self.log_file, 'r', encoding='utf-8-sig', newline='') as f:
+                header = next(csv.reader(f), LOG_CSV_HEADER)
+            self.timing_columns = len(header) > len(LOG_CSV_HEADER)
+
+    def _header(self):
+        """ヘッダー行"""
+        if self.timing_columns:
+            return LOG_CSV_HEADER + LOG_CSV_TIMING_HEADER
+        return LOG_CSV_HEADER
+
+    def write_events(self, events):
+        """イベントをまとめて追記"""
+        if self.timing_columns:
+            rows = (
+                [event.timestamp, event.action, event.details,
+                 event.mono_ns, "" if event.delta_ns is None else event.delta_ns]
+                for event in events
+            )
+        else:
+            rows = ([event.timestamp, event.action, event.details] for event in events)
+
+        # ロックを取得して1回で追記する（複数プロセスで共有しても行が混ざらない）
+        append_csv_rows(self.log_file, rows, header=self._header())
+
+
+class JsonlLogWriter:
+    """構造化ログ（JSON Lines形式、1行1イベント）を追記するクラス"""
+
+    def __init__(self, log_file):
+        self.log_file = log_file
+        self.initialize_log_file()
+
+    def initialize_log_file(self):
+        """ログファイルを初期化（JSON Linesはヘッダーなし）"""
+        if not os.path.exists(self.log_file):
+            open(self.log_file, 'a', encoding='utf-8').close()
+
+    def write_events(self, events):
+        """イベントをまとめて追記"""
+        lines = "".join(
+            json.dumps(event.to_dict(), ensure_ascii=False) + "\n" for event in events
+        )
+        append_bytes(self.log_file, lines.encode('utf-8'))
+
+
+# ログ形式と書き込みクラスの対応
+LOG_WRITERS = {
+    "csv": CsvLogWriter,
+    "binary": BinaryLogWriter,
+    "jsonl": JsonlLogWriter,
+    "sqlite": SqliteLogWriter
+}
+
+
+class ActionLogger:
+    """ユーザーアクションをログに記録するクラス"""
+
+    def __init__(self, log_file="action_log.csv", buffered=False,
+                 flush_batch_size=LOG_FLUSH_BATCH_SIZE, flush_interval=LOG_FLUSH_INTERVAL,
+                 log_format="csv", respondent_id=None, timing_columns=False, rotator=None,
+                 index=False):
+        """
+        Args:
+            log_file: ログファイルのパス
+            buffered: Trueの場合、ログをキューに溜めてバックグラウンドでまとめて書き込む
+            flush_batch_size: バッファリング時に一度に書き込む最大件数
+            flush_interval: バッファリング時に書き込むまでの最大待ち時間（秒）
+            log_format: ログ形式 ("csv", "binary", "jsonl", "sqlite")
+            respondent_id: 各イベントに記録する回答者ID
+            timing_columns: CSV形式の場合にモノトニック時刻と経過時間の列を追加するか
+            rotator: ログローテーションを行うLogRotator（Noneの場合はしない）
+            index: Trueの場合、終了時にログの索引（log_index.py）を更新する
+                （CSV形式・JSON Lines形式のみ）
+        """
+        if log_format not in LOG_WRITERS:
+            raise ValueError(f"未対応のログ形式です: {log_format}")
+
+        self.log_file = log_file
+        self.log_format = log_format
+        self.respondent_id = respondent_id
+        # データベースはローテーションしない
+        self.rotator = rotator if log_format != "sqlite" else None
+        self.index = index and log_format in ("csv", "jsonl")
+        if log_format == "csv":
+            self._log_writer = CsvLogWriter(log_file, timing_columns=timing_columns)
+        else:
+            self._log_writer = LOG_WRITERS[log_format](log_file)
+
+        # 直前のイベントのモノトニック時刻（経過時間の計算用）
+        self._last_mono_ns = None
+
+        self._writer = None
+        if buffered:
+            self._writer = BatchWriter(
+                self._write_events,
+                max_batch_size=flush_batch_size,
+                max_delay=flush_interval,
+                name="ActionLoggerWriter"
+            )
+            # 終了時に書き残しがないようにする
+            atexit.register(self.close)
+
+    def initialize_log_file(self):
+        """ログファイルを初期化"""
+        self._log_writer.initialize_log_file()
 
     def log_action(self, action_type, details=""):
         """
@@ -29,53 +157,83 @@ class ActionLogger:
             action_type: アクションの種類（例: "選択肢クリック", "理由入力開始"）
             details: 詳細情報
         """
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+        self._log_event(action_type, text=details)
 
+    def _log_event(self, action_type, question_num=None, to_num=None, text=None,
+                   choice_index=None):
+        """構造化されたイベントとしてログに記録"""
+        mono_ns = time.monotonic_ns()
+        delta_ns = None if self._last_mono_ns is None else mono_ns - self._last_mono_ns
+        self._last_mono_ns = mono_ns
+
+        event = LogEvent(
+            time.time_ns(), action_type, question_num, to_num, text,
+            self.respondent_id, choice_index, mono_ns, delta_ns
+        )
+
+        if self._writer:
+            self._writer.put(event)
+        else:
+            self._write_events([event])
+
+    def _write_events(self, events):
+        """イベントをまとめてファイルに書き込む"""
         try:
-            with open(self.log_file, 'a', encoding='utf-8-sig', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow([timestamp, action_type, details])
+            if self.rotator:
+                self.rotator.rotate_if_needed(self.log_file)
+            self._log_writer.write_events(events)
         except Exception as e:
             print(f"ログ記録エラー: {e}")
 
-    def log_choice_selection(self, question_num, choice):
+    def flush(self):
+        """バッファに溜まったログをすべて書き込む"""
+        if self._writer:
+            self._writer.flush()
+
+    def close(self):
+        """ログを書き込んで終了（バッファリング時は書き込みスレッドを停止）"""
+        if self._writer:
+            self._writer.close()
+            self._writer = None
+            atexit.unregister(self.close)
+
+        if hasattr(self._log_writer, "close"):
+            self._log_writer.close()
+
+        if self.index:
+            self.index = False
+            try:
+                update_index(self.log_file)
+            except Exception as e:
+                print(f"ログ索引の更新エラー: {e}")
+
+    def log_choice_selection(self, question_num, choice, choice_index=None):
         """選択肢の選択をログに記録"""
-        self.log_action(
-            LOG_ACTIONS["CHOICE_SELECTION"],
-            f"問題{question_num}: {choice}"
+        self._log_event(
+            LOG_ACTIONS["CHOICE_SELECTION"], question_num,
+            text=choice, choice_index=choice_index
         )
 
     def log_reason_start(self, question_num):
         """理由入力開始をログに記録"""
-        self.log_action(
-            LOG_ACTIONS["REASON_START"],
-            f"問題{question_num}"
-        )
+        self._log_event(LOG_ACTIONS["REASON_START"], question_num)
 
     def log_reason_text(self, question_num, reason_text):
         """理由のテキスト内容をログに記録"""
         # テキストが長い場合は最初のLOG_TEXT_PREVIEW_LENGTH文字のみ記録
         max_len = LOG_TEXT_PREVIEW_LENGTH
         preview = reason_text[:max_len] + "..." if len(reason_text) > max_len else reason_text
-        self.log_action(
-            LOG_ACTIONS["REASON_TEXT"],
-            f"問題{question_num}: {preview}"
-        )
+        self._log_event(LOG_ACTIONS["REASON_TEXT"], question_num, text=preview)
 
     def log_rewrite_reason(self, question_num):
         """理由の書き直しをログに記録"""
-        self.log_action(
-            LOG_ACTIONS["REASON_REWRITE"],
-            f"問題{question_num}"
-        )
+        self._log_event(LOG_ACTIONS["REASON_REWRITE"], question_num)
 
     def log_next_question(self, from_num, to_num):
         """次の問題への移動をログに記録"""
-        self.log_action(
-            LOG_ACTIONS["QUESTION_MOVE"],
-            f"問題{from_num} → 問題{to_num}"
-        )
+        self._log_event(LOG_ACTIONS["QUESTION_MOVE"], from_num, to_num)
 
     def log_submit(self):
-        """アンケート送信をログに記録"""
-        self.log_action(LOG_ACTIONS["SUBMIT"], "完了")
+        """アンケート送信をログに記録（バッファリング時はここで必ず書き込む）"""
+        self._log_event(LOG_ACTIONS["SUBMIT"], text="完了")
+        self.flush()
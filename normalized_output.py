@@ -0,0 +1,185 @@
+"""
+正規化した回答出力 - 質問文を繰り返さず、問題IDと選択肢番号で回答を保存する
+
+問題（質問文と選択肢）は回答ファイルと同じディレクトリの問題マニフェスト
+（question_manifest.jsonl）に1問1行で1回だけ書き込み、内容のハッシュ（問題ID）で参照する。
+回答ファイル（.norm.csv）の各行は問題ID・選択肢番号・理由だけを持つため、
+ファイルが小さくなり、問題ごとの集計も文字列の比較ではなくIDと番号で行える。
+読み込むときは問題マニフェストから質問文と選択肢を復元する。
+"""
+import csv
+import json
+import os
+import threading
+from file_lock import append_csv_rows, locked_update
+from records import Question, Response, question_texts
+from constants import QUESTION_MANIFEST_FILE
+
+NORMALIZED_EXTENSION = ".norm.csv"
+NORMALIZED_CSV_HEADER = ['回答者ID', 'タイムスタンプ', '問題番号', '問題ID', '選択肢番号', '理由']
+
+# マニフェストのパス → 書き込み済みの問題IDの集合
+_registered_ids = {}
+# マニフェストのパス → ((更新時刻, サイズ), 問題IDと問題の辞書)
+_manifest_cache = {}
+_lock = threading.Lock()
+
+
+def manifest_path_for(response_path):
+    """回答ファイルに対応する問題マニフェストのパス"""
+    return os.path.join(os.path.dirname(response_path), QUESTION_MANIFEST_FILE)
+
+
+def register_questions(manifest_path, questions_by_id):
+    """
+    問題マニフェストにまだない問題を追記
+
+    一度書き込んだ問題IDは覚えておき、2回目以降はファイルを開かない。
+    追記はロックを取得して既存の問題IDを確認してから行うため、複数のプロセスが同時に書き込んでも重複しない。
+
+    Args:
+        manifest_path: 問題マニフェストのパス
+        questions_by_id: 問題IDとQuestionの辞書
+    """
+    key = os.path.abspath(manifest_path)
+    with _lock:
+        known = _registered_ids.setdefault(key, set())
+        if known.issuperset(questions_by_id):
+            return
+
+        with locked_update(manifest_path) as f:
+            content = f.read()
+            for line in content.splitlines():
+                try:
+                    known.add(json.loads(line)["question_id"])
+                except (ValueError, KeyError, TypeError):
+                    continue  # 書き込み途中の行
+
+            lines = [
+                json.dumps(
+                    {"question_id": question_id, **question.to_dict()},
+                    ensure_ascii=False, separators=(',', ':')
+                ) + "\n"
+                for question_id, question in questions_by_id.items() if question_id not in known
+            ]
+            if lines:
+                if content and not content.endswith(b"\n"):
+                    f.write(b"\n")
+                f.write("".join(lines).encode('utf-8'))
+            known.update(questions_by_id)
+
+
+def load_manifest(manifest_path):
+    """
+    問題マニフェストを読み込む（ファイルが変わっていなければ前回の結果を返す）
+
+    Args:
+        manifest_path: 問題マニフェストのパス
+
+    Returns:
+        問題IDとQuestionの辞書
+    """
+    key = os.path.abspath(manifest_path)
+    stat = os.stat(manifest_path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        cached = _manifest_cache.get(key)
+        if cached and cached[0] == version:
+            return cached[1]
+
+    manifest = {}
+    with open(manifest_path, 'rb') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # 書き込み途中の行
+            manifest[record["question_id"]] = Question.from_dict(record)
+
+    with _lock:
+        _manifest_cache[key] = (version, manifest)
+    return manifest
+
+
+def save_response_to_normalized(responses, filepath, questions):
+    """
+    回答データを正規化したCSVファイルに追記
+
+    Args:
+        responses: 回答データ（Response）のリスト
+        filepath: 保存先ファイルパス（.norm.csv）
+        questions: 回答した問題リスト（回答の問題番号から問題IDと選択肢番号を求める）
+    """
+    try:
+        if questions is None:
+            raise ValueError("正規化した出力には問題リストが必要です")
+
+        rows = []
+        used = {}
+        for response in responses:
+            question = questions[response.question_num - 1]
+            if question.text_id != response.text_id:
+                raise ValueError(f"問題{response.question_num}の質問文が問題リストと一致しません")
+            question_id = question.question_id
+            rows.append([
+                response.respondent_id,
+                response.timestamp,
+                response.question_num,
+                question_id,
+                question.choices.index(response.selected_choice),
+                response.reason
+            ])
+            used[question_id] = question
+
+        # 回答の行が存在しない問題IDを参照しないよう、先にマニフェストへ書き込む
+        register_questions(manifest_path_for(filepath), used)
+        append_csv_rows(filepath, rows, header=NORMALIZED_CSV_HEADER)
+
+        return True
+    except Exception as e:
+        print(f"正規化出力エラー: {e}")
+        return False
+
+
+def iter_normalized_rows(filepath):
+    """
+    正規化した回答ファイルを1行ずつ読み込む（質問文は復元しない）
+
+    Yields:
+        (回答者ID, タイムスタンプ, 問題番号, 問題ID, 選択肢番号, 理由) のタプル
+    """
+    with open(filepath, 'r', encoding='utf-8-sig', newline='') as f:
+        reader = csv.reader(f)
+        next(reader, None)  # ヘッダーをスキップ
+
+        for row in reader:
+            if len(row) < 6:
+                continue
+            yield row[0], row[1], int(row[2]), row[3], int(row[4]), row[5]
+
+
+def iter_normalized_responses(filepath, manifest_path=None):
+    """
+    正規化した回答ファイルを問題マニフェストと結合して読み込む
+
+    Args:
+        filepath: 回答ファイル（.norm.csv）のパス
+        manifest_path: 問題マニフェストのパス（Noneの場合は回答ファイルと同じディレクトリ）
+
+    Yields:
+        Response
+    """
+    manifest = None
+    joined = {}  # 問題ID → (質問文の番号, 選択肢のリスト)
+
+    for respondent_id, timestamp, question_num, question_id, choice_index, reason in \
+            iter_normalized_rows(filepath):
+        question = joined.get(question_id)
+        if question is None:
+            if manifest is None:
+                manifest = load_manifest(manifest_path or manifest_path_for(filepath))
+            source = manifest[question_id]
+            question = joined[question_id] = (question_texts.intern(source.text), source.choices)
+
+        text_id, choices = question
+        yield Response(respondent_id, timestamp, question_num, text_id, choices[choice_index], reason)
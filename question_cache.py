@@ -0,0 +1,184 @@
+"""
+問題キャッシュ - 解析済みの問題リストをメモリとファイルにキャッシュする
+
+問題エディタ・集計ダッシュボード・集計表の作り直しなど、問題リスト全体を使う処理（utils.load_questions）が
+同じ問題ファイルを解析し直さないよう、解析結果をメモリ（LRU）と問題ファイルの横のキャッシュファイル
+（<問題ファイル>.qcache）に保存する。
+アンケート画面はCSV・JSON Lines形式の問題ファイルを question_source.py で必要なページだけ読み込むため、
+このキャッシュは使わない（行の位置の索引 <問題ファイル>.qidx を使う）。
+キャッシュファイルの構造: ヘッダー長(4バイト) + ヘッダー(marshal) + 問題リスト(marshal)
+キャッシュは問題ファイルの更新時刻・サイズ・内容のハッシュが一致する場合だけ使う。
+
+キャッシュから取り出すたびに問題と選択肢のリストを作り直す（文字列は共有する）ため、
+呼び出し側（問題エディタなど）が問題リストを書き換えてもキャッシュには影響しない。
+"""
+import hashlib
+import marshal
+import os
+import threading
+import time
+from collections import OrderedDict
+from constants import QUESTION_CACHE_SIZE
+from records import Question
+
+CACHE_SUFFIX = ".qcache"
+CACHE_VERSION = 2
+
+# ファイルの更新時刻の精度より短い間に書き換えられた可能性がある場合は内容も確認する
+_RACY_WINDOW_NS = 2_000_000_000
+
+_memory_cache = OrderedDict()  # 絶対パス → _CacheEntry
+_lock = threading.Lock()
+
+
+class _CacheEntry:
+    """メモリ上のキャッシュ1件"""
+
+    __slots__ = ("mtime_ns", "size", "digest", "questions", "checked_ns")
+
+    def __init__(self, mtime_ns, size, digest, questions):
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.digest = digest
+        self.questions = questions
+        self.checked_ns = time.time_ns()
+
+
+def _file_digest(filepath):
+    """ファイル内容のハッシュ値"""
+    with open(filepath, 'rb') as f:
+        return hashlib.blake2b(f.read(), digest_size=16).digest()
+
+
+def cache_path_for(filepath):
+    """問題ファイルに対応するキャッシュファイルのパス"""
+    return filepath + CACHE_SUFFIX
+
+
+def load_cached(filepath, loader, persist=True):
+    """
+    キャッシュを使って問題リストを読み込む
+
+    Args:
+        filepath: 問題ファイルのパス
+        loader: キャッシュがない場合に問題ファイルを解析する関数（filepathを受け取って問題リストを返す）
+        persist: Trueの場合、解析結果をキャッシュファイルにも保存する
+
+    Returns:
+        問題リスト（呼び出しごとに新しいリスト）
+    """
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return loader(filepath)
+
+    key = os.path.abspath(filepath)
+    with _lock:
+        entry = _memory_cache.get(key)
+        if entry and _is_fresh(entry, stat, filepath):
+            _memory_cache.move_to_end(key)
+            return _copy_questions(entry.questions)
+
+    entry = _load_cache_file(filepath, stat) if persist else None
+
+    if entry is None:
+        digest = _file_digest(filepath)
+        questions = loader(filepath)
+        if not questions:
+            return questions  # 読み込みに失敗した結果はキャッシュしない
+        entry = _CacheEntry(stat.st_mtime_ns, stat.st_size, digest, _copy_questions(questions))
+        if persist:
+            _save_cache_file(filepath, entry)
+
+    with _lock:
+        _memory_cache[key] = entry
+        _memory_cache.move_to_end(key)
+        while len(_memory_cache) > QUESTION_CACHE_SIZE:
+            _memory_cache.popitem(last=False)
+
+    return _copy_questions(entry.questions)
+
+
+def _copy_questions(questions):
+    """問題リスト（または (質問文, 選択肢) のリスト）を複製（選択肢のリストは新しく作り、文字列は共有する）"""
+    return [Question(text, list(choices)) for text, choices in questions]
+
+
+def _is_fresh(entry, stat, filepath):
+    """メモリ上のキャッシュが問題ファイルと一致するか"""
+    if (entry.mtime_ns, entry.size) != (stat.st_mtime_ns, stat.st_size):
+        return False
+    return _check_racy(entry, filepath)
+
+
+def _check_racy(entry, filepath):
+    """
+    キャッシュした直前に書き換えられていたファイルは、更新時刻とサイズが同じまま
+    内容が変わっている可能性があるため、内容のハッシュも確認する
+    """
+    if entry.mtime_ns >= entry.checked_ns - _RACY_WINDOW_NS:
+        if _file_digest(filepath) != entry.digest:
+            return False
+        entry.checked_ns = time.time_ns()
+    return True
+
+
+def _load_cache_file(filepath, stat):
+    """キャッシュファイルを読み込む（問題ファイルと一致しない場合はNone）"""
+    try:
+        with open(cache_path_for(filepath), 'rb') as f:
+            header_size = int.from_bytes(f.read(4), 'little')
+            header = marshal.loads(f.read(header_size))
+            if header.get("version") != CACHE_VERSION:
+                return None
+
+            entry = _CacheEntry(stat.st_mtime_ns, stat.st_size, header["digest"], None)
+            entry.checked_ns = header["checked_ns"]
+            same_stat = (header["mtime_ns"], header["size"]) == (stat.st_mtime_ns, stat.st_size)
+            if same_stat:
+                if not _check_racy(entry, filepath):
+                    return None
+            elif _file_digest(filepath) != entry.digest:
+                return None
+
+            # (質問文, 選択肢) のタプルのまま保持し、取り出すときに _copy_questions で問題にする
+            entry.questions = marshal.loads(f.read())
+    except (OSError, EOFError, ValueError, TypeError, AttributeError, KeyError):
+        return None
+
+    if not same_stat or entry.checked_ns != header["checked_ns"]:
+        # 内容は同じで更新時刻だけ変わった（コピー・上書き保存など）場合は記録を更新する
+        entry.checked_ns = time.time_ns()
+        _save_cache_file(filepath, entry)
+    return entry
+
+
+def _save_cache_file(filepath, entry):
+    """キャッシュファイルを保存（一時ファイルに書いてから置き換える）"""
+    cache_path = cache_path_for(filepath)
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    header = {
+        "version": CACHE_VERSION,
+        "mtime_ns": entry.mtime_ns,
+        "size": entry.size,
+        "digest": entry.digest,
+        "checked_ns": entry.checked_ns
+    }
+    try:
+        header_data = marshal.dumps(header)
+        with open(temp_path, 'wb') as f:
+            f.write(len(header_data).to_bytes(4, 'little'))
+            f.write(header_data)
+            # marshalはタプルのサブクラスを保存できないため、通常のタプルにする
+            f.write(marshal.dumps([tuple(question) for question in entry.questions]))
+        os.replace(temp_path, cache_path)
+    except OSError as e:
+        print(f"問題キャッシュ保存エラー: {e}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def clear_cache():
+    """メモリ上のキャッシュをすべて削除"""
+    with _lock:
+        _memory_cache.clear()
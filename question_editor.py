@@ -3,7 +3,11 @@
 """
 import customtkinter as ctk
 from tkinter import messagebox, filedialog
-from utils import save_questions_to_csv, save_questions_to_json, load_questions
+from utils import (
+    save_questions_to_csv, save_questions_to_json, save_questions_to_jsonl,
+    save_questions_to_pack, load_questions
+)
+from records import Question
 from constants import (
     EDITOR_WINDOW_SIZE, FONT_FAMILY, FONT_SIZE_SECTION, FONT_SIZE_SUBTITLE,
     FONT_SIZE_NORMAL, FONT_SIZE_BUTTON, FONT_SIZE_LABEL, FONT_SIZE_SMALL,
@@ -290,12 +294,7 @@ class QuestionEditor:
             messagebox.showwarning("警告", MSG_MIN_CHOICES)
             return
 
-        question = {
-            'text': question_text,
-            'choices': choices
-        }
-
-        self.questions.append(question)
+        self.questions.append(Question(question_text, choices))
 
         # 選択をリセット
         self.selected_question_index = None
@@ -382,8 +381,8 @@ class QuestionEditor:
         item_frame.bind("<Button-1>", select_question)
 
         # 問題番号と内容
-        question_text = f"Q{index + 1}: {question['text'][:60]}"
-        if len(question['text']) > 60:
+        question_text = f"Q{index + 1}: {question.text[:60]}"
+        if len(question.text) > 60:
             question_text += "..."
 
         label = ctk.CTkLabel(
@@ -403,7 +402,7 @@ class QuestionEditor:
             entry.delete(0, "end")
 
     def save_questions(self):
-        """問題ファイルに保存（CSV/JSON対応）"""
+        """問題ファイルに保存（CSV/JSON/JSON Lines/問題パック対応）"""
         if not self.questions:
             messagebox.showwarning("警告", MSG_NO_QUESTIONS)
             return
@@ -413,6 +412,8 @@ class QuestionEditor:
             filetypes=[
                 ("CSVファイル", "*.csv"),
                 ("JSONファイル", "*.json"),
+                ("JSON Linesファイル", "*.jsonl"),
+                ("問題パック", "*.qpack"),
                 ("すべてのファイル", "*.*")
             ],
             initialfile="questions.csv"
@@ -420,7 +421,11 @@ class QuestionEditor:
 
         if filepath:
             # 拡張子に応じて保存形式を決定
-            if filepath.endswith('.json'):
+            if filepath.endswith('.qpack'):
+                success = save_questions_to_pack(self.questions, filepath)
+            elif filepath.endswith('.jsonl'):
+                success = save_questions_to_jsonl(self.questions, filepath)
+            elif filepath.endswith('.json'):
                 success = save_questions_to_json(self.questions, filepath)
             else:
                 success = save_questions_to_csv(self.questions, filepath)
@@ -431,12 +436,14 @@ class QuestionEditor:
                 messagebox.showerror("エラー", "保存に失敗しました")
 
     def load_questions(self):
-        """問題ファイルから読み込み（CSV/JSON対応）"""
+        """問題ファイルから読み込み（CSV/JSON/JSON Lines/問題パック対応）"""
         filepath = filedialog.askopenfilename(
             filetypes=[
-                ("サポートファイル", "*.csv;*.json"),
+                ("サポートファイル", "*.csv;*.json;*.jsonl;*.qpack"),
                 ("CSVファイル", "*.csv"),
                 ("JSONファイル", "*.json"),
+                ("JSON Linesファイル", "*.jsonl"),
+                ("問題パック", "*.qpack"),
                 ("すべてのファイル", "*.*")
             ]
         )
@@ -446,7 +453,8 @@ class QuestionEditor:
             questions = load_questions(filepath)
 
             if questions:
-                self.questions = questions
+                # 問題パックは読み取り専用のため、編集できるリストに展開する
+                self.questions = list(questions)
                 self.selected_question_index = None
                 self.refresh_question_list()
                 messagebox.showinfo("成功", f"{len(questions)}個の問題を読み込みました")
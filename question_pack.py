@@ -0,0 +1,156 @@
+"""
+問題パック - 起動時に解析が不要なバイナリ形式の問題ファイル（.qpack）
+
+ファイルの構造（数値はすべてリトルエンディアンの符号なし64ビット整数）:
+    ヘッダー:       MAGIC(7バイト) + バージョン(1バイト) + 問題数 + 文字列数
+    問題テーブル:   問題数 + 1 個の値（各問題の最初の文字列の番号）
+    文字列テーブル: 文字列数 + 1 個の値（各文字列の文字列領域内での開始位置）
+    文字列領域:     UTF-8の文字列を区切りなしで連結したもの
+
+1問は「質問文, 選択肢1, 選択肢2, ...」の連続した文字列で表す。
+読み込み時はファイルをメモリマップするだけで、質問文と選択肢は取り出したときに初めてデコードする。
+そのため問題数によらず一定時間で開け、複数のプロセスが同じ問題パックを開いても
+OSのページキャッシュを共有する。
+"""
+import mmap
+import os
+import struct
+from collections.abc import Sequence
+from records import Question
+
+PACK_SUFFIX = ".qpack"
+MAGIC = b"FRQPACK"
+VERSION = 1
+HEADER = struct.Struct("<7sBQQ")
+_UINT64 = struct.Struct("<Q")
+_UINT64_PAIR = struct.Struct("<QQ")
+
+
+class QuestionPack(Sequence):
+    """
+    メモリマップした問題パック（読み取り専用のシーケンス）
+
+    問題は取り出すたびに Question を新しく作る。
+    """
+
+    def __init__(self, filepath):
+        """
+        Args:
+            filepath: 問題パックのパス
+
+        Raises:
+            OSError: ファイルを開けない場合
+            ValueError: 問題パックの形式でない、または壊れている場合
+        """
+        self.filepath = filepath
+        with open(filepath, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < HEADER.size:
+                raise ValueError("問題パックではありません")
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, count, string_count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError("問題パックではありません")
+        if version != VERSION:
+            self._map.close()
+            raise ValueError(f"対応していない問題パックのバージョンです: {version}")
+
+        self._count = count
+        self._question_table = HEADER.size
+        self._string_table = self._question_table + (count + 1) * 8
+        self._blob = self._string_table + (string_count + 1) * 8
+        if self._blob > size or self._blob + self._string_offset(string_count) > size:
+            self._map.close()
+            raise ValueError("問題パックが壊れています")
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("問題番号が範囲外です")
+
+        first, end = _UINT64_PAIR.unpack_from(self._map, self._question_table + index * 8)
+        offsets = struct.unpack_from(f"<{end - first + 1}Q", self._map, self._string_table + first * 8)
+        data = self._map
+        blob = self._blob
+        strings = [
+            data[blob + start:blob + stop].decode('utf-8')
+            for start, stop in zip(offsets, offsets[1:])
+        ]
+        return Question(strings[0], strings[1:])
+
+    def _string_offset(self, number):
+        """文字列領域内での文字列の開始位置"""
+        return _UINT64.unpack_from(self._map, self._string_table + number * 8)[0]
+
+    def close(self):
+        """メモリマップを閉じる（以後は問題を取り出せない）"""
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def write_question_pack(questions, filepath):
+    """
+    問題リストを問題パックに書き出す（一時ファイルに書いてから置き換える）
+
+    Args:
+        questions: 質問データのリスト
+        filepath: 保存先ファイルパス
+    """
+    question_table = [0]
+    string_table = [0]
+    blobs = []
+    position = 0
+
+    for question in questions:
+        for string in [question.text, *question.choices]:
+            data = string.encode('utf-8')
+            blobs.append(data)
+            position += len(data)
+            string_table.append(position)
+        question_table.append(len(blobs))
+
+    temp_path = f"{filepath}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(question_table) - 1, len(blobs)))
+            f.write(struct.pack(f"<{len(question_table)}Q", *question_table))
+            f.write(struct.pack(f"<{len(string_table)}Q", *string_table))
+            f.writelines(blobs)
+        os.replace(temp_path, filepath)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+if __name__ == "__main__":
+    import sys
+    from utils import load_questions, save_questions_to_pack
+
+    if len(sys.argv) < 2:
+        print("使い方: python question_pack.py <問題ファイル(.csv/.json/.jsonl)> [出力ファイル(.qpack)]")
+        sys.exit(1)
+
+    src = sys.argv[1]
+    dst = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(src)[0] + PACK_SUFFIX
+    questions = load_questions(src, use_cache=False)
+    if not questions:
+        print(f"問題を読み込めませんでした: {src}")
+        sys.exit(1)
+    if not save_questions_to_pack(questions, dst):
+        sys.exit(1)
+    print(f"✓ {len(questions)}問を変換: {dst}")
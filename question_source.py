@@ -0,0 +1,243 @@
+"""
+問題ソース - 大きな問題ファイルを必要なページだけ読み込む
+
+CSV形式・JSON Lines形式の問題ファイルは、各問題の行の開始位置だけを索引にして、
+問題を取り出すときにその問題を含むページ（数十問）だけを解析する。
+索引は問題ファイルの横（<問題ファイル>.qidx）に保存し、次回からは解析せずに使う。
+そのため、アンケートの最初の問題を表示するまでの時間は問題数によらない。
+
+JSON形式は全体を解析しないと位置がわからないため、従来どおりリストとして読み込む。
+"""
+import csv
+import io
+import os
+import struct
+import time
+from array import array
+from collections import OrderedDict
+from collections.abc import Sequence
+from constants import QUESTION_PAGE_SIZE, QUESTION_MAX_PAGES
+from records import Question
+
+INDEX_SUFFIX = ".qidx"
+MAGIC = b"FRQIX"
+VERSION = 2
+INDEX_HEADER = struct.Struct("<qqQQ")  # 更新時刻(ns), サイズ, 問題数, 索引の終了位置
+
+# 更新直後のファイルは同じ更新時刻のまま書き換えられる可能性があるため、索引を保存しない
+_STABLE_AFTER_NS = 2_000_000_000
+
+
+class LazyQuestionSource(Sequence):
+    """
+    問題リストの代わりに使える、ページ単位で読み込む読み取り専用のシーケンス
+
+    問題は load_questions と同じ Question。
+    """
+
+    def __init__(self, filepath, page_size=QUESTION_PAGE_SIZE, max_pages=QUESTION_MAX_PAGES):
+        """
+        Args:
+            filepath: 問題ファイルのパス（.csv または .jsonl）
+            page_size: 1ページの問題数
+            max_pages: メモリに保持する最大ページ数
+        """
+        self.filepath = filepath
+        self.format = "jsonl" if filepath.endswith(".jsonl") else "csv"
+        self.page_size = page_size
+        self.max_pages = max_pages
+
+        stat = os.stat(filepath)
+        self._stat = (stat.st_mtime_ns, stat.st_size)
+
+        self._offsets = array('Q')  # 各問題の行の開始位置
+        self._scan_pos = 0  # 索引を作成済みの位置
+        self._complete = False
+        self._pages = OrderedDict()  # ページ番号 → 問題リスト
+
+        if not self._load_index():
+            self._scan_pos = 0
+            if self.format == "csv":
+                self._skip_header()
+
+    def __len__(self):
+        self._index_until(None)
+        return len(self._offsets)
+
+    def extend_index(self, count):
+        """
+        索引をさらに最大count問分作成する
+
+        len() はファイルの最後まで読むため、画面を止めずに問題数を知りたい場合は少しずつこれを呼ぶ。
+
+        Returns:
+            問題数（まだファイルの最後まで索引を作成していない場合はNone）
+        """
+        self._index_until(len(self._offsets) + count)
+        return len(self._offsets) if self._complete else None
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+        if index < 0:
+            raise IndexError("問題番号が範囲外です")
+        self._index_until(index)
+        if index >= len(self._offsets):
+            raise IndexError("問題番号が範囲外です")
+
+        page_num, position = divmod(index, self.page_size)
+        page = self._pages.get(page_num)
+        if page is None:
+            page = self._load_page(page_num)
+            self._pages[page_num] = page
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+        else:
+            self._pages.move_to_end(page_num)
+        return page[position]
+
+    def _skip_header(self):
+        """CSVのヘッダー行を索引の対象から外す"""
+        with open(self.filepath, 'rb') as f:
+            pending = b""
+            for line in f:
+                pending += line
+                if pending.count(b'"') % 2 == 0:
+                    break
+            self._scan_pos = len(pending)
+
+    def _index_until(self, index):
+        """
+        指定した番号の問題まで索引を作成（Noneの場合はファイルの最後まで）
+        """
+        if self._complete or (index is not None and index < len(self._offsets)):
+            return
+
+        # 索引の作成は1ページ分ずつ先に進める
+        target = None if index is None else index + self.page_size
+        is_csv = self.format == "csv"
+
+        with open(self.filepath, 'rb') as f:
+            f.seek(self._scan_pos)
+            offset = self._scan_pos
+            record_start = offset
+            quotes = 0
+            has_comma = False
+
+            for line in f:
+                if not quotes:
+                    record_start = offset
+                    has_comma = False
+                offset += len(line)
+
+                if is_csv:
+                    # クォート内の改行を含む行は、クォートが閉じるまでつなげて1問とする
+                    quotes += line.count(b'"')
+                    has_comma = has_comma or b"," in line
+                    if quotes % 2:
+                        continue
+                    quotes = 0
+                    # 列が2つ未満の行（空行など）は load_questions と同様に問題として扱わない
+                    is_question = has_comma
+                else:
+                    # 書き込み途中の最後の行は iter_jsonl と同様に読み込まない
+                    if not line.endswith(b"\n"):
+                        break
+                    # 読み込めない行は load_questions_from_jsonl と同様に問題として数えない
+                    is_question = Question.from_json_line(line) is not None
+
+                if is_question:
+                    self._offsets.append(record_start)
+                self._scan_pos = offset
+
+                if target is not None and len(self._offsets) > target:
+                    return
+
+        self._complete = True
+        self._save_index()
+
+    def _load_page(self, page_num):
+        """1ページ分の問題を解析"""
+        first = page_num * self.page_size
+        last = first + self.page_size
+        start = self._offsets[first]
+        end = self._offsets[last] if last < len(self._offsets) else self._scan_pos
+
+        with open(self.filepath, 'rb') as f:
+            f.seek(start)
+            data = f.read(end - start)
+
+        if self.format == "jsonl":
+            # 索引と同じく b"\n" だけで区切る（str.splitlines は \u2028 などでも区切ってしまう）
+            questions = map(Question.from_json_line, data.split(b"\n"))
+            return [question for question in questions if question]
+
+        return [
+            Question(row[1], [choice for choice in row[2:] if choice.strip()])
+            for row in csv.reader(io.StringIO(data.decode('utf-8-sig'), newline=''))
+            if len(row) >= 2
+        ]
+
+    def _load_index(self):
+        """保存済みの索引を読み込む（問題ファイルと一致しない場合はFalse）"""
+        try:
+            with open(self.filepath + INDEX_SUFFIX, 'rb') as f:
+                if f.read(len(MAGIC) + 1) != MAGIC + bytes([VERSION]):
+                    return False
+                mtime_ns, size, count, scan_pos = INDEX_HEADER.unpack(f.read(INDEX_HEADER.size))
+                if (mtime_ns, size) != self._stat:
+                    return False
+                offsets = array('Q')
+                offsets.frombytes(f.read(count * offsets.itemsize))
+        except (OSError, struct.error, ValueError):
+            return False
+
+        if len(offsets) != count:
+            return False
+        self._offsets = offsets
+        self._scan_pos = scan_pos
+        self._complete = True
+        return True
+
+    def _save_index(self):
+        """索引をファイルに保存"""
+        if time.time_ns() - self._stat[0] < _STABLE_AFTER_NS:
+            return
+
+        index_path = self.filepath + INDEX_SUFFIX
+        temp_path = f"{index_path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(MAGIC + bytes([VERSION]))
+                f.write(INDEX_HEADER.pack(*self._stat, len(self._offsets), self._scan_pos))
+                f.write(self._offsets.tobytes())
+            os.replace(temp_path, index_path)
+        except OSError as e:
+            print(f"問題索引保存エラー: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+def open_question_source(filepath):
+    """
+    問題ファイルを開く
+
+    Args:
+        filepath: 問題ファイルのパス
+
+    Returns:
+        CSV形式・JSON Lines形式の場合はLazyQuestionSource、それ以外は問題リスト
+        （どちらも len() と添字で問題を取り出せる。読み込めない場合は空のリスト）
+    """
+    if filepath.endswith(('.csv', '.jsonl')) and os.path.exists(filepath):
+        try:
+            return LazyQuestionSource(filepath)
+        except OSError as e:
+            print(f"問題ファイル読み込みエラー: {e}")
+            return []
+
+    from utils import load_questions
+    return load_questions(filepath)
@@ -0,0 +1,175 @@
+"""
+レコード定義 - 問題と回答をタプルベースの軽量なデータとして扱う
+
+回答は質問文を直接持たず、質問文テーブルの番号で参照する。
+1日分の回答をまとめて読み込んでも、同じ質問文は1つしかメモリに保持しない。
+"""
+import functools
+import hashlib
+import json
+import threading
+from collections import namedtuple
+
+
+class QuestionTextTable:
+    """質問文と番号の対応表（同じ質問文には同じ番号を割り当てる）"""
+
+    def __init__(self):
+        self._texts = []
+        self._ids = {}
+        self._lock = threading.Lock()
+
+    def intern(self, text):
+        """
+        質問文の番号を取得（初めての質問文は登録する）
+
+        Args:
+            text: 質問文
+
+        Returns:
+            質問文の番号
+        """
+        text_id = self._ids.get(text)
+        if text_id is None:
+            with self._lock:
+                text_id = self._ids.get(text)
+                if text_id is None:
+                    text_id = len(self._texts)
+                    self._texts.append(text)
+                    self._ids[text] = text_id
+        return text_id
+
+    def text(self, text_id):
+        """番号に対応する質問文"""
+        return self._texts[text_id]
+
+    def __len__(self):
+        return len(self._texts)
+
+
+# プロセス内で共有する質問文テーブル
+question_texts = QuestionTextTable()
+
+
+class Question(namedtuple("Question", ["text", "choices"])):
+    """
+    1問分の問題
+
+    Attributes:
+        text: 質問文
+        choices: 選択肢のリスト
+    """
+    __slots__ = ()
+
+    @property
+    def text_id(self):
+        """質問文テーブルでの番号"""
+        return question_texts.intern(self.text)
+
+    @property
+    def question_id(self):
+        """質問文と選択肢の内容から求めた問題ID（内容が同じ問題は常に同じID）"""
+        return _content_id(self.text, tuple(self.choices))
+
+    def to_dict(self):
+        """問題ファイル（JSON/JSON Lines）の1問分に変換"""
+        return {"text": self.text, "choices": list(self.choices)}
+
+    @classmethod
+    def from_dict(cls, data):
+        """問題ファイル（JSON/JSON Lines）の1問分から問題を作成"""
+        return cls(data["text"], list(data.get("choices", [])))
+
+    @classmethod
+    def from_record(cls, record):
+        """問題ファイルの1問分から問題を作成（形式が正しくない場合はNone）"""
+        try:
+            return cls.from_dict(record)
+        except (KeyError, TypeError):
+            return None
+
+    @classmethod
+    def from_json_line(cls, line):
+        """JSON Linesの1行（バイト列）から問題を作成（空行・JSONとして読めない行・形式が正しくない行はNone）"""
+        if not line.strip():
+            return None
+        try:
+            record = json.loads(line.decode('utf-8-sig'))
+        except ValueError:
+            return None
+        return cls.from_record(record)
+
+
+@functools.lru_cache(maxsize=4096)
+def _content_id(text, choices):
+    """質問文と選択肢のハッシュ値（16進数16桁）"""
+    content = json.dumps([text, list(choices)], ensure_ascii=False, separators=(',', ':'))
+    return hashlib.blake2b(content.encode('utf-8'), digest_size=8).hexdigest()
+
+
+_RESPONSE_FIELDS = [
+    "respondent_id", "timestamp", "question_num", "text_id", "selected_choice", "reason"
+]
+
+
+class Response(namedtuple("Response", _RESPONSE_FIELDS)):
+    """
+    1問分の回答
+
+    Attributes:
+        respondent_id: 回答者ID
+        timestamp: 回答日時の文字列
+        question_num: 問題番号
+        text_id: 質問文テーブルでの質問文の番号
+        selected_choice: 選択した回答
+        reason: 理由
+    """
+    __slots__ = ()
+
+    @classmethod
+    def create(cls, respondent_id, timestamp, question_num, question_text, selected_choice, reason):
+        """質問文から回答を作成（質問文は質問文テーブルに登録して番号で持つ）"""
+        return cls(
+            respondent_id, timestamp, question_num, question_texts.intern(question_text),
+            selected_choice, reason
+        )
+
+    @property
+    def question_text(self):
+        """質問文"""
+        return question_texts.text(self.text_id)
+
+    def to_row(self):
+        """回答ファイル（CSV）の1行に変換"""
+        return [
+            self.respondent_id, self.timestamp, self.question_num, self.question_text,
+            self.selected_choice, self.reason
+        ]
+
+    def to_dict(self):
+        """回答ファイル（JSON/JSON Lines）の1件分に変換"""
+        return {
+            "respondent_id": self.respondent_id,
+            "timestamp": self.timestamp,
+            "question_num": self.question_num,
+            "question_text": self.question_text,
+            "selected_choice": self.selected_choice,
+            "reason": self.reason
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """回答ファイル（JSON/JSON Lines）の1件分から回答を作成"""
+        return cls.create(
+            data["respondent_id"],
+            data["timestamp"],
+            data["question_num"],
+            data["question_text"],
+            data["selected_choice"],
+            data["reason"]
+        )
+
+    @classmethod
+    def from_row(cls, row):
+        """回答ファイル（CSV）の1行から回答を作成"""
+        return cls.create(row[0], row[1], int(row[2]), row[3], row[4], row[5])
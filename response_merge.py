@@ -0,0 +1,223 @@
+"""
+回答ファイルの結合 - 回答者ごとの回答ファイルを1つのCSV・JSON Lines・SQLiteにまとめる
+
+回答ディレクトリから response_name_format に一致する回答ファイル（CSV・JSON・JSON Lines・正規化CSV）を探し、
+ファイルをいくつかずつまとめて複数のプロセスで解析する。
+解析した結果は見つけた順に出力先へ書き込むため、出力の順序は並列数によらず同じになる。
+
+各ファイルのBOMは読み込み時に取り除き、ヘッダー行（ファイルの途中に混ざったものも含む）は読み飛ばして、
+出力先には先頭に1回だけ書き込む。
+"""
+import codecs
+import csv
+import io
+import json
+import os
+import sys
+from multiprocessing import Pool
+from compaction import is_compactable_segment, read_snapshot
+from filename_template import compile_template
+from normalized_output import NORMALIZED_EXTENSION, iter_normalized_responses
+from sharding import walk_files
+from sqlite_store import SqliteStore
+from utils import RESPONSE_CSV_HEADER, RESPONSE_EXTENSIONS, iter_jsonl, strip_response_extension
+from constants import MERGE_CHUNK_SIZE
+
+MERGE_FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".sqlite3": "sqlite", ".db": "sqlite"}
+
+
+def find_response_files(directory, name_format):
+    """
+    回答ディレクトリからファイル名のフォーマットに一致する回答ファイルを探す
+
+    拡張子は出力形式によって変わるため、フォーマットの拡張子を除いた部分で照合する。
+    出力形式が both の場合のように同じ名前で形式の違うファイルがある場合は、
+    RESPONSE_EXTENSIONS の順で先の形式（CSVとJSONならCSV）の1つだけを使う。
+    シャードに分けたディレクトリ、コンパクションでまとめたセグメントも含め、
+    セグメントに取り込み済みの回答ファイルは除く。
+
+    Args:
+        directory: 回答ディレクトリ
+        name_format: 回答ファイル名のフォーマット（response_name_format）
+
+    Returns:
+        ファイル名順の回答ファイルのパスのリスト
+    """
+    pattern = compile_template(strip_response_extension(name_format)).pattern
+
+    def accept(name):
+        base = strip_response_extension(name)
+        return (base != name and pattern.fullmatch(base)) or is_compactable_segment(name)
+
+    chosen = {}  # 拡張子を除いたパス → パス
+    for path in walk_files(directory, accept):
+        # セグメントは拡張子ごとに別の回答を含むため、すべて使う
+        base = path if is_compactable_segment(os.path.basename(path)) else strip_response_extension(path)
+        current = chosen.get(base)
+        if current is None or _format_rank(path) < _format_rank(current):
+            chosen[base] = path
+    return sorted(chosen.values())
+
+
+def _format_rank(path):
+    """同じ名前の回答ファイルのうちどれを使うかの優先順位（小さいほど優先）"""
+    return next(i for i, ext in enumerate(RESPONSE_EXTENSIONS) if path.endswith(ext))
+
+
+def iter_file_rows(path):
+    """
+    回答ファイル1つ分の行を読み込む
+
+    Yields:
+        [回答者ID, タイムスタンプ, 問題番号, 質問文, 選択した回答, 理由] のリスト
+    """
+    if path.endswith(NORMALIZED_EXTENSION):
+        for response in iter_normalized_responses(path):
+            yield response.to_row()
+    elif path.endswith(".jsonl"):
+        for record in iter_jsonl(path):
+            yield _dict_row(record)
+    elif path.endswith(".json"):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        for record in data.get("responses", []) if isinstance(data, dict) else data:
+            yield _dict_row(record)
+    else:
+        # utf-8-sigでBOMを取り除き、ヘッダー行はファイルの途中にあっても読み飛ばす
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            for row in csv.reader(f):
+                if len(row) < 6 or row == RESPONSE_CSV_HEADER:
+                    continue
+                try:
+                    row[2] = int(row[2])
+                except ValueError:
+                    continue
+                yield row[:6]
+
+
+def _dict_row(record):
+    """JSON・JSON Linesの1回答を行に変換"""
+    return [
+        record["respondent_id"], record["timestamp"], record["question_num"],
+        record["question_text"], record["selected_choice"], record["reason"]
+    ]
+
+
+def _parse_files(task):
+    """
+    ワーカープロセスでファイルをまとめて解析
+
+    Args:
+        task: (ファイルパスのリスト, 出力形式) のタプル
+
+    Returns:
+        (出力データ, 行数, 読み込めなかったファイルのリスト) のタプル
+        （出力データはcsv・jsonlの場合はバイト列、sqliteの場合は行のリスト）
+    """
+    paths, output_format = task
+    rows = []
+    failed = []
+    for path in paths:
+        try:
+            rows.extend(iter_file_rows(path))
+        except (OSError, ValueError, KeyError, TypeError, IndexError) as e:
+            failed.append(f"{path}: {e}")
+
+    if output_format == "sqlite":
+        return rows, len(rows), failed
+
+    if output_format == "jsonl":
+        fields = ("respondent_id", "timestamp", "question_num", "question_text", "selected_choice", "reason")
+        data = "".join(
+            json.dumps(dict(zip(fields, row)), ensure_ascii=False, separators=(',', ':')) + "\n"
+            for row in rows
+        )
+    else:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        data = buffer.getvalue()
+    return data.encode('utf-8'), len(rows), failed
+
+
+def merge_responses(paths, output_path, processes=None, chunk_size=MERGE_CHUNK_SIZE):
+    """
+    回答ファイルを1つの出力先にまとめる
+
+    CSV・JSON Linesの出力先は一時ファイルに書いてから置き換える（既存のファイルは上書き）。
+    SQLiteの出力先には回答を追加する。
+
+    Args:
+        paths: 回答ファイルのパスのリスト
+        output_path: 出力先（拡張子 .csv / .jsonl / .sqlite3 で形式を決める）
+        processes: 並列数（Noneの場合はCPU数、1の場合は並列にしない）
+        chunk_size: 1つのプロセスにまとめて渡すファイル数
+
+    Returns:
+        (結合した回答数, 読み込めなかったファイルのリスト) のタプル
+    """
+    output_format = MERGE_FORMATS.get(os.path.splitext(output_path)[1].lower())
+    if output_format is None:
+        raise ValueError(f"未対応の出力形式です: {output_path}")
+
+    output_abspath = os.path.abspath(output_path)
+    paths = [path for path in paths if os.path.abspath(path) != output_abspath]
+    tasks = [(paths[i:i + chunk_size], output_format) for i in range(0, len(paths), chunk_size)]
+
+    if len(tasks) > 1 and processes != 1:
+        with Pool(processes) as pool:
+            return _write_results(pool.imap(_parse_files, tasks), output_path, output_format)
+    return _write_results(map(_parse_files, tasks), output_path, output_format)
+
+
+def _write_results(results, output_path, output_format):
+    """解析結果を順に出力先へ書き込む"""
+    total = 0
+    failed = []
+
+    if output_format == "sqlite":
+        store = SqliteStore(output_path)
+        try:
+            for rows, count, errors in results:
+                store.insert_response_rows(rows)
+                total += count
+                failed.extend(errors)
+        finally:
+            store.close()
+        return total, failed
+
+    temp_path = f"{output_path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'wb') as f:
+            if output_format == "csv":
+                buffer = io.StringIO()
+                csv.writer(buffer).writerow(RESPONSE_CSV_HEADER)
+                f.write(codecs.BOM_UTF8 + buffer.getvalue().encode('utf-8'))
+            for data, count, errors in results:
+                f.write(data)
+                total += count
+                failed.extend(errors)
+        os.replace(temp_path, output_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return total, failed
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("使い方: python response_merge.py <出力先(.csv/.jsonl/.sqlite3)> [回答ディレクトリ] [並列数]")
+        sys.exit(1)
+
+    from config_manager import ConfigManager
+
+    config_manager = ConfigManager()
+    response_dir = sys.argv[2] if len(sys.argv) > 2 else config_manager.get("response_directory", "")
+    processes = int(sys.argv[3]) if len(sys.argv) > 3 else None
+    name_format = config_manager.get("response_name_format", "responses_{respondent_id}_{date}.csv")
+
+    with read_snapshot(response_dir):
+        response_files = find_response_files(response_dir, name_format)
+        merged, errors = merge_responses(response_files, sys.argv[1], processes)
+    for error in errors:
+        print(f"読み込みエラー: {error}")
+    print(f"✓ {len(response_files)}ファイル・{merged}件の回答を結合: {sys.argv[1]}")
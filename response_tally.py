@@ -0,0 +1,332 @@
+"""
+回答の集計表 - 回答を保存するたびに集計を更新し、最新の集計をファイルを読み直さずに取得する
+
+回答ディレクトリに集計表（response_tally.json）を置き、アンケートの送信ごとに
+問題・選択肢ごとの回答数、セッション数・完了数、時間ごとのセッション数、理由の文字数の合計を加算する。
+集計表の大きさは問題数・選択肢数だけで決まり、回答が増えても読み込みの時間は変わらない。
+
+更新はロックを取得して行い、一時ファイルに書いてから置き換えるため、
+複数のアプリが同時に送信しても加算が失われず、読み込み側は書き込み途中の集計表を読まない。
+
+回答の保存後に集計表の更新に失敗した場合などは、python response_tally.py verify で
+すべての回答ファイルを読み直した集計と比べ、rebuild で作り直せる。
+"""
+import json
+import os
+from datetime import datetime, timedelta
+from file_lock import locked_update
+from constants import TALLY_FILE
+
+TALLY_VERSION = 2
+
+# 集計表のパス → ((更新時刻, サイズ), ResponseTally)
+_tally_cache = {}
+
+
+class ResponseTally:
+    """
+    回答の集計
+
+    Attributes:
+        sessions: 回答を保存したセッション数
+        completed: すべての問題に回答したセッション数
+        responses: 回答数
+        questions: 質問文 → {"choices": {選択肢: 回答数}, "answered": 回答数, "reason_chars": 理由の文字数の合計}
+        hourly: 時間（YYYY-MM-DD HH） → その時間に回答を終えたセッション数
+    """
+
+    def __init__(self, sessions=0, completed=0, responses=0, questions=None, hourly=None):
+        self.sessions = sessions
+        self.completed = completed
+        self.responses = responses
+        self.questions = questions if questions is not None else {}
+        self.hourly = hourly if hourly is not None else {}
+
+    def add_session(self, responses, question_count):
+        """
+        1セッション分の回答を加算
+
+        Args:
+            responses: 回答（Response）のリスト
+            question_count: セッションの問題数（回答数がこれ以上の場合は完了として数える）
+        """
+        self.sessions += 1
+        if len(responses) >= question_count:
+            self.completed += 1
+        if responses:
+            self._add_hour(max(response.timestamp for response in responses))
+        for response in responses:
+            self._add(response.question_text, response.selected_choice, response.reason)
+
+    def _add_hour(self, timestamp):
+        hour = timestamp[:13]
+        self.hourly[hour] = self.hourly.get(hour, 0) + 1
+
+    def _add(self, question_text, choice, reason):
+        stats = self.questions.get(question_text)
+        if stats is None:
+            stats = self.questions[question_text] = {"choices": {}, "answered": 0, "reason_chars": 0}
+        stats["choices"][choice] = stats["choices"].get(choice, 0) + 1
+        stats["answered"] += 1
+        stats["reason_chars"] += len(reason)
+        self.responses += 1
+
+    def distribution(self, question_text):
+        """
+        1問の選択肢ごとの回答数と割合
+
+        Returns:
+            (選択肢, 回答数, 割合) のリスト
+        """
+        stats = self.questions.get(question_text)
+        if not stats:
+            return []
+        total = stats["answered"]
+        return [
+            (choice, count, count / total if total else 0.0)
+            for choice, count in stats["choices"].items()
+        ]
+
+    def sessions_per_hour(self, now=None, hours=3):
+        """
+        直近の1時間あたりのセッション数
+
+        Args:
+            now: 基準の日時（Noneの場合は現在時刻）
+            hours: 平均する時間数（現在の時間を含む）
+
+        Returns:
+            直近hours時間（現在の時間は経過した分だけ）に回答を終えたセッション数の1時間あたりの平均
+        """
+        now = now or datetime.now()
+        start = now.replace(minute=0, second=0, microsecond=0)
+        count = sum(
+            self.hourly.get((start - timedelta(hours=i)).strftime("%Y-%m-%d %H"), 0) for i in range(hours)
+        )
+        elapsed = hours - 1 + (now - start).total_seconds() / 3600
+        return count / elapsed if elapsed > 0 else 0.0
+
+    def mean_reason_length(self, question_text=None):
+        """理由の平均文字数（質問文を指定しない場合はすべての問題）"""
+        if question_text is None:
+            stats = self.questions.values()
+        else:
+            stats = [self.questions[question_text]] if question_text in self.questions else []
+        answered = sum(item["answered"] for item in stats)
+        return sum(item["reason_chars"] for item in stats) / answered if answered else 0.0
+
+    def to_dict(self):
+        """集計表（JSON）の内容に変換"""
+        return {
+            "version": TALLY_VERSION,
+            "sessions": self.sessions,
+            "completed": self.completed,
+            "responses": self.responses,
+            "questions": self.questions,
+            "hourly": self.hourly
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """集計表（JSON）の内容から作成"""
+        return cls(data.get("sessions", 0), data.get("completed", 0), data.get("responses", 0),
+                   data.get("questions", {}), data.get("hourly", {}))
+
+    def differences(self, other):
+        """
+        別の集計との違い
+
+        Returns:
+            違いを説明する文字列のリスト（同じ場合は空のリスト）
+        """
+        result = []
+        for name in ("sessions", "completed", "responses"):
+            if getattr(self, name) != getattr(other, name):
+                result.append(f"{name}: {getattr(self, name)} != {getattr(other, name)}")
+        for text in sorted(self.questions.keys() | other.questions.keys()):
+            mine = self.questions.get(text)
+            theirs = other.questions.get(text)
+            if mine != theirs:
+                result.append(f"{text}: {mine} != {theirs}")
+        if self.hourly != other.hourly:
+            result.append(f"hourly: {self.hourly} != {other.hourly}")
+        return result
+
+
+def tally_path_for(config_manager):
+    """設定の回答ディレクトリの集計表のパス"""
+    return os.path.join(config_manager.get("response_directory", "") or ".", TALLY_FILE)
+
+
+def load_tally(tally_path):
+    """
+    集計表を読み込む（ファイルが変わっていなければ前回の結果を返す）
+
+    Returns:
+        ResponseTally（集計表がない場合は空の集計）
+    """
+    try:
+        stat = os.stat(tally_path)
+    except FileNotFoundError:
+        return ResponseTally()
+    version = (stat.st_mtime_ns, stat.st_size)
+    key = os.path.abspath(tally_path)
+    cached = _tally_cache.get(key)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    with open(tally_path, 'r', encoding='utf-8') as f:
+        tally = ResponseTally.from_dict(json.load(f))
+    _tally_cache[key] = (version, tally)
+    return tally
+
+
+def _save_tally(tally_path, tally):
+    """集計表を一時ファイルに書いてから置き換える"""
+    temp_path = f"{tally_path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(tally.to_dict(), f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(temp_path, tally_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def record_session(tally_path, responses, question_count):
+    """
+    保存したセッションの回答を集計表に加算
+
+    Args:
+        tally_path: 集計表のパス
+        responses: 回答（Response）のリスト
+        question_count: セッションの問題数
+
+    Returns:
+        成功した場合True
+    """
+    try:
+        directory = os.path.dirname(tally_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with locked_update(f"{tally_path}.lock"):
+            try:
+                with open(tally_path, 'r', encoding='utf-8') as f:
+                    tally = ResponseTally.from_dict(json.load(f))
+            except FileNotFoundError:
+                tally = ResponseTally()
+            tally.add_session(responses, question_count)
+            _save_tally(tally_path, tally)
+        return True
+    except Exception as e:
+        print(f"集計表更新エラー: {e}")
+        return False
+
+
+def scan_tally(rows, question_count=None):
+    """
+    回答の行をすべて読み込んで集計を作り直す
+
+    同じ回答者・問題番号の行は1回だけ数える（output_format が both の場合のCSVとJSONなど）。
+
+    Args:
+        rows: [回答者ID, タイムスタンプ, 問題番号, 質問文, 選択した回答, 理由] のイテラブル
+        question_count: 完了とみなす回答数（Noneの場合は1セッションの回答数の最大値）
+
+    Returns:
+        ResponseTally
+    """
+    tally = ResponseTally()
+    seen = set()
+    answers = {}  # 回答者ID → 回答数
+    finished = {}  # 回答者ID → 最後の回答のタイムスタンプ
+    for respondent_id, timestamp, question_num, question_text, choice, reason in rows:
+        key = (respondent_id, int(question_num))
+        if key in seen:
+            continue
+        seen.add(key)
+        answers[respondent_id] = answers.get(respondent_id, 0) + 1
+        finished[respondent_id] = max(finished.get(respondent_id, timestamp), timestamp)
+        tally._add(question_text, choice, reason)
+
+    for timestamp in finished.values():
+        tally._add_hour(timestamp)
+
+    if question_count is None:
+        question_count = max(answers.values(), default=0)
+    tally.sessions = len(answers)
+    tally.completed = sum(1 for count in answers.values() if count >= question_count)
+    return tally
+
+
+def rebuild_tally(tally_path, tally):
+    """
+    集計表を作り直した集計で置き換える
+
+    読み込みから置き換えまでの間に送信された回答は数え漏れ・二重に数える可能性があるため、
+    回答の送信がない間に実行する。
+    """
+    with locked_update(f"{tally_path}.lock"):
+        _save_tally(tally_path, tally)
+
+
+def _scan_config(config_manager):
+    """設定の回答ディレクトリ（SQLite形式の場合はデータベースも）の回答をすべて読み込んで集計"""
+    from compaction import read_snapshot
+    from response_merge import find_response_files, iter_file_rows
+    from sqlite_store import SqliteStore
+    from utils import load_questions
+
+    def iter_rows():
+        for path in find_response_files(response_dir, config_manager.get("response_name_format")):
+            yield from iter_file_rows(path)
+        database_path = config_manager.get_database_path()
+        if config_manager.get("output_format", "csv") == "sqlite" and os.path.exists(database_path):
+            store = SqliteStore(database_path)
+            try:
+                for response in store.iter_responses():
+                    yield response.to_row()
+            finally:
+                store.close()
+
+    questions_path = config_manager.get_questions_path()
+    question_count = None
+    if questions_path and os.path.exists(questions_path):
+        question_count = len(load_questions(questions_path))
+
+    response_dir = config_manager.get("response_directory", "")
+    with read_snapshot(response_dir):
+        return scan_tally(iter_rows(), question_count)
+
+
+if __name__ == "__main__":
+    import sys
+    from config_manager import ConfigManager
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "show"
+    if command not in ("show", "verify", "rebuild"):
+        print("使い方: python response_tally.py [show|verify|rebuild]")
+        sys.exit(1)
+
+    config_manager = ConfigManager()
+    path = tally_path_for(config_manager)
+
+    if command == "show":
+        current = load_tally(path)
+        print(f"セッション数: {current.sessions}  完了数: {current.completed}  回答数: {current.responses}  "
+              f"直近の1時間あたりのセッション数: {current.sessions_per_hour():.1f}")
+        for text in current.questions:
+            print(f"\n{text}（理由の平均 {current.mean_reason_length(text):.1f}文字）")
+            for choice, count, ratio in current.distribution(text):
+                print(f"  {choice}: {count}件 ({ratio:.1%})")
+    elif command == "verify":
+        differences = load_tally(path).differences(_scan_config(config_manager))
+        for difference in differences:
+            print(f"不一致: {difference}")
+        if differences:
+            sys.exit(1)
+        print("✓ 集計表はすべての回答ファイルの集計と一致しています")
+    else:
+        rebuilt = _scan_config(config_manager)
+        rebuild_tally(path, rebuilt)
+        print(f"✓ 集計表を作り直しました: {rebuilt.sessions}セッション・{rebuilt.responses}件の回答")
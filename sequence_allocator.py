@@ -0,0 +1,91 @@
+"""
+連番の割り当て - ファイル名の {sequence} に使う番号をカウンターファイルから払い出す
+
+ディレクトリと {sequence} 以外を埋めたファイル名ごとに小さなカウンターファイル
+（<ディレクトリ>/.sequence_<ファイル名のハッシュ>）を置き、ロックを取得して1ずつ増やす。
+ディレクトリ内のファイルを数えるのはカウンターファイルがない場合の1回だけで済み、
+複数のアプリ（プロセス）が同時に番号を取っても重複しない。
+"""
+import hashlib
+import os
+from file_lock import locked_update
+from filename_template import compile_template
+from sharding import iter_shard_directories
+
+COUNTER_PREFIX = ".sequence_"
+COUNTER_WIDTH = 20
+
+
+def counter_path_for(directory, base_filename):
+    """ディレクトリとベースとなるファイル名に対応するカウンターファイルのパス"""
+    digest = hashlib.blake2b(base_filename.encode('utf-8'), digest_size=8).hexdigest()
+    return os.path.join(directory, COUNTER_PREFIX + digest)
+
+
+def allocate_sequence(directory, base_filename, count=1):
+    """
+    次の連番を割り当てる（割り当てた番号は他のプロセスには払い出されない）
+
+    番号は {sequence} 以外を埋めたファイル名ごとに数えるため、日付や回答者IDが変わると1から始まる。
+
+    Args:
+        directory: ディレクトリパス
+        base_filename: ベースとなるファイル名（{sequence}だけを残して日付・回答者IDなどを埋めたもの）
+        count: まとめて割り当てる個数（連続した番号を確保する）
+
+    Returns:
+        割り当てた連番（count > 1 の場合は先頭の番号）
+    """
+    if not directory:
+        return scan_next_sequence(directory, base_filename)
+
+    counter_path = counter_path_for(directory, base_filename)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with locked_update(counter_path) as f:
+            content = f.read().strip()
+            if content.isdigit():
+                number = int(content) + 1
+            else:
+                # カウンターがない（または壊れている）場合だけディレクトリを数え直す
+                number = scan_next_sequence(directory, base_filename)
+
+            # 最後に割り当てた番号を固定長で上書きする（切り詰めが不要で、書き込み途中でも桁が混ざらない）
+            f.seek(0)
+            f.write(f"{number + count - 1:0{COUNTER_WIDTH}d}".encode('ascii'))
+        return number
+    except OSError as e:
+        print(f"連番カウンターエラー: {e}")
+        return scan_next_sequence(directory, base_filename)
+
+
+def scan_next_sequence(directory, base_filename):
+    """
+    ディレクトリ内の既存ファイルを調べて次の連番を求める（カウンターファイルがない場合用）
+
+    ベースとなるファイル名に一致するすべてのファイル（拡張子によらない）の連番の最大値の次を返す。
+
+    Args:
+        directory: ディレクトリパス
+        base_filename: ベースとなるファイル名（{sequence}を含む）
+
+    Returns:
+        次の連番
+    """
+    if not directory or not os.path.exists(directory):
+        return 1
+
+    stem_template = compile_template(os.path.splitext(base_filename)[0])
+    max_num = 0
+    try:
+        # ディレクトリをシャードに分けている場合はすべてのシャードを調べる
+        for shard in iter_shard_directories(directory):
+            with os.scandir(shard) as entries:
+                for entry in entries:
+                    values = stem_template.match_stem(entry.name)
+                    if values and values.get("sequence"):
+                        max_num = max(max_num, int(values["sequence"]))
+    except OSError as e:
+        print(f"連番取得エラー: {e}")
+
+    return max_num + 1
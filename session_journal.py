@@ -0,0 +1,301 @@
+"""
+セッションジャーナル - 回答途中のセッションを追記専用ファイルに記録してクラッシュから復旧する
+
+ジャーナルは1行1レコードのJSON Lines形式:
+    {"type": "start", "respondent_id": ..., "questions_path": ..., "started": ...}
+    {"type": "answer", "response": {...}}   1問回答するごとに追記
+    {"type": "undo"}                         前の問題へ戻ったとき（最後の回答を取り消す）
+
+アンケートを送信して回答ファイルに保存したジャーナルは削除される。
+残っているジャーナルは未完了のセッションとして再開・復旧できる。
+再開・復旧はジャーナルのロックを取ってから状態を読み込むため、
+複数の端末が同じセッションを同時に再開・保存することはない。
+"""
+import glob
+import json
+import os
+from batch_writer import BatchWriter
+from file_lock import try_lock, unlock
+from records import Response
+from response_tally import record_session, tally_path_for
+from utils import get_timestamp, load_questions, save_response, strip_response_extension
+from constants import JOURNAL_COMMIT_BATCH_SIZE, JOURNAL_COMMIT_INTERVAL
+
+JOURNAL_EXTENSION = ".journal"
+
+
+class SessionJournal:
+    """
+    1セッション分の回答を記録するジャーナル
+
+    レコードはバックグラウンドでまとめて書き込み、まとめた単位で1回だけfsyncする
+    （グループコミット）。セッションが開いている間はファイルをロックし、
+    他のプロセスから未完了のセッションとして扱われないようにする。
+    """
+
+    def __init__(self, journal_path, commit_batch_size=JOURNAL_COMMIT_BATCH_SIZE,
+                 commit_interval=JOURNAL_COMMIT_INTERVAL):
+        """
+        Args:
+            journal_path: ジャーナルファイルのパス（存在する場合は続きから追記）
+            commit_batch_size: 一度にコミットする最大レコード数
+            commit_interval: レコードを受け取ってからコミットするまでの最大待ち時間（秒）
+        """
+        self.journal_path = journal_path
+        self._file = open(journal_path, 'a+b')
+        if not try_lock(self._file):
+            self._file.close()
+            raise RuntimeError(f"ジャーナルは使用中です: {journal_path}")
+        self._truncate_partial_record()
+
+        self._writer = BatchWriter(
+            self._commit,
+            max_batch_size=commit_batch_size,
+            max_delay=commit_interval,
+            name="SessionJournalWriter"
+        )
+
+    @classmethod
+    def create(cls, journal_dir, respondent_id, questions_path, **kwargs):
+        """新しいセッションのジャーナルを作成"""
+        os.makedirs(journal_dir, exist_ok=True)
+        path = os.path.join(journal_dir, f"session_{respondent_id}{JOURNAL_EXTENSION}")
+        journal = cls(path, **kwargs)
+        journal.append({
+            "type": "start",
+            "respondent_id": respondent_id,
+            "questions_path": questions_path,
+            "started": get_timestamp()
+        })
+        return journal
+
+    @classmethod
+    def resume(cls, journal_path, **kwargs):
+        """
+        未完了のセッションのジャーナルを開いて続きから記録する
+
+        Args:
+            journal_path: ジャーナルファイルのパス
+
+        Returns:
+            (ジャーナル, JournalState)。他のプロセスが使用中の場合や、
+            すでに保存されていて再開する回答がない場合はNone
+        """
+        if not os.path.exists(journal_path):
+            return None
+        try:
+            journal = cls(journal_path, **kwargs)
+        except RuntimeError:
+            return None
+
+        # ロックを取ってから読み込むため、その間に他のプロセスが保存したセッションは再開しない
+        state = journal.read_state()
+        if not state.respondent_id:
+            journal.complete()
+            return None
+        return journal, state
+
+    def read_state(self):
+        """ジャーナルを先頭から再生してセッションの状態を復元"""
+        self.commit()
+        self._file.seek(0)
+        return _replay_journal(self.journal_path, self._file.read())
+
+    def append(self, record):
+        """レコードを追記（コミットはバックグラウンドで行う）"""
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        self._writer.put(line.encode('utf-8'))
+
+    def record_answer(self, response):
+        """回答を記録"""
+        self.append({"type": "answer", "response": response.to_dict()})
+
+    def record_undo(self):
+        """最後の回答の取り消しを記録"""
+        self.append({"type": "undo"})
+
+    def commit(self):
+        """溜まっているレコードをすべてディスクに書き込む"""
+        self._writer.flush()
+
+    def close(self):
+        """レコードを書き込んでジャーナルを閉じる（ファイルは残る）"""
+        if self._file.closed:
+            return
+        self._writer.close()
+        unlock(self._file)
+        self._file.close()
+
+    def complete(self):
+        """回答ファイルへの保存が終わったセッションのジャーナルを閉じて削除"""
+        self.close()
+        try:
+            os.remove(self.journal_path)
+        except OSError as e:
+            print(f"ジャーナル削除エラー: {e}")
+
+    def _truncate_partial_record(self):
+        """前回書き込み途中で途切れた最後の行を削除（続きから追記するため）"""
+        self._file.seek(0)
+        data = self._file.read()
+        if data and not data.endswith(b"\n"):
+            self._file.truncate(data.rfind(b"\n") + 1)
+
+    def _commit(self, lines):
+        """レコードをまとめて書き込み、1回だけfsyncする"""
+        self._file.write(b"".join(lines))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+
+class JournalState:
+    """ジャーナルから復元したセッションの状態"""
+
+    def __init__(self, journal_path):
+        self.journal_path = journal_path
+        self.respondent_id = None
+        self.questions_path = None
+        self.started = None
+        self.responses = []
+
+
+def load_journal(journal_path):
+    """
+    ジャーナルを先頭から再生してセッションの状態を復元
+
+    書き込み途中で途切れた最後の行は無視する。
+
+    Args:
+        journal_path: ジャーナルファイルのパス
+
+    Returns:
+        JournalState
+    """
+    with open(journal_path, 'rb') as f:
+        return _replay_journal(journal_path, f.read())
+
+
+def _replay_journal(journal_path, data):
+    """ジャーナルの内容（バイト列）を再生してJournalStateを作成"""
+    state = JournalState(journal_path)
+
+    for line in data.decode('utf-8', errors='replace').split("\n"):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            break
+
+        record_type = record.get("type")
+        if record_type == "start":
+            state.respondent_id = record.get("respondent_id")
+            state.questions_path = record.get("questions_path")
+            state.started = record.get("started")
+        elif record_type == "answer":
+            state.responses.append(Response.from_dict(record["response"]))
+        elif record_type == "undo":
+            if state.responses:
+                state.responses.pop()
+
+    return state
+
+
+def find_unfinished_journals(journal_dir):
+    """
+    未完了のセッション（他のプロセスが使用中でないジャーナル）を探す
+
+    見つけた時点の状態のため、再開・保存するときは SessionJournal.resume・recover_journal で
+    ロックを取り直す（その間に他のプロセスが再開・保存したセッションは扱わない）。
+
+    Args:
+        journal_dir: ジャーナルディレクトリ
+
+    Returns:
+        ジャーナルファイルのパスのリスト（新しい順）
+    """
+    if not journal_dir or not os.path.isdir(journal_dir):
+        return []
+
+    paths = []
+    for path in glob.glob(os.path.join(journal_dir, f"*{JOURNAL_EXTENSION}")):
+        try:
+            # 空のジャーナルは他のプロセスが保存を終えて削除するところ
+            if os.path.getsize(path) == 0:
+                continue
+            with open(path, 'ab') as f:
+                if not try_lock(f):
+                    continue  # 使用中のセッション
+                unlock(f)
+        except OSError:
+            continue
+        paths.append(path)
+
+    paths.sort(key=os.path.getmtime, reverse=True)
+    return paths
+
+
+def recover_journal(journal_path, config_manager):
+    """
+    未完了のセッションの回答を通常の回答ファイルに保存してジャーナルを削除
+
+    Args:
+        journal_path: ジャーナルファイルのパス
+        config_manager: 保存先の設定
+
+    Returns:
+        保存に成功した場合True（回答がない場合や、他のプロセスが再開・保存中の場合もTrue）
+    """
+    try:
+        f = open(journal_path, 'r+b')
+    except FileNotFoundError:
+        return True  # 他のプロセスが保存済み
+
+    # 他のプロセスと同じセッションを重ねて保存しないよう、ジャーナルを空にするまでロックを保持する
+    with f:
+        if not try_lock(f):
+            return True  # 他のプロセスが再開・保存中
+        try:
+            f.seek(0)
+            state = _replay_journal(journal_path, f.read())
+            if not _save_state(state, config_manager):
+                return False
+            # ロックを解放してから削除するまでの間に他のプロセスが開いても、保存し直さないよう空にする
+            # （Windowsでは開いているファイルを削除できないため、削除は閉じてから行う）
+            f.truncate(0)
+        finally:
+            unlock(f)
+
+    try:
+        os.remove(journal_path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"ジャーナル削除エラー: {e}")
+    return True
+
+
+def _save_state(state, config_manager):
+    """復元したセッションの回答を回答ファイルに保存（回答がない場合は何もせずTrue）"""
+    if state.responses and state.respondent_id:
+        filepath = config_manager.get_response_path(state.respondent_id)
+        response_dir = os.path.dirname(filepath)
+        if response_dir:
+            os.makedirs(response_dir, exist_ok=True)
+
+        output_format = config_manager.get("output_format", "csv")
+        base_filepath = strip_response_extension(filepath)
+
+        # 正規化した出力では問題IDと選択肢番号を求めるために問題リストが必要
+        # （集計表の完了数にも問題数を使う）
+        questions = None
+        if state.questions_path and os.path.exists(state.questions_path):
+            questions = load_questions(state.questions_path)
+
+        if not save_response(state.responses, base_filepath, output_format,
+                             database_path=config_manager.get_database_path(), questions=questions):
+            return False
+
+        # 問題リストがない場合は完了として数えない
+        question_count = len(questions) if questions else len(state.responses) + 1
+        record_session(tally_path_for(config_manager), state.responses, question_count)
+
+    return True
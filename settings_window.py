@@ -4,6 +4,8 @@
 import customtkinter as ctk
 from tkinter import messagebox, filedialog
 from config_manager import ConfigManager
+from filename_template import validate_template
+from constants import DIRECTORY_SHARDING_SCHEMES
 import os
 
 
@@ -190,6 +192,38 @@ class SettingsWindow:
         )
         help_label.pack(anchor="w", pady=(5, 0))
 
+        # ログ形式
+        log_format_frame = ctk.CTkFrame(inner, fg_color="transparent")
+        log_format_frame.pack(fill="x", pady=(0, 10))
+
+        log_format_label = ctk.CTkLabel(
+            log_format_frame,
+            text="ログ形式（jsonlは項目ごとに分かれた構造化ログ、binaryはサイズが小さくCSV/JSONに変換可能）:",
+            font=("Yu Gothic", 12)
+        )
+        log_format_label.pack(anchor="w", pady=(0, 5))
+
+        self.log_format_menu = ctk.CTkOptionMenu(
+            log_format_frame,
+            values=["csv", "jsonl", "binary"],
+            font=("Yu Gothic", 11),
+            height=35
+        )
+        self.log_format_menu.pack(fill="x")
+
+        # バッファリング
+        buffered_frame = ctk.CTkFrame(inner, fg_color="transparent")
+        buffered_frame.pack(fill="x", pady=(0, 10))
+
+        self.log_buffered_var = ctk.BooleanVar(value=False)
+        self.log_buffered_check = ctk.CTkCheckBox(
+            buffered_frame,
+            text="ログをバックグラウンドでまとめて書き込む（送信時・終了時に確実に保存）",
+            variable=self.log_buffered_var,
+            font=("Yu Gothic", 11)
+        )
+        self.log_buffered_check.pack(anchor="w")
+
     def create_response_section(self, parent):
         """回答ファイル設定セクション"""
         section = ctk.CTkFrame(parent)
@@ -331,12 +365,39 @@ class SettingsWindow:
 
         self.output_format_menu = ctk.CTkOptionMenu(
             format_frame,
-            values=["csv", "json", "both"],
+            values=["csv", "json", "both", "jsonl", "sqlite", "normalized"],
             font=("Yu Gothic", 11),
             height=35
         )
         self.output_format_menu.pack(fill="x")
 
+        # ディレクトリの分割
+        sharding_frame = ctk.CTkFrame(inner, fg_color="transparent")
+        sharding_frame.pack(fill="x", pady=(0, 15))
+
+        sharding_label = ctk.CTkLabel(
+            sharding_frame,
+            text="回答・ログディレクトリの分割:",
+            font=("Yu Gothic", 12)
+        )
+        sharding_label.pack(anchor="w", pady=(0, 5))
+
+        self.sharding_menu = ctk.CTkOptionMenu(
+            sharding_frame,
+            values=DIRECTORY_SHARDING_SCHEMES,
+            font=("Yu Gothic", 11),
+            height=35
+        )
+        self.sharding_menu.pack(fill="x")
+
+        sharding_help = ctk.CTkLabel(
+            sharding_frame,
+            text="date=日付ごと, hash=回答者IDのハッシュごと, date_hash=日付とハッシュ（既存のファイルは python sharding.py で移動）",
+            font=("Yu Gothic", 10),
+            text_color="gray"
+        )
+        sharding_help.pack(anchor="w", pady=(5, 0))
+
         # フォントサイズ
         fontsize_frame = ctk.CTkFrame(inner, fg_color="transparent")
         fontsize_frame.pack(fill="x", pady=(0, 15))
@@ -425,6 +486,8 @@ class SettingsWindow:
         self.questions_file_entry.insert(0, self.config_manager.get("questions_file", ""))
         self.log_dir_entry.insert(0, self.config_manager.get("log_directory", ""))
         self.log_format_entry.insert(0, self.config_manager.get("log_name_format", ""))
+        self.log_format_menu.set(self.config_manager.get("log_format", "csv"))
+        self.log_buffered_var.set(self.config_manager.get("log_buffered", False))
         self.response_dir_entry.insert(0, self.config_manager.get("response_directory", ""))
         self.response_format_entry.insert(0, self.config_manager.get("response_name_format", ""))
 
@@ -432,16 +495,27 @@ class SettingsWindow:
         self.appearance_menu.set(self.config_manager.get("appearance_mode", "System"))
         self.theme_menu.set(self.config_manager.get("color_theme", "blue"))
         self.output_format_menu.set(self.config_manager.get("output_format", "csv"))
+        self.sharding_menu.set(self.config_manager.get("directory_sharding", "none"))
         self.fontsize_menu.set(self.config_manager.get("font_size", "medium"))
         self.auto_save_var.set(self.config_manager.get("auto_save", True))
 
     def save_settings(self):
         """設定を保存"""
+        # ファイル名のフォーマットを検証
+        for label, entry in (("ログファイル名", self.log_format_entry),
+                             ("回答ファイル名", self.response_format_entry)):
+            error = validate_template(entry.get())
+            if error:
+                messagebox.showerror("エラー", f"{label}のフォーマットが正しくありません\n{error}")
+                return
+
         # 設定を更新
         self.config_manager.set("questions_directory", self.questions_dir_entry.get())
         self.config_manager.set("questions_file", self.questions_file_entry.get())
         self.config_manager.set("log_directory", self.log_dir_entry.get())
         self.config_manager.set("log_name_format", self.log_format_entry.get())
+        self.config_manager.set("log_format", self.log_format_menu.get())
+        self.config_manager.set("log_buffered", self.log_buffered_var.get())
         self.config_manager.set("response_directory", self.response_dir_entry.get())
         self.config_manager.set("response_name_format", self.response_format_entry.get())
 
@@ -449,6 +523,7 @@ class SettingsWindow:
         self.config_manager.set("appearance_mode", self.appearance_menu.get())
         self.config_manager.set("color_theme", self.theme_menu.get())
         self.config_manager.set("output_format", self.output_format_menu.get())
+        self.config_manager.set("directory_sharding", self.sharding_menu.get())
         self.config_manager.set("font_size", self.fontsize_menu.get())
         self.config_manager.set("auto_save", self.auto_save_var.get())
 
@@ -3,12 +3,12 @@
 デフォルトディレクトリとサンプルファイルを作成
 """
 import os
-from constants import DATA_DIR, QUESTIONS_DIR, RESPONSES_DIR, LOGS_DIR
+from constants import DATA_DIR, QUESTIONS_DIR, RESPONSES_DIR, LOGS_DIR, JOURNAL_DIR
 from utils import save_questions_to_csv
 
 def create_default_directories():
     """デフォルトディレクトリを作成"""
-    directories = [DATA_DIR, QUESTIONS_DIR, RESPONSES_DIR, LOGS_DIR]
+    directories = [DATA_DIR, QUESTIONS_DIR, RESPONSES_DIR, LOGS_DIR, JOURNAL_DIR]
 
     for directory in directories:
         if not os.path.exists(directory):
@@ -69,6 +69,10 @@ logs/
   - ユーザーアクションログが保存されるディレクトリ
   - 形式: action_log_{回答者ID}_{日付}.csv
 
+journal/
+  - 回答途中のセッションの記録（送信すると削除されます）
+  - アプリが異常終了した場合、次回の回答開始時に再開・保存できます
+
 設定について
 ============
 - メインメニューの「⚙ 設定」から各ディレクトリとファイル名のフォーマットを変更できます
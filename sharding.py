@@ -0,0 +1,257 @@
+"""
+ディレクトリの分割 - 回答ディレクトリ・ログディレクトリのファイルを日付や回答者IDのハッシュで分けて保存する
+
+1つのディレクトリに数十万のファイルがあると、ファイルの一覧や検索、ファイルダイアログが遅くなる。
+設定の directory_sharding に応じて、ファイルを次のようなサブディレクトリ（シャード）に保存する。
+    none:       responses/responses_A001_20250115.csv
+    date:       responses/20250115/responses_A001_20250115.csv
+    hash:       responses/3f/responses_A001_20250115.csv
+    date_hash:  responses/20250115/3f/responses_A001_20250115.csv
+
+ハッシュは回答者IDから求めるため、同じ回答者のファイルは常に同じシャードに入る
+（ファイル名のフォーマットに {respondent_id} がない場合はすべて同じシャードになる）。
+
+読み込み側は walk_files() で、分け方を意識せずにすべてのシャードのファイルを取得できる。
+既存のディレクトリは migrate_directory()（python sharding.py）で一度に移動できる。
+"""
+import hashlib
+import os
+import re
+import shutil
+from datetime import datetime
+from file_lock import fcntl, locked_update, try_lock, unlock
+from filename_template import compile_template
+from constants import SHARD_HASH_LENGTH
+
+# シャードディレクトリの名前（日付 または ハッシュ値の先頭）
+_SHARD_NAME = re.compile(r"\d{8}|[0-9a-f]{%d}" % SHARD_HASH_LENGTH)
+# シャードの最大の深さ（date_hash の場合に2）
+_MAX_DEPTH = 2
+
+
+def hash_prefix(key):
+    """回答者IDのハッシュ値の先頭（シャードディレクトリの名前）"""
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=8).hexdigest()[:SHARD_HASH_LENGTH]
+
+
+def shard_subdirectory(scheme, respondent_id, day):
+    """
+    ファイルを保存するシャードディレクトリ（ディレクトリからの相対パス）
+
+    Args:
+        scheme: 分け方 ("none", "date", "hash", "date_hash")
+        respondent_id: 回答者ID（ファイル名に回答者IDを含まない場合は空文字列）
+        day: 日付（YYYYMMDD）
+
+    Returns:
+        相対パス（分けない場合は空文字列）
+    """
+    parts = []
+    if scheme in ("date", "date_hash"):
+        parts.append(day)
+    if scheme in ("hash", "date_hash"):
+        parts.append(hash_prefix(respondent_id or ""))
+    return os.path.join(*parts) if parts else ""
+
+
+def shard_key(template, respondent_id):
+    """ハッシュに使う回答者ID（ファイル名に回答者IDを含まない場合は空文字列）"""
+    return (respondent_id or "") if "respondent_id" in template.variables else ""
+
+
+def iter_shard_directories(directory):
+    """
+    ディレクトリと、その下のシャードディレクトリを名前順に返す
+
+    分け方の設定によらず、日付・ハッシュ値の名前のサブディレクトリをすべて含むため、
+    分け方を変えた後も古いシャードのファイルを読み込める。
+
+    Yields:
+        ディレクトリのパス（最初は指定したディレクトリ自身）
+    """
+    if not directory or not os.path.isdir(directory):
+        return
+
+    pending = [(directory, 0)]
+    while pending:
+        current, depth = pending.pop()
+        yield current
+        if depth >= _MAX_DEPTH:
+            continue
+        try:
+            with os.scandir(current) as entries:
+                children = sorted(
+                    entry.path for entry in entries
+                    if entry.is_dir() and _SHARD_NAME.fullmatch(entry.name)
+                )
+        except OSError as e:
+            print(f"ディレクトリ走査エラー: {e}")
+            continue
+        pending.extend((child, depth + 1) for child in reversed(children))
+
+
+def walk_files(directory, accept=None):
+    """
+    すべてのシャードから読み込むべきファイルを探す
+
+    コンパクションでまとめたセグメントを含み、セグメントに取り込み済みのファイルは含まない
+    （compaction.visible_files）。
+
+    Args:
+        directory: 回答ディレクトリまたはログディレクトリ
+        accept: ファイル名を受け取り、対象とする場合にTrueを返す関数（Noneの場合はすべてのファイル）
+
+    Yields:
+        ファイルパス（シャードごとにファイル名順）
+    """
+    from compaction import visible_files
+
+    for shard in iter_shard_directories(directory):
+        def scan():
+            with os.scandir(shard) as entries:
+                return [
+                    entry.path for entry in entries
+                    if entry.is_file() and (accept is None or accept(entry.name))
+                ]
+
+        yield from sorted(visible_files(shard, scan))
+
+
+def migrate_directory(directory, name_format, scheme):
+    """
+    ディレクトリ内のファイルを分け方に合わせたシャードに移動
+
+    分けていないディレクトリを分ける場合だけでなく、分け方を変えた場合にも使える。
+    書き込み中（ロックされている）のファイルと、コンパクションのセグメント・取り込み済みのファイルは移動しない。
+    移動中はコンパクションと読み込み（compaction.read_snapshot）を待たせる。
+    Windowsでは開いているファイルの名前を変えられないため、コピーして元ファイルを空にしてから削除する。
+    移動はアンケートを実行していないときに行う（移動中に書き込まれた元ファイルは削除せずに残す）。
+
+    Args:
+        directory: 回答ディレクトリまたはログディレクトリ
+        name_format: ファイル名のフォーマット（response_name_format / log_name_format）
+        scheme: 分け方 ("none", "date", "hash", "date_hash")
+
+    Returns:
+        (移動したファイル数, 移動できなかったファイル数) のタプル
+    """
+    from compaction import COMMIT_LOCK_FILE, LOCK_FILE, is_segment, load_manifest
+
+    template = compile_template(name_format)
+    stem_template = compile_template(os.path.splitext(name_format)[0])
+    moved = skipped = 0
+
+    with locked_update(os.path.join(directory, LOCK_FILE)), \
+            locked_update(os.path.join(directory, COMMIT_LOCK_FILE)):
+        for shard in list(iter_shard_directories(directory)):
+            pending = load_manifest(shard)["pending"]
+            with os.scandir(shard) as entries:
+                files = [entry for entry in entries if entry.is_file()]
+
+            for entry in files:
+                values = stem_template.match_stem(entry.name)
+                if values is None or is_segment(entry.name) or entry.name in pending:
+                    continue
+
+                day = values.get("date") or datetime.fromtimestamp(entry.stat().st_mtime).strftime("%Y%m%d")
+                target_dir = os.path.join(
+                    directory, shard_subdirectory(scheme, shard_key(template, values.get("respondent_id")), day)
+                )
+                if os.path.normpath(target_dir) == os.path.normpath(shard):
+                    continue
+
+                if _move_file(entry.path, target_dir):
+                    moved += 1
+                else:
+                    skipped += 1
+
+    return moved, skipped
+
+
+def _move_file(path, target_dir):
+    """
+    ロックを取得してファイルをシャードに移動（正規化CSVの場合は使う問題もマニフェストに登録する）
+
+    Windowsではロックを保持したままコピーして元ファイルを空にし、閉じてから削除する。
+    """
+    from normalized_output import (
+        NORMALIZED_EXTENSION, iter_normalized_rows, load_manifest, manifest_path_for, register_questions
+    )
+
+    target = os.path.join(target_dir, os.path.basename(path))
+    if os.path.exists(target):
+        print(f"移動先に同じ名前のファイルがあります: {target}")
+        return False
+
+    try:
+        f = open(path, 'r+b')
+    except OSError as e:
+        print(f"ファイル移動エラー: {e}")
+        return False
+    emptied = False
+    try:
+        if not try_lock(f):
+            print(f"書き込み中のため移動しません: {path}")
+            return False
+        try:
+            os.makedirs(target_dir, exist_ok=True)
+            if path.endswith(NORMALIZED_EXTENSION):
+                manifest = load_manifest(manifest_path_for(path))
+                used = {row[3] for row in iter_normalized_rows(path)}
+                register_questions(manifest_path_for(target), {qid: manifest[qid] for qid in used})
+            if fcntl:
+                os.rename(path, target)
+            else:
+                _copy_locked(f, target)
+                f.seek(0)
+                f.truncate()
+                f.flush()
+                emptied = True
+            return True
+        finally:
+            unlock(f)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"ファイル移動エラー: {e}")
+        return False
+    finally:
+        f.close()
+        if emptied:
+            _remove_if_empty(path)
+
+
+def _copy_locked(f, target):
+    """ロックしたファイルの内容を更新時刻ごとコピー（ロックした領域は他のハンドルから読めないため同じハンドルで読む）"""
+    stat = os.fstat(f.fileno())
+    f.seek(0)
+    with open(target, 'xb') as out:
+        shutil.copyfileobj(f, out)
+    os.utime(target, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+
+def _remove_if_empty(path):
+    """コピーして空にした元ファイルを削除（その間に書き込まれた場合は残す）"""
+    try:
+        if os.path.getsize(path) == 0:
+            os.remove(path)
+    except OSError as e:
+        print(f"移動元ファイル削除エラー: {e}")
+
+
+if __name__ == "__main__":
+    import sys
+    from config_manager import ConfigManager
+    from constants import DIRECTORY_SHARDING_SCHEMES
+
+    config_manager = ConfigManager()
+    scheme = sys.argv[1] if len(sys.argv) > 1 else config_manager.get("directory_sharding", "none")
+    if scheme not in DIRECTORY_SHARDING_SCHEMES:
+        print(f"使い方: python sharding.py [{'|'.join(DIRECTORY_SHARDING_SCHEMES)}]")
+        sys.exit(1)
+
+    for directory_key, format_key in (("response_directory", "response_name_format"),
+                                      ("log_directory", "log_name_format")):
+        directory = config_manager.get(directory_key, "")
+        if not directory or not os.path.isdir(directory):
+            continue
+        moved, skipped = migrate_directory(directory, config_manager.get(format_key), scheme)
+        print(f"✓ {directory}: {moved}ファイルを移動しました（移動できなかったファイル: {skipped}）")
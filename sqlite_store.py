@@ -0,0 +1,327 @@
+"""
+SQLiteストア - 回答と操作ログを1つのSQLiteデータベースに保存する
+
+回答者ごとのファイルを開かずに集計できるよう、回答（responses）と操作ログ（events）を
+同じデータベースに追記する。WALモードで開くため、複数のアプリ（プロセス）から同時に
+書き込んでも読み込みを止めない。書き込みはまとめて1つのトランザクションで行う。
+
+従来のCSV/JSON形式の回答ファイルが必要な場合は export_responses() で書き出せる。
+"""
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+from filename_template import compile_template
+from log_events import LogEvent
+from records import Response
+from constants import SQLITE_BUSY_TIMEOUT
+
+# SQLiteのデータベースファイルの先頭
+SQLITE_MAGIC = b"SQLite format 3\x00"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    id INTEGER PRIMARY KEY,
+    respondent_id TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    question_num INTEGER NOT NULL,
+    question_text TEXT,
+    selected_choice TEXT,
+    reason TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_responses_respondent ON responses (respondent_id);
+CREATE INDEX IF NOT EXISTS idx_responses_question ON responses (question_num);
+CREATE INDEX IF NOT EXISTS idx_responses_timestamp ON responses (timestamp);
+
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    time_ns INTEGER NOT NULL,
+    action TEXT NOT NULL,
+    respondent_id TEXT,
+    question_num INTEGER,
+    to_num INTEGER,
+    choice_index INTEGER,
+    text TEXT,
+    mono_ns INTEGER,
+    delta_ns INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_events_respondent ON events (respondent_id);
+CREATE INDEX IF NOT EXISTS idx_events_question ON events (question_num);
+CREATE INDEX IF NOT EXISTS idx_events_time ON events (time_ns);
+"""
+
+_RESPONSE_COLUMNS = (
+    "respondent_id", "timestamp", "question_num", "question_text", "selected_choice", "reason"
+)
+_EVENT_COLUMNS = LogEvent._fields
+
+
+class SqliteStore:
+    """回答と操作ログを保存するSQLiteデータベース"""
+
+    def __init__(self, db_path, busy_timeout=SQLITE_BUSY_TIMEOUT):
+        """
+        Args:
+            db_path: データベースファイルのパス（存在しない場合は作成）
+            busy_timeout: 他のプロセスが書き込み中の場合に待つ最大時間（秒）
+        """
+        self.db_path = db_path
+        self.busy_timeout = busy_timeout
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        # バックグラウンドの書き込みスレッドからも使うため、ロックで直列化する
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=busy_timeout, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+
+    def insert_responses(self, responses):
+        """
+        回答をまとめて1つのトランザクションで追加
+
+        Args:
+            responses: 回答データ（Response）のリスト
+        """
+        self.insert_response_rows([response.to_row() for response in responses])
+
+    def insert_response_rows(self, rows):
+        """
+        回答ファイルの行（回答者ID, タイムスタンプ, 問題番号, 質問文, 選択した回答, 理由）を
+        まとめて1つのトランザクションで追加
+
+        Args:
+            rows: 行のリスト
+        """
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT INTO responses ({', '.join(_RESPONSE_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(_RESPONSE_COLUMNS))})",
+                rows
+            )
+
+    def insert_events(self, events):
+        """
+        操作ログのイベントをまとめて1つのトランザクションで追加
+
+        Args:
+            events: LogEventのリスト
+        """
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT INTO events ({', '.join(_EVENT_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(_EVENT_COLUMNS))})",
+                events
+            )
+
+    def iter_responses(self, respondent_id=None, question_num=None):
+        """
+        回答を保存順に読み込む
+
+        Args:
+            respondent_id: 指定した場合はその回答者の回答のみ
+            question_num: 指定した場合はその問題の回答のみ
+
+        Yields:
+            Response
+        """
+        for row in _select(self.db_path, "responses", _RESPONSE_COLUMNS, respondent_id, question_num,
+                           self.busy_timeout):
+            yield Response.from_row(row)
+
+    def iter_events(self, respondent_id=None, question_num=None):
+        """
+        操作ログを記録順に読み込む
+
+        Yields:
+            LogEvent
+        """
+        return read_sqlite_log(self.db_path, respondent_id, question_num, self.busy_timeout)
+
+    def respondent_ids(self):
+        """回答がある回答者IDの一覧（最初に回答した順）"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT respondent_id FROM responses GROUP BY respondent_id ORDER BY MIN(id)"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def close(self):
+        """データベースを閉じる"""
+        with self._lock:
+            self._conn.close()
+
+
+def _select(db_path, table, columns, respondent_id=None, question_num=None,
+            busy_timeout=SQLITE_BUSY_TIMEOUT):
+    """
+    条件に一致する行を順に読み込む
+
+    書き込み用の接続を長時間ふさがないよう、読み込み用の接続を別に開く。
+    """
+    clauses = []
+    params = []
+    if respondent_id is not None:
+        clauses.append("respondent_id = ?")
+        params.append(respondent_id)
+    if question_num is not None:
+        clauses.append("question_num = ?")
+        params.append(question_num)
+    where = " WHERE " + " AND ".join(clauses) if clauses else ""
+
+    conn = sqlite3.connect(db_path, timeout=busy_timeout)
+    try:
+        yield from conn.execute(
+            f"SELECT {', '.join(columns)} FROM {table}{where} ORDER BY id", params
+        )
+    finally:
+        conn.close()
+
+
+def read_sqlite_log(db_path, respondent_id=None, question_num=None,
+                    busy_timeout=SQLITE_BUSY_TIMEOUT):
+    """
+    データベースの操作ログを記録順に読み込む
+
+    Args:
+        db_path: データベースファイルのパス
+        respondent_id: 指定した場合はその回答者のログのみ
+        question_num: 指定した場合はその問題のログのみ
+
+    Yields:
+        LogEvent
+    """
+    for row in _select(db_path, "events", _EVENT_COLUMNS, respondent_id, question_num,
+                       busy_timeout):
+        yield LogEvent(*row)
+
+
+class SqliteLogWriter:
+    """操作ログをSQLiteデータベースのeventsテーブルに追記するクラス"""
+
+    def __init__(self, log_file):
+        """
+        Args:
+            log_file: データベースファイルのパス
+        """
+        self.log_file = log_file
+        self._store = SqliteStore(log_file)
+
+    def initialize_log_file(self):
+        """データベースを初期化（テーブルは接続時に作成済み）"""
+
+    def write_events(self, events):
+        """イベントをまとめて1つのトランザクションで追加"""
+        self._store.insert_events(events)
+
+    def close(self):
+        """データベースを閉じる"""
+        self._store.close()
+
+
+def save_response_to_sqlite(responses, db_path):
+    """
+    回答データをSQLiteデータベースに保存
+
+    Args:
+        responses: 回答データのリスト
+        db_path: データベースファイルのパス
+    """
+    try:
+        store = SqliteStore(db_path)
+        try:
+            store.insert_responses(responses)
+        finally:
+            store.close()
+        return True
+    except Exception as e:
+        print(f"SQLite保存エラー: {e}")
+        return False
+
+
+def export_responses(db_path, output_dir, name_format="responses_{respondent_id}_{date}.csv",
+                     output_format="csv"):
+    """
+    データベースの回答を従来の回答者ごとのCSV/JSONファイルに書き出す
+
+    Args:
+        db_path: データベースファイルのパス
+        output_dir: 出力先ディレクトリ
+        name_format: ファイル名のフォーマット（{date}, {time} は最初の回答の日時）
+        output_format: 出力形式 ("csv", "json", "both", "jsonl")
+
+    Returns:
+        書き出した回答者数
+
+    Raises:
+        ValueError: フォーマットに使えない変数が含まれる場合
+    """
+    from utils import save_response, strip_response_extension
+
+    template = compile_template(name_format)
+    os.makedirs(output_dir, exist_ok=True)
+    store = SqliteStore(db_path)
+    count = 0
+    try:
+        for respondent_id in store.respondent_ids():
+            responses = list(store.iter_responses(respondent_id))
+            answered_at = datetime.strptime(responses[0].timestamp[:19], "%Y-%m-%d %H:%M:%S")
+            filename = template.render(answered_at, respondent_id, count + 1)
+
+            base_filepath = strip_response_extension(os.path.join(output_dir, filename))
+            if save_response(responses, base_filepath, output_format):
+                count += 1
+    finally:
+        store.close()
+    return count
+
+
+def export_events(db_path, log_path):
+    """
+    データベースの操作ログを従来のCSV形式のログに書き出す
+
+    Args:
+        db_path: データベースファイルのパス
+        log_path: 出力先のログファイルのパス
+
+    Returns:
+        書き出したイベント数
+    """
+    from logger import CsvLogWriter
+
+    writer = CsvLogWriter(log_path)
+    store = SqliteStore(db_path)
+    count = 0
+    batch = []
+    try:
+        for event in store.iter_events():
+            batch.append(event)
+            if len(batch) >= 1000:
+                writer.write_events(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            writer.write_events(batch)
+            count += len(batch)
+    finally:
+        store.close()
+    return count
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4 or sys.argv[1] not in ("export", "export-log"):
+        print("使い方: python sqlite_store.py export <データベース> <出力ディレクトリ> [csv|json|both|jsonl]")
+        print("        python sqlite_store.py export-log <データベース> <出力ログファイル.csv>")
+        sys.exit(1)
+
+    if sys.argv[1] == "export":
+        fmt = sys.argv[4] if len(sys.argv) > 4 else "csv"
+        exported = export_responses(sys.argv[2], sys.argv[3], output_format=fmt)
+        print(f"✓ {exported}人分の回答を書き出しました: {sys.argv[3]}")
+    else:
+        exported = export_events(sys.argv[2], sys.argv[3])
+        print(f"✓ {exported}件のログを書き出しました: {sys.argv[3]}")
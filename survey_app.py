@@ -7,6 +7,7 @@ from tkinter import messagebox
 from question_editor import QuestionEditor
 from survey_interface import SurveyInterface
 from settings_window import SettingsWindow
+from dashboard import TallyDashboard
 from config_manager import ConfigManager
 from constants import (
     MAIN_WINDOW_SIZE, FONT_FAMILY, FONT_SIZE_TITLE, FONT_SIZE_SUBTITLE,
@@ -65,6 +66,7 @@ class SurveyApp:
         buttons = [
             ("問題を作成", self.open_question_editor, None, None),
             ("アンケートに回答", self.open_survey_interface, None, None),
+            ("📊 集計ダッシュボード", self.open_dashboard, None, None),
             ("⚙ 設定", self.open_settings, "gray50", "gray40"),
             ("終了", self.root.quit, COLOR_GRAY, COLOR_GRAY_HOVER)
         ]
@@ -95,6 +97,11 @@ class SurveyApp:
         survey_window = ctk.CTkToplevel(self.root)
         SurveyInterface(survey_window)
 
+    def open_dashboard(self):
+        """集計ダッシュボードを開く"""
+        dashboard_window = ctk.CTkToplevel(self.root)
+        TallyDashboard(dashboard_window)
+
     def open_settings(self):
         """設定画面を開く"""
         settings_window = ctk.CTkToplevel(self.root)
@@ -4,15 +4,25 @@
 """
 import customtkinter as ctk
 from tkinter import messagebox, filedialog
-from utils import load_questions, save_response, get_timestamp
+from utils import save_response, get_timestamp, strip_response_extension
 from logger import ActionLogger
+from records import Response
+from response_tally import record_session, tally_path_for
+from log_rotation import LogRotator
+from question_source import LazyQuestionSource, open_question_source
+from keystroke_capture import KeystrokeRecorder, keystroke_path_for
 from config_manager import ConfigManager
+from session_journal import (
+    SessionJournal, find_unfinished_journals, recover_journal
+)
 from constants import (
     SURVEY_WINDOW_SIZE, FONT_FAMILY, FONT_SIZE_NORMAL, FONT_SIZE_SUBTITLE,
     FONT_SIZE_LABEL, FONT_SIZE_BUTTON, COLOR_SELECTED, COLOR_SELECTED_HOVER,
     COLOR_DEFAULT, COLOR_DEFAULT_HOVER, COLOR_GRAY, COLOR_GRAY_HOVER,
     MSG_NO_CHOICE_SELECTED, MSG_NO_REASON, MSG_CANNOT_CHANGE_CHOICE,
-    MSG_CHANGE_DISABLED_STATUS, MSG_REASON_STARTED_STATUS, MSG_CAN_CHANGE_STATUS
+    MSG_CHANGE_DISABLED_STATUS, MSG_REASON_STARTED_STATUS, MSG_CAN_CHANGE_STATUS,
+    LOG_FLUSH_BATCH_SIZE, LOG_FLUSH_INTERVAL, MSG_UNFINISHED_SESSIONS,
+    JOURNAL_COMMIT_BATCH_SIZE, JOURNAL_COMMIT_INTERVAL, KEYSTROKE_FLUSH_INTERVAL, QUESTION_COUNT_STEP
 )
 import uuid
 import os
@@ -25,6 +35,8 @@ class SurveyInterface:
         self.window.geometry(SURVEY_WINDOW_SIZE)
 
         self.questions = []
+        self.question_total = None  # 問題数（数え終わるまではNone）
+        self._count_after_id = None
         self.current_question_index = 0
         self.responses = []
         self.respondent_id = str(uuid.uuid4())[:8]
@@ -32,9 +44,28 @@ class SurveyInterface:
         # 設定を読み込み
         self.config_manager = ConfigManager()
 
+        # 前回終了していないセッションを確認（再開する場合は回答者IDを引き継ぐ）
+        self.journal = None
+        resume_state = self._check_unfinished_sessions()
+        if resume_state:
+            self.respondent_id = resume_state.respondent_id
+
         # ログ記録（設定から出力先を取得）
-        log_path = self.config_manager.get_log_path(self.respondent_id)
-        self.logger = ActionLogger(log_path)
+        self.logger = self._create_logger()
+
+        # キー入力の記録（有効な場合のみ）
+        self.keystrokes = None
+        if self.config_manager.get("keystroke_capture", False):
+            self.keystrokes = KeystrokeRecorder(
+                keystroke_path_for(self.logger.log_file), self.respondent_id
+            )
+            self.keystrokes.start_periodic_flush(
+                self.window,
+                self.config_manager.get("keystroke_flush_interval", KEYSTROKE_FLUSH_INTERVAL)
+            )
+
+        # ウィンドウを閉じたときにログを書き込む
+        self.window.protocol("WM_DELETE_WINDOW", self.close_window)
 
         # 状態管理
         self.selected_choice = None
@@ -44,39 +75,187 @@ class SurveyInterface:
         self.choice_buttons = []
         self.reason_text = None
 
-        self.load_questions_dialog()
+        self.load_questions_dialog(resume_state)
+
+    def _create_logger(self):
+        """設定に従ってロガーを作成"""
+        log_path = self.config_manager.get_log_path(self.respondent_id)
+        return ActionLogger(
+            log_path,
+            buffered=self.config_manager.get("log_buffered", False),
+            flush_batch_size=self.config_manager.get("log_flush_batch_size", LOG_FLUSH_BATCH_SIZE),
+            flush_interval=self.config_manager.get("log_flush_interval", LOG_FLUSH_INTERVAL),
+            log_format=self.config_manager.get_log_format(),
+            respondent_id=self.respondent_id,
+            timing_columns=self.config_manager.get("log_timing_columns", False),
+            rotator=LogRotator(
+                max_bytes=self.config_manager.get("log_rotate_max_bytes", 0),
+                daily=self.config_manager.get("log_rotate_daily", False),
+                compression=self.config_manager.get("log_compression", "gzip"),
+                max_archives=self.config_manager.get("log_max_archives", 0)
+            ),
+            index=self.config_manager.get("log_index", False)
+        )
+
+    def close_window(self):
+        """ログを書き込んでからウィンドウを閉じる"""
+        if self._count_after_id is not None:
+            self.window.after_cancel(self._count_after_id)
+            self._count_after_id = None
+        if self.keystrokes:
+            self.keystrokes.close()
+        self.logger.close()
+        if self.journal:
+            self.journal.close()
+        self.window.destroy()
+
+    def _check_unfinished_sessions(self):
+        """
+        前回終了していないセッションがあれば再開・保存するか確認
+
+        再開する場合は、そのセッションのジャーナルを開いてロックしたまま self.journal にする。
+
+        Returns:
+            再開する場合はJournalState、それ以外はNone
+        """
+        journal_dir = self.config_manager.get("journal_directory", "")
+        journal_paths = find_unfinished_journals(journal_dir)
+        if not journal_paths:
+            return None
+
+        answer = messagebox.askyesnocancel(
+            "未完了の回答",
+            MSG_UNFINISHED_SESSIONS.format(count=len(journal_paths))
+        )
+
+        if answer is None:
+            return None
+
+        if answer:
+            resumed = SessionJournal.resume(journal_paths[0], **self._journal_options())
+            if not resumed:
+                messagebox.showinfo("未完了の回答", "この回答は他の端末で再開・保存されました")
+                return None
+            self.journal, state = resumed
+            return state
+
+        # 途中までの回答を回答ファイルに保存
+        failed = [
+            path for path in journal_paths
+            if not recover_journal(path, self.config_manager)
+        ]
+        if failed:
+            messagebox.showerror("エラー", "途中までの回答の保存に失敗しました:\n" + "\n".join(failed))
+        return None
+
+    def _journal_options(self):
+        """設定からジャーナルの書き込み方法を取得"""
+        return {
+            "commit_batch_size": self.config_manager.get(
+                "journal_commit_batch_size", JOURNAL_COMMIT_BATCH_SIZE),
+            "commit_interval": self.config_manager.get(
+                "journal_commit_interval", JOURNAL_COMMIT_INTERVAL)
+        }
 
-    def load_questions_dialog(self):
+    def _open_journal(self, questions_path):
+        """このセッションのジャーナルを作成"""
+        try:
+            journal_dir = self.config_manager.get("journal_directory", "")
+            if not journal_dir:
+                return None
+            return SessionJournal.create(journal_dir, self.respondent_id, questions_path,
+                                         **self._journal_options())
+        except Exception as e:
+            print(f"ジャーナル作成エラー: {e}")
+            return None
+
+    def load_questions_dialog(self, resume_state=None):
         """問題を読み込むダイアログ"""
-        # 設定から問題ファイルのパスを取得
+        # 設定から問題ファイルのパスを取得（再開する場合は前回の問題ファイル）
         filepath = self.config_manager.get_questions_path()
+        if resume_state and resume_state.questions_path:
+            filepath = resume_state.questions_path
 
         # 設定にパスがない場合は手動で選択
         if not filepath or not os.path.exists(filepath):
             filepath = filedialog.askopenfilename(
                 title="アンケートファイルを選択",
                 filetypes=[
-                    ("サポートファイル", "*.csv;*.json"),
+                    ("サポートファイル", "*.csv;*.json;*.jsonl;*.qpack"),
                     ("CSVファイル", "*.csv"),
                     ("JSONファイル", "*.json"),
+                    ("JSON Linesファイル", "*.jsonl"),
+                    ("問題パック", "*.qpack"),
                     ("すべてのファイル", "*.*")
                 ]
             )
 
         if not filepath:
-            self.window.destroy()
+            self.close_window()
             return
 
-        self.questions = load_questions(filepath)
+        # 大きな問題ファイルでも最初の問題をすぐに表示できるよう、必要なページだけ読み込む
+        self.questions = open_question_source(filepath)
 
-        if not self.questions:
+        # 空かどうかを len() で調べると問題ファイル全体を読むため、最初の問題だけを取り出して確かめる
+        if not self._has_question(0):
             messagebox.showerror("エラー", "問題を読み込めませんでした")
-            self.window.destroy()
+            self.close_window()
             return
 
+        # 再開する場合は回答済みの問題の次から始める
+        if resume_state:
+            self.responses = list(resume_state.responses)
+            self.current_question_index = len(self.responses)
+
+        # 再開する場合は _check_unfinished_sessions で開いたジャーナルに続けて記録する
+        if not self.journal:
+            self.journal = self._open_journal(filepath)
+
         self.setup_ui()
+        # 再開したセッションが回答済みの場合は display_question でウィンドウが閉じるため、先に数え始める
+        # （閉じるときに close_window が残りの数える処理を取り消す）
+        self._count_questions()
         self.display_question()
 
+    def _has_question(self, index):
+        """指定した番号の問題があるかどうか（問題ファイルを最後まで読まずに確かめる）"""
+        try:
+            self.questions[index]
+        except IndexError:
+            return False
+        return True
+
+    def _count_questions(self):
+        """
+        問題数を少しずつ数え、数え終わったら進捗表示に反映する
+
+        大きな問題ファイルでも画面が止まらないよう、1回に QUESTION_COUNT_STEP 問ずつ索引を作成する。
+        """
+        self._count_after_id = None
+        if isinstance(self.questions, LazyQuestionSource):
+            self.question_total = self.questions.extend_index(QUESTION_COUNT_STEP)
+        else:
+            self.question_total = len(self.questions)
+
+        if self.question_total is None:
+            self._count_after_id = self.window.after(1, self._count_questions)
+        else:
+            self._update_progress()
+
+    def _question_count(self):
+        """
+        問題数（_count_questions が数え終わっていない場合は残りを数える）
+
+        送信するときは最後の問題まで索引を作成済みのため、問題ファイルを読み直さずに済む。
+        """
+        while self.question_total is None:
+            if isinstance(self.questions, LazyQuestionSource):
+                self.question_total = self.questions.extend_index(QUESTION_COUNT_STEP)
+            else:
+                self.question_total = len(self.questions)
+        return self.question_total
+
     def setup_ui(self):
         """UIをセットアップ"""
         # メインコンテナ
@@ -188,19 +367,17 @@ class SurveyInterface:
 
     def display_question(self):
         """現在の質問を表示"""
-        if self.current_question_index >= len(self.questions):
+        try:
+            question = self.questions[self.current_question_index]
+        except IndexError:
             self.submit_survey()
             return
 
-        question = self.questions[self.current_question_index]
-
         # 進捗表示
-        self.progress_label.configure(
-            text=f"問題 {self.current_question_index + 1} / {len(self.questions)}"
-        )
+        self._update_progress()
 
         # 質問文表示
-        self.question_label.configure(text=question['text'])
+        self.question_label.configure(text=question.text)
 
         # 選択肢をクリア
         for widget in self.choices_frame.winfo_children():
@@ -209,7 +386,7 @@ class SurveyInterface:
         self.choice_buttons = []
 
         # 選択肢を表示
-        for i, choice in enumerate(question['choices']):
+        for i, choice in enumerate(question.choices):
             self.create_choice_button(choice, i)
 
         # 状態をリセット
@@ -232,6 +409,11 @@ class SurveyInterface:
         else:
             self.prev_button.configure(state="disabled")
 
+    def _update_progress(self):
+        """進捗表示を更新（問題数を数え終わるまでは現在の問題番号だけ）"""
+        total = f" / {self.question_total}" if self.question_total is not None else ""
+        self.progress_label.configure(text=f"問題 {self.current_question_index + 1}{total}")
+
     def create_choice_button(self, choice_text, index):
         """選択肢ボタンを作成"""
         choice_button = ctk.CTkButton(
@@ -260,7 +442,8 @@ class SurveyInterface:
         # ログに記録
         self.logger.log_choice_selection(
             self.current_question_index + 1,
-            choice_text
+            choice_text,
+            index
         )
 
         # 選択したボタンの色を変更
@@ -290,6 +473,9 @@ class SurveyInterface:
 
     def on_reason_keypress(self, event):
         """理由入力が開始されたことを検知"""
+        if self.keystrokes:
+            self.keystrokes.record(self.current_question_index + 1, event.keysym)
+
         if not self.reason_started:
             self.reason_started = True
             self.rewrite_button.configure(state="normal")
@@ -307,6 +493,8 @@ class SurveyInterface:
         """理由を書き直す"""
         # ログに記録
         self.logger.log_rewrite_reason(self.current_question_index + 1)
+        if self.keystrokes:
+            self.keystrokes.flush()
 
         # 理由をクリア
         self.reason_text.delete("1.0", "end")
@@ -335,24 +523,29 @@ class SurveyInterface:
 
         # ログに理由の内容を記録
         self.logger.log_reason_text(self.current_question_index + 1, reason)
+        if self.keystrokes:
+            self.keystrokes.flush()
 
         # 回答を保存
-        response = {
-            'respondent_id': self.respondent_id,
-            'timestamp': get_timestamp(),
-            'question_num': self.current_question_index + 1,
-            'question_text': self.questions[self.current_question_index]['text'],
-            'selected_choice': self.selected_choice,
-            'reason': reason
-        }
+        # 質問文は複製せず、質問文テーブルの番号で参照する
+        response = Response(
+            self.respondent_id,
+            get_timestamp(),
+            self.current_question_index + 1,
+            self.questions[self.current_question_index].text_id,
+            self.selected_choice,
+            reason
+        )
 
         self.responses.append(response)
+        if self.journal:
+            self.journal.record_answer(response)
 
         # ログに記録
         old_index = self.current_question_index
         self.current_question_index += 1
 
-        if self.current_question_index < len(self.questions):
+        if self._has_question(self.current_question_index):
             self.logger.log_next_question(old_index + 1, self.current_question_index + 1)
 
         # 次の問題を表示
@@ -369,6 +562,8 @@ class SurveyInterface:
             # 前の回答があれば削除
             if self.responses:
                 self.responses.pop()
+                if self.journal:
+                    self.journal.record_undo()
 
             self.display_question()
 
@@ -405,15 +600,30 @@ class SurveyInterface:
             output_format = self.config_manager.get("output_format", "csv")
 
             # 拡張子を削除してベースパスを取得
-            base_filepath = filepath.replace(".csv", "").replace(".json", "")
+            base_filepath = strip_response_extension(filepath)
 
             # 保存
-            if save_response(self.responses, base_filepath, output_format):
+            database_path = self.config_manager.get_database_path()
+            if save_response(self.responses, base_filepath, output_format, database_path,
+                             questions=self.questions):
+                # 回答ファイルに保存できたのでジャーナルは不要
+                if self.journal:
+                    self.journal.complete()
+                    self.journal = None
+
+                record_session(tally_path_for(self.config_manager), self.responses, self._question_count())
+
                 saved_files = []
                 if output_format in ["csv", "both"]:
                     saved_files.append(f"{base_filepath}.csv")
                 if output_format in ["json", "both"]:
                     saved_files.append(f"{base_filepath}.json")
+                if output_format == "jsonl":
+                    saved_files.append(f"{base_filepath}.jsonl")
+                if output_format == "normalized":
+                    saved_files.append(f"{base_filepath}.norm.csv")
+                if output_format == "sqlite":
+                    saved_files.append(database_path)
 
                 files_str = "\n".join(saved_files)
                 messagebox.showinfo(
@@ -423,4 +633,4 @@ class SurveyInterface:
             else:
                 messagebox.showerror("エラー", "保存に失敗しました")
 
-        self.window.destroy()
+        self.close_window()
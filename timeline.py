@@ -0,0 +1,281 @@
+"""
+セッションタイムライン - アクションログから回答者ごとの操作の流れと問題ごとの滞在時間を復元する
+
+ログは先頭から1件ずつ読み込み、開いているセッションの状態だけをメモリに保持する。
+セッションは送信（SUBMIT）で完了し、一定時間操作がない場合や開いているセッションが
+上限を超えた場合は未完了のまま出力するため、ログがメモリより大きくても処理できる。
+
+回答者IDの列がないCSV形式のログは、送信ごとに区切ってファイル内の別のセッションとして扱う。
+"""
+import json
+import os
+import shutil
+import sys
+from collections import OrderedDict
+from multiprocessing import Pool
+from log_reader import read_log_events
+from constants import LOG_ACTIONS, TIMELINE_MAX_OPEN_SESSIONS, TIMELINE_IDLE_TIMEOUT
+
+
+class SessionTimeline:
+    """1セッション分の操作の流れ"""
+
+    __slots__ = (
+        "session_id", "respondent_id", "source", "events", "dwell_ns",
+        "choice_changes", "rewrites", "completed",
+        "_current_question", "_entered"
+    )
+
+    def __init__(self, session_id, respondent_id=None, source=None):
+        self.session_id = session_id
+        self.respondent_id = respondent_id
+        self.source = source
+        self.events = []
+        self.dwell_ns = {}  # 問題番号 → 滞在時間（ナノ秒）
+        self.choice_changes = {}  # 問題番号 → 選択肢を選んだ回数
+        self.rewrites = {}  # 問題番号 → 理由を書き直した回数
+        self.completed = False
+
+        self._current_question = None
+        self._entered = None  # 現在の問題を表示し始めたイベント
+
+    @property
+    def started_ns(self):
+        """最初のイベントの時刻（ナノ秒）"""
+        return self.events[0].time_ns if self.events else None
+
+    @property
+    def ended_ns(self):
+        """最後のイベントの時刻（ナノ秒）"""
+        return self.events[-1].time_ns if self.events else None
+
+    def add(self, event):
+        """イベントを追加し、滞在時間などを更新"""
+        action = event.action
+
+        if action == LOG_ACTIONS["QUESTION_MOVE"]:
+            self._leave(event)
+            self._enter(event.to_num, event)
+        elif action == LOG_ACTIONS["SUBMIT"]:
+            self._leave(event)
+            self.completed = True
+        elif event.question_num is not None and event.question_num != self._current_question:
+            # 移動の記録がない場合（最初の問題など）はイベントの問題番号から判断する
+            self._leave(event)
+            self._enter(event.question_num, event)
+
+        if action == LOG_ACTIONS["CHOICE_SELECTION"] and event.question_num is not None:
+            self.choice_changes[event.question_num] = self.choice_changes.get(event.question_num, 0) + 1
+        elif action == LOG_ACTIONS["REASON_REWRITE"] and event.question_num is not None:
+            self.rewrites[event.question_num] = self.rewrites.get(event.question_num, 0) + 1
+
+        self.events.append(event)
+
+    def _enter(self, question_num, event):
+        self._current_question = question_num
+        self._entered = event
+
+    def _leave(self, event):
+        if self._current_question is not None and self._entered is not None:
+            elapsed = _elapsed_ns(self._entered, event)
+            self.dwell_ns[self._current_question] = \
+                self.dwell_ns.get(self._current_question, 0) + elapsed
+        self._current_question = None
+        self._entered = None
+
+    def to_dict(self, include_events=True):
+        """出力用の辞書に変換（滞在時間はミリ秒）"""
+        data = {
+            "session_id": self.session_id,
+            "respondent_id": self.respondent_id,
+            "source": self.source,
+            "started": self.events[0].timestamp if self.events else None,
+            "ended": self.events[-1].timestamp if self.events else None,
+            "completed": self.completed,
+            "event_count": len(self.events),
+            "dwell_ms": {str(q): ns / 1_000_000 for q, ns in sorted(self.dwell_ns.items())},
+            "choice_changes": {str(q): n for q, n in sorted(self.choice_changes.items())},
+            "rewrites": {str(q): n for q, n in sorted(self.rewrites.items())}
+        }
+        if include_events:
+            data["events"] = [
+                {
+                    "timestamp": event.timestamp,
+                    "action": event.action,
+                    "question_num": event.question_num,
+                    "to_num": event.to_num,
+                    "text": event.text
+                }
+                for event in self.events
+            ]
+        return data
+
+
+def _elapsed_ns(start, end):
+    """2つのイベントの間の経過時間（モノトニック時刻があればそれを使う）"""
+    if start.mono_ns is not None and end.mono_ns is not None:
+        return max(0, end.mono_ns - start.mono_ns)
+    return max(0, end.time_ns - start.time_ns)
+
+
+def iter_sessions(events, source=None, max_open_sessions=TIMELINE_MAX_OPEN_SESSIONS,
+                  idle_timeout=TIMELINE_IDLE_TIMEOUT):
+    """
+    イベントの列をセッションごとにまとめる
+
+    Args:
+        events: LogEventのイテラブル（記録順）
+        source: ログファイル名など（回答者IDのないログのセッションIDに使う）
+        max_open_sessions: 同時に保持する未完了セッションの最大数
+        idle_timeout: この秒数より長く操作のないセッションは未完了として出力する（0の場合はしない）
+
+    Yields:
+        SessionTimeline（完了した順。ログの終わりに残ったセッションは未完了として最後に出力）
+    """
+    open_sessions = OrderedDict()  # 最後に操作された順
+    session_counts = {}
+    timeout_ns = int(idle_timeout * 1_000_000_000)
+
+    for event in events:
+        key = event.respondent_id if event.respondent_id is not None else source
+
+        session = open_sessions.get(key)
+        if session is None:
+            count = session_counts.get(key, 0) + 1
+            session_counts[key] = count
+            session_id = f"{key}#{count}" if count > 1 else str(key)
+            session = SessionTimeline(session_id, event.respondent_id, source)
+            open_sessions[key] = session
+        else:
+            open_sessions.move_to_end(key)
+
+        session.add(event)
+        if session.completed:
+            del open_sessions[key]
+            yield session
+
+        # 長く操作のないセッション・上限を超えたセッションを古い順に出力
+        while open_sessions:
+            oldest_key, oldest = next(iter(open_sessions.items()))
+            idle = timeout_ns and event.time_ns - oldest.ended_ns > timeout_ns
+            if not idle and len(open_sessions) <= max_open_sessions:
+                break
+            del open_sessions[oldest_key]
+            yield oldest
+
+    yield from open_sessions.values()
+
+
+def iter_file_sessions(log_path, **kwargs):
+    """
+    ログファイルを読み込んでセッションごとにまとめる
+
+    Args:
+        log_path: ログファイルのパス（圧縮済みのセグメントも可）
+
+    Yields:
+        SessionTimeline
+    """
+    return iter_sessions(read_log_events(log_path), source=os.path.basename(log_path), **kwargs)
+
+
+class DwellSummary:
+    """全セッションの問題ごとの滞在時間の集計"""
+
+    def __init__(self):
+        self.total_ns = {}
+        self.counts = {}
+        self.sessions = 0
+        self.completed = 0
+
+    def add(self, session):
+        """セッションを集計に加える"""
+        self.sessions += 1
+        if session.completed:
+            self.completed += 1
+        for question_num, ns in session.dwell_ns.items():
+            self.total_ns[question_num] = self.total_ns.get(question_num, 0) + ns
+            self.counts[question_num] = self.counts.get(question_num, 0) + 1
+
+    def merge(self, other):
+        """別の集計をまとめる"""
+        self.sessions += other.sessions
+        self.completed += other.completed
+        for question_num, ns in other.total_ns.items():
+            self.total_ns[question_num] = self.total_ns.get(question_num, 0) + ns
+            self.counts[question_num] = self.counts.get(question_num, 0) + other.counts[question_num]
+
+    def mean_ms(self):
+        """問題ごとの平均滞在時間（ミリ秒）"""
+        return {
+            question_num: self.total_ns[question_num] / self.counts[question_num] / 1_000_000
+            for question_num in sorted(self.total_ns)
+        }
+
+
+def _process_file(args):
+    """1ファイル分のセッションを一時ファイルに書き出す（並列処理のワーカー）"""
+    log_path, part_path, include_events = args
+    summary = DwellSummary()
+    try:
+        with open(part_path, 'w', encoding='utf-8') as f:
+            for session in iter_file_sessions(log_path):
+                summary.add(session)
+                f.write(json.dumps(session.to_dict(include_events), ensure_ascii=False) + "\n")
+    except (OSError, ValueError) as e:
+        print(f"タイムライン作成エラー ({log_path}): {e}")
+    return summary
+
+
+def build_timelines(log_paths, output_path, processes=None, include_events=True):
+    """
+    複数のログファイルからセッションのタイムラインを並列に作成し、JSON Lines形式で保存
+
+    ファイルごとに別のプロセスで処理し、結果を一時ファイルを経由して連結するため、
+    メモリ使用量はファイルの大きさによらない。
+
+    Args:
+        log_paths: ログファイルのパスのリスト
+        output_path: 出力先（1行1セッションのJSON Lines）
+        processes: 並列数（Noneの場合はCPU数）
+        include_events: Trueの場合、各セッションのイベント一覧も出力する
+
+    Returns:
+        DwellSummary（全セッションの問題ごとの滞在時間の集計）
+    """
+    tasks = [
+        (log_path, f"{output_path}.part{i}", include_events)
+        for i, log_path in enumerate(log_paths)
+    ]
+    summary = DwellSummary()
+
+    try:
+        if len(tasks) > 1 and processes != 1:
+            with Pool(processes) as pool:
+                for file_summary in pool.imap(_process_file, tasks):
+                    summary.merge(file_summary)
+        else:
+            for task in tasks:
+                summary.merge(_process_file(task))
+
+        with open(output_path, 'wb') as dst:
+            for _, part_path, _ in tasks:
+                with open(part_path, 'rb') as src:
+                    shutil.copyfileobj(src, dst)
+    finally:
+        for _, part_path, _ in tasks:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+
+    return summary
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("使い方: python timeline.py <出力.jsonl> <ログファイル>...")
+        sys.exit(1)
+
+    result = build_timelines(sys.argv[2:], sys.argv[1])
+    print(f"✓ {result.sessions}セッション（完了 {result.completed}）: {sys.argv[1]}")
+    for qnum, mean in result.mean_ms().items():
+        print(f"  問題{qnum}: 平均 {mean / 1000:.1f}秒")
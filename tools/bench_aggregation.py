@@ -0,0 +1,120 @@
+"""
+回答の集計のベンチマーク
+
+合成した回答ファイル（既定: 100万件）を読み込み、選択肢の分布・クロス集計・日別集計を
+Pythonのループ（Counter・辞書）と aggregation.ResponseMatrix（NumPy）で計算して、時間と結果を比べる。
+NumPyが必要（pip install numpy）。
+
+使い方: python tools/bench_aggregation.py [回答者数(既定: 40000)] [問題数(既定: 25)]
+"""
+import csv
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aggregation import ResponseMatrix, find_response_files, require_numpy
+from compaction import read_snapshot
+from records import Question
+from response_merge import iter_file_rows
+from utils import RESPONSE_CSV_HEADER
+
+FILE_COUNT = 100
+CHOICE_COUNT = 5
+DAYS = 14
+
+
+def write_responses(directory, respondents, questions):
+    """回答ファイルを書き込む（回答者を FILE_COUNT 個のファイルに分ける）"""
+    random.seed(0)
+    for number in range(FILE_COUNT):
+        path = os.path.join(directory, f"responses_B{number:03d}_20250115.csv")
+        with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(RESPONSE_CSV_HEADER)
+            for respondent in range(number * respondents // FILE_COUNT, (number + 1) * respondents // FILE_COUNT):
+                timestamp = f"2025-01-{1 + respondent % DAYS:02d} 10:00:00.000"
+                for index, question in enumerate(questions):
+                    writer.writerow([f"R{respondent:06d}", timestamp, index + 1, question.text,
+                                     random.choice(question.choices), "理由"])
+
+
+def best_ms(function, repeat=3):
+    """repeat回実行した中で最も速かった時間（ミリ秒）と結果"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def python_crosstab(rows, text_a, text_b):
+    """Pythonのループでのクロス集計（回答者ごとの回答をまとめてから数える）"""
+    answers = defaultdict(dict)
+    for respondent_id, _, _, text, choice, _ in rows:
+        answers[respondent_id][text] = choice
+    return Counter((found[text_a], found[text_b]) for found in answers.values()
+                   if text_a in found and text_b in found)
+
+
+if __name__ == "__main__":
+    respondents = int(sys.argv[1]) if len(sys.argv) > 1 else 40000
+    question_count = int(sys.argv[2]) if len(sys.argv) > 2 else 25
+    try:
+        require_numpy()
+    except ImportError as e:
+        print(e)
+        sys.exit(1)
+
+    questions = [
+        Question(f"設問{i}: あなたの考えに最も近いものを選んでください", [f"選択肢{j}" for j in range(CHOICE_COUNT)])
+        for i in range(question_count)
+    ]
+    directory = tempfile.mkdtemp(prefix="aggregation_")
+    try:
+        write_responses(directory, respondents, questions)
+        with read_snapshot(directory):
+            paths = find_response_files(directory)
+            start = time.perf_counter()
+            matrix = ResponseMatrix.from_files(paths, questions)
+            load_s = time.perf_counter() - start
+            rows = [row for path in paths for row in iter_file_rows(path)]
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    print(f"回答数: {len(matrix)}  読み込み（ResponseMatrix.from_files）: {load_s:.2f} 秒")
+
+    text_a, text_b = questions[0].text, questions[1].text
+    python_counts_ms, counts = best_ms(lambda: Counter((row[3], row[4]) for row in rows))
+    numpy_counts_ms, matrix_counts = best_ms(matrix.choice_counts)
+    python_cross_ms, cross = best_ms(lambda: python_crosstab(rows, text_a, text_b))
+    numpy_cross_ms, matrix_cross = best_ms(
+        lambda: (setattr(matrix, "_answers", None), matrix.crosstab(0, 1))[1]
+    )
+    python_daily_ms, daily = best_ms(lambda: Counter((row[1][:10], row[3], row[4]) for row in rows))
+    numpy_daily_ms, matrix_daily = best_ms(matrix.daily_counts)
+
+    print(f"選択肢の分布: Python {python_counts_ms:8.1f} ms  NumPy {numpy_counts_ms:7.2f} ms")
+    print(f"クロス集計:   Python {python_cross_ms:8.1f} ms  NumPy {numpy_cross_ms:7.2f} ms（回答者×問題の行列の作成を含む）")
+    print(f"日別集計:     Python {python_daily_ms:8.1f} ms  NumPy {numpy_daily_ms:7.2f} ms")
+
+    same = (
+        len(rows) == len(matrix)
+        and all(counts[(q.text, c)] == matrix_counts[i, j]
+                for i, q in enumerate(questions) for j, c in enumerate(q.choices))
+        and all(cross[(a, b)] == matrix_cross[i, j]
+                for i, a in enumerate(questions[0].choices) for j, b in enumerate(questions[1].choices))
+        and all(daily[(day, q.text, c)] == matrix_daily[d, i, j]
+                for d, day in enumerate(matrix.days)
+                for i, q in enumerate(questions) for j, c in enumerate(q.choices))
+    )
+    if not same:
+        print("✗ NumPyとPythonの集計結果が一致しません")
+        sys.exit(1)
+    print("✓ NumPyとPythonの集計結果は一致しています")
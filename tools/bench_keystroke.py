@@ -0,0 +1,65 @@
+"""
+キー入力の記録のベンチマーク
+
+理由入力のキー入力ハンドラから呼ぶ KeystrokeRecorder.record() の1回あたりの時間を測り、
+上限（既定: 20マイクロ秒）を超えないことを確認する。
+あわせて、問題の移動時などにUIスレッドで行う flush()（記録の取り出し）の時間も表示する。
+
+使い方: python tools/bench_keystroke.py [キー入力数(既定: 100000)] [上限(マイクロ秒)]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from keystroke_capture import KeystrokeRecorder
+from constants import KEYSTROKE_BUFFER_SIZE
+
+KEYS = ["a", "i", "u", "e", "o", "space", "BackSpace", "Return", "period", "comma"]
+
+
+def percentile(values, ratio):
+    """並べ替え済みのリストのパーセンタイル"""
+    return values[min(len(values) - 1, int(len(values) * ratio))]
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    budget_us = float(sys.argv[2]) if len(sys.argv) > 2 else 20.0
+
+    directory = tempfile.mkdtemp(prefix="keystroke_")
+    try:
+        recorder = KeystrokeRecorder(os.path.join(directory, "keys.csv"), "R001")
+        durations = []
+        flushes = []
+        clock = time.perf_counter_ns
+        for i in range(count):
+            start = clock()
+            recorder.record(i // 200 + 1, KEYS[i % len(KEYS)])
+            durations.append(clock() - start)
+            # 実際の画面と同じく、バッファが溢れる前に問題の移動などで取り出す
+            if (i + 1) % (KEYSTROKE_BUFFER_SIZE // 2) == 0:
+                start = clock()
+                recorder.flush()
+                flushes.append(clock() - start)
+        recorder.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    durations.sort()
+    flushes.sort()
+    p99_us = percentile(durations, 0.99) / 1000
+    print(f"record(): 平均 {sum(durations) / len(durations) / 1000:.2f} µs  "
+          f"中央値 {percentile(durations, 0.5) / 1000:.2f} µs  99% {p99_us:.2f} µs  "
+          f"最大 {durations[-1] / 1000:.1f} µs")
+    if flushes:
+        print(f"flush()（{KEYSTROKE_BUFFER_SIZE // 2}件の取り出し）: 平均 {sum(flushes) / len(flushes) / 1e6:.2f} ms  "
+              f"最大 {flushes[-1] / 1e6:.2f} ms")
+
+    if p99_us > budget_us:
+        print(f"✗ record() の99パーセンタイルが上限 {budget_us:.0f} µs を超えました")
+        sys.exit(1)
+    print(f"✓ record() の99パーセンタイルは上限 {budget_us:.0f} µs 以内です")
@@ -0,0 +1,82 @@
+"""
+問題キャッシュのベンチマーク
+
+問題ファイル（CSV・JSON）の読み込みを、キャッシュなし（毎回解析）・キャッシュファイルから
+（アプリの再起動後）・メモリ上のキャッシュから、の3通りで比べる。
+
+使い方: python tools/bench_question_cache.py [問題数(既定: 2000)]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from question_cache import cache_path_for, clear_cache
+from records import Question
+from utils import load_questions, save_questions_to_csv, save_questions_to_json
+
+
+def best_ms(function, repeat):
+    """repeat回実行した中で最も速かった時間（ミリ秒）と結果"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def bench(path, repeat=10):
+    """1つの問題ファイルの読み込み時間を表示（キャッシュの結果が解析結果と同じかも確認）"""
+    parse_ms, parsed = best_ms(lambda: load_questions(path, use_cache=False), repeat)
+
+    load_questions(path)  # キャッシュファイルを作る
+
+    def from_disk():
+        clear_cache()
+        return load_questions(path)
+
+    persisted = os.path.exists(cache_path_for(path))
+    disk_ms, from_file = best_ms(from_disk, repeat)
+    memory_ms, from_memory = best_ms(lambda: load_questions(path), repeat * 100)
+
+    print(f"{os.path.basename(path)}")
+    print(f"  キャッシュなし: {parse_ms:8.2f} ms")
+    if persisted:
+        print(f"  再起動後:       {disk_ms:8.2f} ms（キャッシュファイルから）")
+    else:
+        print("  再起動後:              -（キャッシュファイルを作らない形式）")
+    print(f"  メモリ:         {memory_ms:8.3f} ms")
+    return parsed == from_file == from_memory
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    questions = [
+        Question(f"質問{i}: 次のうち、あなたの考えに最も近いものを選んでください。" * 2,
+                 [f"選択肢{j}" for j in range(5)])
+        for i in range(count)
+    ]
+
+    directory = tempfile.mkdtemp(prefix="question_cache_")
+    try:
+        paths = [os.path.join(directory, "bank.csv"), os.path.join(directory, "bank.json")]
+        save_questions_to_csv(questions, paths[0])
+        save_questions_to_json(questions, paths[1])
+        # 更新直後のファイルは内容のハッシュも確認するため、通常の状態（数秒以上前に更新）にする
+        past = time.time() - 60
+        for path in paths:
+            os.utime(path, (past, past))
+
+        same = all([bench(path) for path in paths])
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    if not same:
+        print("✗ キャッシュから読み込んだ問題が解析結果と一致しません")
+        sys.exit(1)
+    print(f"✓ {count}問の問題ファイルをキャッシュから正しく読み込みました")
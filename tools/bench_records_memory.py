@@ -0,0 +1,71 @@
+"""
+回答レコードのメモリ使用量のベンチマーク
+
+同じ回答CSVを、従来の辞書（1回答につき6つのキーと質問文の文字列）と
+Response（質問文は質問文テーブルの番号で参照するタプル）で読み込み、1回答あたりのメモリ使用量を比べる。
+
+使い方: python tools/bench_records_memory.py [回答数(既定: 200000)] [問題数(既定: 50)]
+"""
+import csv
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from records import Response
+
+
+def make_csv(count, question_count):
+    """合成した回答CSVの内容（質問文は問題数だけの種類を繰り返す）"""
+    texts = [
+        f"あなたが普段の学習で最も重視していることについて、当てはまるものを選んでください（設問{i}）"
+        for i in range(question_count)
+    ]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for i in range(count):
+        writer.writerow([f"R{i // question_count:06d}", "2025-01-15 10:00:00.123", i % question_count + 1,
+                         texts[i % question_count], "選択肢A", "理由です"])
+    return buffer.getvalue()
+
+
+def as_dict(row):
+    """従来の形式（辞書）"""
+    return {
+        "respondent_id": row[0], "timestamp": row[1], "question_num": int(row[2]),
+        "question_text": row[3], "selected_choice": row[4], "reason": row[5]
+    }
+
+
+def measure(data, convert):
+    """
+    CSVを読み込んで変換し、保持しているメモリと時間を測る
+
+    Returns:
+        (確保したままのバイト数, 読み込み時間(秒), 回答数)
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    loaded = [convert(row) for row in csv.reader(io.StringIO(data))]
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, elapsed, len(loaded)
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    question_count = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    data = make_csv(count, question_count)
+    results = {}
+    for name, convert in (("辞書", as_dict), ("Response", Response.from_row)):
+        used, elapsed, loaded = measure(data, convert)
+        results[name] = used / loaded
+        print(f"{name:8}: {used / loaded:6.0f} B/回答  合計 {used / 2 ** 20:6.1f} MiB  読み込み {elapsed:.2f} 秒")
+
+    saving = 1 - results["Response"] / results["辞書"]
+    print(f"✓ 1回答あたり {results['辞書'] - results['Response']:.0f} B（{saving:.0%}）削減")
@@ -0,0 +1,73 @@
+"""
+連番の割り当てのベンチマーク
+
+既存のファイルが大量にあるディレクトリで、従来の方法（呼び出しごとにディレクトリ全体を走査）と
+sequence_allocator.allocate_sequence（カウンターファイル）の1回あたりの時間を比べる。
+
+使い方: python tools/bench_sequence.py [ファイル数(既定: 100000)] [割り当て回数(既定: 1000)]
+"""
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sequence_allocator import COUNTER_PREFIX, allocate_sequence
+
+NAME_FORMAT = "responses_{date}_{sequence}.csv"
+BASE_FILENAME = "responses_20250115_{sequence}.csv"  # {sequence} 以外を埋めたファイル名
+
+
+def scan_listdir(directory, name_format):
+    """従来の get_next_sequence_number と同じ方法（呼び出しごとに全ファイルに正規表現を適用）"""
+    pattern = name_format.replace("{sequence}", r"(\d+)").replace(".", r"\.")
+    pattern = pattern.replace("{date}", r"\d{8}")
+    max_num = 0
+    for filename in os.listdir(directory):
+        match = re.search(pattern, filename)
+        if match:
+            max_num = max(max_num, int(match.group(1)))
+    return max_num + 1
+
+
+def remove_counters(directory):
+    """カウンターファイルを削除（初回の走査を測るため）"""
+    for name in os.listdir(directory):
+        if name.startswith(COUNTER_PREFIX):
+            os.remove(os.path.join(directory, name))
+
+
+if __name__ == "__main__":
+    file_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    calls = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+    directory = tempfile.mkdtemp(prefix="sequence_")
+    try:
+        for number in range(1, file_count + 1):
+            open(os.path.join(directory, f"responses_20250115_{number:03d}.csv"), 'w').close()
+
+        start = time.perf_counter()
+        expected = scan_listdir(directory, NAME_FORMAT)
+        scan_ms = (time.perf_counter() - start) * 1000
+        print(f"従来（ディレクトリの走査）: {scan_ms:.1f} ms/回")
+
+        remove_counters(directory)
+        start = time.perf_counter()
+        first = allocate_sequence(directory, BASE_FILENAME)
+        print(f"カウンターなし（初回の走査）: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        start = time.perf_counter()
+        for _ in range(calls):
+            last = allocate_sequence(directory, BASE_FILENAME)
+        warm_us = (time.perf_counter() - start) / calls * 1e6
+        print(f"カウンターあり: {warm_us:.1f} µs/回（{scan_ms * 1000 / warm_us:.0f}倍）")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    if first != expected or last != expected + calls:
+        print(f"✗ 番号が一致しません: {first} != {expected} または {last} != {expected + calls}")
+        sys.exit(1)
+    print(f"✓ {file_count}ファイルの続きの番号（{expected}〜{last}）を割り当てました")
@@ -0,0 +1,103 @@
+"""
+共有ファイルへの同時書き込みの負荷テスト
+
+複数のプロセスから同じログファイル（CSV・JSON Lines・バイナリ）と同じ回答CSVに同時に書き込み、
+すべての行が混ざらずに1回ずつ書き込まれていること、ヘッダーとBOMが1回だけであることを確認する。
+一時ディレクトリに書き込み、終了時に削除する。
+
+使い方: python tools/stress_shared_writer.py [プロセス数(既定: 16)] [1プロセスあたりのイベント数(既定: 200)]
+"""
+import codecs
+import csv
+import os
+import shutil
+import sys
+import tempfile
+from multiprocessing import Pool
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logger import ActionLogger
+from log_reader import read_log_events
+from records import Response
+from utils import RESPONSE_CSV_HEADER, save_response_to_csv
+
+LOG_FILES = {"csv": "shared.csv", "jsonl": "shared.jsonl", "binary": "shared.frlog"}
+RESPONSE_FILE = "responses.csv"
+RESPONSE_BATCHES = 20  # 1プロセスあたりの回答の保存回数
+RESPONSES_PER_BATCH = 5
+# 区切り文字・クォート・改行を含む質問文（行が混ざると崩れる）
+QUESTION_TEXT = '質問,"引用"\n2行目'
+
+
+def _write(args):
+    """1プロセス分の書き込み（バッファリングの有無を交互に変える）"""
+    directory, worker, events = args
+    for log_format, name in LOG_FILES.items():
+        logger = ActionLogger(
+            os.path.join(directory, name), log_format=log_format, respondent_id=f"r{worker}",
+            buffered=worker % 2 == 0, flush_batch_size=7
+        )
+        for number in range(events):
+            logger.log_choice_selection(number + 1, f"選択肢-{worker}-{number}", number)
+        logger.close()
+
+    for batch in range(RESPONSE_BATCHES):
+        responses = [
+            Response.create(f"r{worker}", f"2025-01-15 10:00:{batch:02d}", question_num + 1,
+                            QUESTION_TEXT, f"{worker}-{batch}", "理由")
+            for question_num in range(RESPONSES_PER_BATCH)
+        ]
+        save_response_to_csv(responses, os.path.join(directory, RESPONSE_FILE))
+
+
+def check_logs(directory, processes, events):
+    """すべてのイベントが1回ずつ読み込めるか確認（問題のある形式のリストを返す）"""
+    expected = {f"選択肢-{worker}-{number}" for worker in range(processes) for number in range(events)}
+    failures = []
+    for log_format, name in LOG_FILES.items():
+        texts = [event.text for event in read_log_events(os.path.join(directory, name))]
+        ok = len(texts) == len(expected) and set(texts) == expected
+        print(f"{'✓' if ok else '✗'} {log_format}: {len(texts)}件（期待値 {len(expected)}件）")
+        if not ok:
+            failures.append(log_format)
+    return failures
+
+
+def check_responses(directory, processes):
+    """回答CSVのヘッダー・BOMが1回だけで、すべての行が崩れていないか確認"""
+    path = os.path.join(directory, RESPONSE_FILE)
+    with open(path, 'rb') as f:
+        data = f.read()
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        rows = list(csv.reader(f))
+
+    expected = processes * RESPONSE_BATCHES * RESPONSES_PER_BATCH
+    ok = (
+        data.count(codecs.BOM_UTF8) == 1
+        and rows[0] == RESPONSE_CSV_HEADER
+        and len(rows) - 1 == expected
+        and all(len(row) == 6 and row[3] == QUESTION_TEXT for row in rows[1:])
+    )
+    print(f"{'✓' if ok else '✗'} 回答CSV: {len(rows) - 1}行（期待値 {expected}行）、BOM {data.count(codecs.BOM_UTF8)}個")
+    return ok
+
+
+if __name__ == "__main__":
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    events = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    directory = tempfile.mkdtemp(prefix="stress_")
+    try:
+        with Pool(processes) as pool:
+            pool.map(_write, [(directory, worker, events) for worker in range(processes)])
+        failed = check_logs(directory, processes, events)
+        if not check_responses(directory, processes):
+            failed.append("responses")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    if failed:
+        print(f"✗ 失敗: {', '.join(failed)}")
+        sys.exit(1)
+    print("✓ すべての行が欠けず・混ざらずに書き込まれました")
@@ -4,7 +4,19 @@
 import csv
 import json
 import os
-from datetime import datetime
+import time
+from file_lock import append_bytes, append_csv_rows
+from log_events import format_time_ns
+from question_cache import load_cached
+from question_pack import PACK_SUFFIX, QuestionPack, write_question_pack
+from records import Question, Response
+from normalized_output import NORMALIZED_EXTENSION, save_response_to_normalized
+from sequence_allocator import allocate_sequence
+from sqlite_store import save_response_to_sqlite
+from constants import DATABASE_FILE
+
+RESPONSE_CSV_HEADER = ['回答者ID', 'タイムスタンプ', '問題番号', '質問文', '選択した回答', '理由']
+RESPONSE_EXTENSIONS = (NORMALIZED_EXTENSION, ".csv", ".json", ".jsonl")
 
 
 def save_questions_to_csv(questions, filepath):
@@ -24,8 +36,8 @@ def save_questions_to_csv(questions, filepath):
 
             # 各質問を書き込み
             for i, question in enumerate(questions, 1):
-                row = [i, question['text']]
-                row.extend(question['choices'])
+                row = [i, question.text]
+                row.extend(question.choices)
 
                 # 選択肢が5つに満たない場合は空文字で埋める
                 while len(row) < 7:
@@ -49,7 +61,7 @@ def save_questions_to_json(questions, filepath):
     """
     try:
         data = {
-            "questions": questions,
+            "questions": [question.to_dict() for question in questions],
             "total_questions": len(questions),
             "created_date": get_timestamp()
         }
@@ -63,6 +75,41 @@ def save_questions_to_json(questions, filepath):
         return False
 
 
+def save_questions_to_jsonl(questions, filepath):
+    """
+    質問リストをJSON Linesファイル（1行1問）に保存
+
+    Args:
+        questions: 質問データのリスト
+        filepath: 保存先ファイルパス
+    """
+    try:
+        with open(filepath, 'w', encoding='utf-8') as f:
+            for question in questions:
+                f.write(_jsonl_record(question.to_dict()))
+
+        return True
+    except Exception as e:
+        print(f"JSON Lines保存エラー: {e}")
+        return False
+
+
+def save_questions_to_pack(questions, filepath):
+    """
+    質問リストを問題パック（メモリマップして読み込むバイナリ形式）に保存
+
+    Args:
+        questions: 質問データのリスト
+        filepath: 保存先ファイルパス
+    """
+    try:
+        write_question_pack(questions, filepath)
+        return True
+    except Exception as e:
+        print(f"問題パック保存エラー: {e}")
+        return False
+
+
 def load_questions_from_csv(filepath):
     """
     CSVファイルから質問リストを読み込み
@@ -71,7 +118,7 @@ def load_questions_from_csv(filepath):
         filepath: 読み込むファイルパス
 
     Returns:
-        質問データのリスト
+        質問データ（Question）のリスト
     """
     questions = []
 
@@ -89,12 +136,7 @@ def load_questions_from_csv(filepath):
                 if len(row) < 2:
                     continue
 
-                question = {
-                    'text': row[1],
-                    'choices': [choice for choice in row[2:] if choice.strip()]
-                }
-
-                questions.append(question)
+                questions.append(Question(row[1], [choice for choice in row[2:] if choice.strip()]))
 
         return questions
     except Exception as e:
@@ -110,7 +152,7 @@ def load_questions_from_json(filepath):
         filepath: 読み込むファイルパス
 
     Returns:
-        質問データのリスト
+        質問データ（Question）のリスト
     """
     questions = []
 
@@ -122,10 +164,11 @@ def load_questions_from_json(filepath):
             data = json.load(f)
 
             # データ形式のバリデーション
+            if isinstance(data, dict):
+                data = data.get('questions', [])
             if isinstance(data, list):
-                questions = data
-            elif isinstance(data, dict) and 'questions' in data:
-                questions = data['questions']
+                # 形式が正しくない問題はCSVの列が足りない行と同様に読み飛ばす
+                questions = [question for question in map(Question.from_record, data) if question]
 
         return questions
     except Exception as e:
@@ -133,16 +176,104 @@ def load_questions_from_json(filepath):
         return questions
 
 
-def load_questions(filepath):
+def iter_jsonl(filepath):
     """
-    ファイルから質問リストを読み込み（拡張子に応じてCSVまたはJSON）
+    JSON Linesファイルを1レコードずつ読み込む
+
+    書き込み途中の最後の行（改行で終わっていない行）は読み込まないため、
+    追記中のファイルを読み込んだり、続きを追いかけて読んだりできる。
+
+    Args:
+        filepath: 読み込むファイルパス
+
+    Yields:
+        レコード（辞書）
+    """
+    with open(filepath, 'rb') as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            if not line.strip():
+                continue
+            yield json.loads(line)
+
+
+def load_questions_from_jsonl(filepath):
+    """
+    JSON Linesファイルから質問リストを読み込み
 
     Args:
         filepath: 読み込むファイルパス
 
     Returns:
-        質問データのリスト
+        質問データ（Question）のリスト
+    """
+    questions = []
+
+    try:
+        if not os.path.exists(filepath):
+            return questions
+
+        # JSONとして読めない行・形式が正しくない行は読み飛ばす（LazyQuestionSource と同じ扱い）
+        with open(filepath, 'rb') as f:
+            for line in f:
+                # 書き込み途中の最後の行は iter_jsonl と同様に読み込まない
+                if not line.endswith(b"\n"):
+                    break
+                question = Question.from_json_line(line)
+                if question:
+                    questions.append(question)
+
+        return questions
+    except Exception as e:
+        print(f"JSON Lines読み込みエラー: {e}")
+        return questions
+
+
+def load_questions_from_pack(filepath):
     """
+    問題パックを開く（問題は取り出したときに読み込まれる）
+
+    Args:
+        filepath: 読み込むファイルパス
+
+    Returns:
+        QuestionPack（読み込めない場合は空のリスト）
+    """
+    try:
+        return QuestionPack(filepath)
+    except (OSError, ValueError) as e:
+        print(f"問題パック読み込みエラー: {e}")
+        return []
+
+
+def load_questions(filepath, use_cache=True):
+    """
+    ファイルから質問リストを読み込み（拡張子に応じてCSV・JSON・JSON Lines・問題パック）
+
+    解析結果はキャッシュし（question_cache.py）、ファイルが変わっていなければ解析を省略する。
+    問題パックは解析が不要なため、キャッシュを使わずにメモリマップした読み取り専用のシーケンスを返す。
+
+    Args:
+        filepath: 読み込むファイルパス
+        use_cache: Falseの場合はキャッシュを使わずに解析する
+
+    Returns:
+        質問データのリスト（問題パックの場合はQuestionPack）
+    """
+    if filepath.endswith(PACK_SUFFIX):
+        return load_questions_from_pack(filepath)
+    if use_cache:
+        # JSONはキャッシュファイルから復元しても解析し直すのと変わらないため、メモリ上にのみキャッシュする
+        persist = not filepath.endswith(('.json', '.jsonl'))
+        return load_cached(filepath, _parse_questions_file, persist=persist)
+    return _parse_questions_file(filepath)
+
+
+def _parse_questions_file(filepath):
+    """拡張子に応じた形式で問題ファイルを解析"""
+    if filepath.endswith('.jsonl'):
+        return load_questions_from_jsonl(filepath)
     if filepath.endswith('.json'):
         return load_questions_from_json(filepath)
     else:
@@ -154,29 +285,14 @@ def save_response_to_csv(responses, filepath):
     回答データをCSVファイルに保存
 
     Args:
-        responses: 回答データのリスト
+        responses: 回答データ（Response）のリスト
         filepath: 保存先ファイルパス
     """
     try:
-        file_exists = os.path.exists(filepath)
-
-        with open(filepath, 'a', encoding='utf-8-sig', newline='') as f:
-            writer = csv.writer(f)
+        rows = [response.to_row() for response in responses]
 
-            # ファイルが新規の場合はヘッダーを書き込む
-            if not file_exists:
-                writer.writerow(['回答者ID', 'タイムスタンプ', '問題番号', '質問文', '選択した回答', '理由'])
-
-            # 回答を書き込み
-            for response in responses:
-                writer.writerow([
-                    response['respondent_id'],
-                    response['timestamp'],
-                    response['question_num'],
-                    response['question_text'],
-                    response['selected_choice'],
-                    response['reason']
-                ])
+        # ロックを取得して1回で追記（ファイルが空の場合のみヘッダーを書き込む）
+        append_csv_rows(filepath, rows, header=RESPONSE_CSV_HEADER)
 
         return True
     except Exception as e:
@@ -186,13 +302,16 @@ def save_response_to_csv(responses, filepath):
 
 def get_timestamp():
     """現在のタイムスタンプを取得"""
-    return datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+    return format_time_ns(time.time_ns())
 
 
 def get_next_sequence_number(directory, base_filename):
     """
     指定されたディレクトリで次の連番を取得
 
+    番号はディレクトリごとのカウンターファイルから割り当てるため（sequence_allocator.py）、
+    ファイル数が多くても一定の時間で済み、複数のアプリで同じ番号になることもない。
+
     Args:
         directory: ディレクトリパス
         base_filename: ベースとなるファイル名（{sequence}を含む）
@@ -200,31 +319,7 @@ def get_next_sequence_number(directory, base_filename):
     Returns:
         次の連番
     """
-    if not directory or not os.path.exists(directory):
-        return 1
-
-    # {sequence}を.*に置き換えてパターンを作成
-    import re
-    pattern = base_filename.replace("{sequence}", r"(\d+)")
-    pattern = pattern.replace(".", r"\.")
-    pattern = pattern.replace("{date}", r"\d{8}")
-    pattern = pattern.replace("{time}", r"\d{6}")
-    pattern = pattern.replace("{respondent_id}", r"[^_]+")
-
-    max_num = 0
-    try:
-        for filename in os.listdir(directory):
-            match = re.search(pattern, filename)
-            if match:
-                try:
-                    num = int(match.group(1))
-                    max_num = max(max_num, num)
-                except (ValueError, IndexError):
-                    pass
-    except Exception as e:
-        print(f"連番取得エラー: {e}")
-
-    return max_num + 1
+    return allocate_sequence(directory, base_filename)
 
 
 def save_response_to_json(responses, filepath):
@@ -232,12 +327,12 @@ def save_response_to_json(responses, filepath):
     回答データをJSONファイルに保存
 
     Args:
-        responses: 回答データのリスト
+        responses: 回答データ（Response）のリスト
         filepath: 保存先ファイルパス
     """
     try:
         data = {
-            "responses": responses,
+            "responses": [response.to_dict() for response in responses],
             "export_date": get_timestamp(),
             "total_responses": len(responses)
         }
@@ -251,17 +346,69 @@ def save_response_to_json(responses, filepath):
         return False
 
 
-def save_response(responses, filepath, output_format="csv"):
+def save_response_to_jsonl(responses, filepath):
+    """
+    回答データをJSON Linesファイルに追記（1行1回答）
+
+    ファイル全体を書き直さず、ロックを取得して回答の行だけを1回で追記する。
+
+    Args:
+        responses: 回答データ（Response）のリスト
+        filepath: 保存先ファイルパス
+    """
+    try:
+        data = "".join(_jsonl_record(response.to_dict()) for response in responses)
+        append_bytes(filepath, data.encode('utf-8'))
+
+        return True
+    except Exception as e:
+        print(f"JSON Lines保存エラー: {e}")
+        return False
+
+
+def iter_responses_jsonl(filepath):
+    """
+    JSON Linesファイルの回答を1件ずつ読み込む
+
+    Args:
+        filepath: 読み込むファイルパス
+
+    Yields:
+        Response
+    """
+    for record in iter_jsonl(filepath):
+        yield Response.from_dict(record)
+
+
+def _jsonl_record(record):
+    """JSON Linesの1行（空白を省いたJSON + 改行）"""
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n"
+
+
+def strip_response_extension(filepath):
+    """回答ファイルのパスから拡張子（.norm.csv, .csv, .json, .jsonl）を除く"""
+    for ext in RESPONSE_EXTENSIONS:
+        if filepath.endswith(ext):
+            return filepath[:-len(ext)]
+    return filepath
+
+
+def save_response(responses, filepath, output_format="csv", database_path=None, questions=None):
     """
     回答データを指定された形式で保存
 
     Args:
-        responses: 回答データのリスト
+        responses: 回答データ（Response）のリスト
         filepath: 保存先ファイルパス（拡張子なし）
-        output_format: 出力形式 ("csv", "json", "both")
+        output_format: 出力形式 ("csv", "json", "both", "jsonl", "sqlite", "normalized")
+        database_path: 出力形式がsqliteの場合のデータベースファイルのパス
+        questions: 出力形式がnormalizedの場合の回答した問題リスト
     """
     success = True
 
+    if output_format == "sqlite":
+        return save_response_to_sqlite(responses, database_path or DATABASE_FILE)
+
     if output_format in ["csv", "both"]:
         csv_path = filepath if filepath.endswith(".csv") else f"{filepath}.csv"
         if not save_response_to_csv(responses, csv_path):
@@ -272,4 +419,14 @@ def save_response(responses, filepath, output_format="csv"):
         if not save_response_to_json(responses, json_path):
             success = False
 
+    if output_format == "jsonl":
+        jsonl_path = filepath if filepath.endswith(".jsonl") else f"{filepath}.jsonl"
+        if not save_response_to_jsonl(responses, jsonl_path):
+            success = False
+
+    if output_format == "normalized":
+        normalized_path = strip_response_extension(filepath) + NORMALIZED_EXTENSION
+        if not save_response_to_normalized(responses, normalized_path, questions):
+            success = False
+
     return success